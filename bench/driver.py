@@ -0,0 +1,157 @@
+import datetime
+import io
+import zipfile
+from types import SimpleNamespace
+from typing import Optional
+
+from aiohttp import web
+
+# @class FakeMessage
+# @brief 送信済みメッセージの代用（edit の内容も送信内容として記録する）
+class FakeMessage:
+    def __init__(self, content: Optional[str], inter: Optional["FakeInteraction"] = None, msg_id: int = 1):
+        self.id = msg_id
+        self.content = content
+        self.edits = 0
+        self._inter = inter
+
+    async def edit(self, content: Optional[str] = None, **kwargs):
+        self.content = content
+        self.edits += 1
+        if self._inter is not None:
+            self._inter.calls += 1
+            self._inter.sent.append(content)
+
+# @class FakeResponse
+# @brief discord.InteractionResponse の代用
+class FakeResponse:
+    def __init__(self, inter: "FakeInteraction"):
+        self._inter = inter
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, **kwargs):
+        self._done = True
+        self._inter.calls += 1
+
+    async def send_message(self, content: Optional[str] = None, **kwargs):
+        self._done = True
+        self._inter.calls += 1
+        self._inter.sent.append(content)
+
+# @class FakeFollowup
+# @brief discord.Webhook（followup）の代用
+class FakeFollowup:
+    def __init__(self, inter: "FakeInteraction"):
+        self._inter = inter
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        self._inter.calls += 1
+        self._inter.sent.append(content)
+        return FakeMessage(content, self._inter)
+
+# @class FakeChannel
+# @brief チャンネルの代用
+class FakeChannel:
+    def __init__(self, inter: "FakeInteraction"):
+        self._inter = inter
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        self._inter.calls += 1
+        self._inter.sent.append(content)
+        return FakeMessage(content, self._inter)
+
+    def get_partial_message(self, msg_id: int) -> FakeMessage:
+        return FakeMessage(None, self._inter, msg_id)
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.roles = []
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    def __str__(self) -> str:
+        return "bench#0001"
+
+# @class FakeInteraction
+# @brief コマンドハンドラーに渡す discord.Interaction の代用
+# @details ハンドラーが使う response / followup / channel / user / guild_id と元の応答の取得・編集だけを備え、
+#          送信内容と API 呼び出し回数を記録します
+class FakeInteraction:
+    def __init__(self, guild_id: int = 1, user_id: int = 42):
+        self.guild_id = guild_id
+        self.channel_id = 1
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.expires_at = self.created_at + datetime.timedelta(minutes=15)
+        self.user = FakeUser(user_id)
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.channel = FakeChannel(self)
+        self.sent: list[Optional[str]] = []
+        self.calls = 0
+
+    async def original_response(self) -> FakeMessage:
+        self.calls += 1
+        return FakeMessage(self.sent[0] if self.sent else None, self)
+
+    async def edit_original_response(self, content: Optional[str] = None, **kwargs):
+        self.calls += 1
+        self.sent.append(content)
+
+# @fn make_jar
+# @brief Forge 形式のダミー mod jar を作る
+# @param mod_id modId
+# @param entries 水増し用のエントリ数（大きな jar の再現）
+# @param entry_size 各エントリのバイト数
+# @return jar のバイト列
+def make_jar(mod_id: str, entries: int = 200, entry_size: int = 512) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for i in range(entries):
+            z.writestr(f"com/example/{mod_id}/C{i}.class", bytes(entry_size))
+        z.writestr(
+            "META-INF/mods.toml",
+            f'modLoader="javafml"\nloaderVersion="[47,)"\n[[mods]]\nmodId="{mod_id}"\nversion="1.0.0"\ndisplayName="{mod_id}"\n'
+            f'[[dependencies.{mod_id}]]\nmodId="forge"\nmandatory=true\nversionRange="[47,)"\n',
+        )
+    return buf.getvalue()
+
+# @class AttachmentServer
+# @brief 添付ファイルの CDN を模したローカル HTTP サーバー
+class AttachmentServer:
+    def __init__(self):
+        self.files: dict[str, bytes] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.base = ""
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/{name}", self._get)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]  # 0 番で待ち受けたため実際のポートを取得する
+        self.base = f"http://127.0.0.1:{port}"
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _get(self, request: web.Request) -> web.Response:
+        data = self.files[request.match_info["name"]]
+        return web.Response(body=data, content_type="application/java-archive")
+
+    # @fn attachment
+    # @brief ファイルを登録して discord.Attachment 相当のオブジェクトを返す
+    # @param filename 添付ファイル名
+    # @param data ファイル内容
+    # @return url / filename / size を持つオブジェクト
+    def attachment(self, filename: str, data: bytes) -> SimpleNamespace:
+        self.files[filename] = data
+        return SimpleNamespace(url=f"{self.base}/{filename}", filename=filename, size=len(data))
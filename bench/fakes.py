@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import struct
+from typing import Callable, Optional
+
+# @class FakeRconServer
+# @brief Source RCON プロトコルを話すローカルのダミーサーバー
+# @details LOGIN を password で検証し、COMMAND には on_command の戻り値（既定はエコー）を同じリクエストIDで返します。
+#          それ以外の種別には本物と同じく Unknown request を返します
+class FakeRconServer:
+    def __init__(self, password: str = "bench", latency: float = 0.0, on_command: Optional[Callable[[str], str]] = None):
+        self.password = password
+        self.latency = latency
+        self.on_command = on_command or (lambda cmd: f"ok: {cmd}")
+        self.commands = 0
+        self.logins = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    @staticmethod
+    def _packet(req_id: int, ptype: int, body: bytes) -> bytes:
+        return struct.pack("<iii", len(body) + 10, req_id, ptype) + body + b"\x00\x00"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                (length,) = struct.unpack("<i", await reader.readexactly(4))
+                data = await reader.readexactly(length)
+                req_id, ptype = struct.unpack_from("<ii", data)
+                body = data[8:-2].decode("utf-8", errors="replace")
+                if ptype == 3:  # LOGIN
+                    self.logins += 1
+                    writer.write(self._packet(req_id if body == self.password else -1, 2, b""))
+                elif ptype == 2:  # COMMAND
+                    self.commands += 1
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    out = self.on_command(body)
+                    for i in range(0, max(len(out), 1), 4096):  # 本物と同じく 4096 文字で分割
+                        writer.write(self._packet(req_id, 0, out[i:i + 4096].encode("utf-8")))
+                else:  # 本物と同じく未定義の種別にはエラー文を 1 パケットで返す
+                    writer.write(self._packet(req_id, 0, f"Unknown request {ptype:x}".encode("utf-8")))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        out.append(b | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+async def _read_varint(reader: asyncio.StreamReader) -> int:
+    n = shift = 0
+    while True:
+        b = (await reader.readexactly(1))[0]
+        n |= (b & 0x7F) << shift
+        shift += 7
+        if not b & 0x80:
+            return n
+
+# @class FakeSlpServer
+# @brief Server List Ping に応答するダミーの Minecraft サーバー
+# @details ハンドシェイク後の Status Request に JSON を返し、Ping にはそのままの値で Pong を返します
+class FakeSlpServer:
+    def __init__(self, players: int = 3, max_players: int = 20, version: str = "1.20.1", latency: float = 0.0):
+        self.status = {
+            "version": {"name": version, "protocol": 763},
+            "players": {"online": players, "max": max_players},
+            "description": {"text": "bench"},
+        }
+        self.latency = latency
+        self.requests = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    @staticmethod
+    def _frame(payload: bytes) -> bytes:
+        return _varint(len(payload)) + payload
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                length = await _read_varint(reader)
+                data = await reader.readexactly(length)
+                packet_id = data[0]
+                if packet_id == 0x00 and len(data) > 1:
+                    continue  # ハンドシェイク
+                if packet_id == 0x00:  # Status Request
+                    self.requests += 1
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    body = json.dumps(self.status).encode("utf-8")
+                    writer.write(self._frame(b"\x00" + _varint(len(body)) + body))
+                elif packet_id == 0x01:  # Ping
+                    writer.write(self._frame(b"\x01" + data[1:9]))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+# Forge サーバーの起動ログを模した行（{mod} は mod ごとに展開）
+STARTUP_LINES = [
+    "[main/INFO] [cpw.mods.modlauncher.Launcher/MODLAUNCHER]: ModLauncher running: args [--launchTarget, forgeserver]",
+    "[main/INFO] [net.minecraftforge.fml.loading.moddiscovery.ModDiscoverer/SCAN]: Found mod file {mod}-1.0.jar of type MOD",
+    "[main/INFO] [cpw.mods.modlauncher.LaunchServiceHandler/MODLAUNCHER]: Launching target 'forgeserver' with arguments []",
+    "[modloading-worker-0/INFO] [{mod}/]: Constructing {mod}",
+    "[modloading-worker-0/INFO] [net.minecraftforge.common.ForgeMod/FORGEMOD]: Forge common setup",
+    "[Server thread/INFO] [minecraft/DedicatedServer]: Starting minecraft server version 1.20.1",
+    "[Server thread/INFO] [minecraft/MinecraftServer]: Preparing level \"world\"",
+    "[Server thread/INFO] [minecraft/DedicatedServer]: Done (12.345s)! For help, type \"help\"",
+]
+
+# @class SyntheticLog
+# @brief latest.log への高頻度書き込みとローテーションを再現するライター
+class SyntheticLog:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "a").close()
+        self.lines_written = 0
+
+    def write(self, lines: list[str]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(f"[00:00:00] {line}\n" for line in lines))
+        self.lines_written += len(lines)
+
+    def rotate(self):
+        n = 1
+        while os.path.exists(f"{self.path}.{n}"):
+            n += 1
+        os.replace(self.path, f"{self.path}.{n}")
+        open(self.path, "w").close()
+
+    # @fn noise
+    # @brief 指定レートでノイズ行を書き続ける
+    # @param rate 1 秒あたりの行数
+    # @param duration 書き続ける秒数
+    # @param rotate_every この行数ごとにローテーションする（0 なら行わない）
+    # @return なし
+    async def noise(self, rate: int, duration: float, rotate_every: int = 0):
+        batch = max(1, rate // 100)  # 10ms ごとにまとめて書く
+        loop = asyncio.get_running_loop()
+        end = loop.time() + duration
+        since_rotate = 0
+        while loop.time() < end:
+            self.write([f"[Server thread/INFO]: noise line {self.lines_written + i}" for i in range(batch)])
+            since_rotate += batch
+            if rotate_every and since_rotate >= rotate_every:
+                self.rotate()
+                since_rotate = 0
+            await asyncio.sleep(0.01)
+
+    # @fn startup
+    # @brief Forge の起動ログを書き出す
+    # @param mods 起動ログに登場させる modId
+    # @param delay 各フェーズの間隔（秒）
+    # @return なし
+    async def startup(self, mods: list[str], delay: float = 0.01):
+        for template in STARTUP_LINES:
+            if "{mod}" in template:
+                self.write([template.format(mod=m) for m in mods])
+            else:
+                self.write([template])
+            await asyncio.sleep(delay)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# @file run.py
+# @brief ローカルのダミーサーバーを相手に Bot の主要処理の性能を測るベンチマーク
+# @details 使い方: python -m bench.run [--quick] [--json out.json]
+#          本物の Minecraft サーバーや Discord には接続せず、RCON / Server List Ping / latest.log / 添付ファイル CDN を
+#          すべてローカルのダミーで置き換えて、レイテンシのパーセンタイルとスループットを表示します
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from typing import Awaitable, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.driver import AttachmentServer, FakeInteraction, make_jar  # noqa: E402
+from bench.fakes import FakeRconServer, FakeSlpServer, SyntheticLog  # noqa: E402
+
+# @fn summarize
+# @brief レイテンシの標本から統計値を求める
+# @param name ベンチマーク名
+# @param samples 1 回ごとのレイテンシ（秒）
+# @param wall 全体の経過時間（秒）
+# @return 統計値の辞書（ミリ秒）
+def summarize(name: str, samples: list[float], wall: float) -> dict:
+    s = sorted(samples)
+    pct = lambda p: s[min(len(s) - 1, int(round(p / 100 * (len(s) - 1))))] * 1000
+    return {
+        "name": name,
+        "n": len(s),
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": s[-1] * 1000,
+        "mean_ms": statistics.fmean(s) * 1000,
+        "ops_per_s": len(s) / wall if wall > 0 else 0.0,
+    }
+
+# @fn measure
+# @brief 非同期処理を指定回数・並列度で実行して計測する
+# @param name ベンチマーク名
+# @param fn 計測対象のコルーチン関数（引数は試行番号）
+# @param n 試行回数
+# @param concurrency 同時実行数
+# @return summarize の結果
+async def measure(name: str, fn: Callable[[int], Awaitable[object]], n: int, concurrency: int = 1) -> dict:
+    samples: list[float] = []
+    counter = iter(range(n))
+
+    async def worker():
+        for i in counter:
+            t0 = time.perf_counter()
+            await fn(i)
+            samples.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, samples, time.perf_counter() - start)
+
+def _print_table(results: list[dict]):
+    header = f"{'benchmark':<36}{'n':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ops/s':>12}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['name']:<36}{r['n']:>7}{r['p50_ms']:>10.3f}{r['p90_ms']:>10.3f}"
+            f"{r['p99_ms']:>10.3f}{r['max_ms']:>10.3f}{r['ops_per_s']:>12.1f}"
+        )
+
+async def _bench_log_match(log: SyntheticLog, tail_log_until, n: int, rate: int) -> dict:
+    noise = asyncio.create_task(log.noise(rate, duration=3600, rotate_every=rate * 2))  # 高頻度の書き込みとローテーション中に計測
+    samples: list[float] = []
+    start = time.perf_counter()
+    try:
+        for i in range(n):
+            marker = f"bench-marker-{i}.jar"
+            waiter = asyncio.create_task(tail_log_until(marker, 10))
+            await asyncio.sleep(0.02)  # 購読の登録を待つ
+            t0 = time.perf_counter()
+            log.write([f"[Server thread/INFO]: loaded {marker}"])
+            if not await waiter:
+                raise RuntimeError("log match timed out")
+            samples.append(time.perf_counter() - t0)
+    finally:
+        noise.cancel()
+    return summarize(f"tail_log_until ({rate} lines/s)", samples, time.perf_counter() - start)
+
+async def main(args: argparse.Namespace) -> list[dict]:
+    scale = 0.1 if args.quick else 1.0
+    n = lambda base: max(3, int(base * scale))
+
+    work = tempfile.mkdtemp(prefix="mdc-bench-")
+    log = SyntheticLog(os.path.join(work, "logs", "latest.log"))
+    mod_ids = [f"benchmod{i}" for i in range(50)]
+
+    def on_command(cmd: str) -> str:
+        if cmd == "stop":  # stop を受けたら起動ログを流してサーバー再起動を再現
+            asyncio.get_running_loop().create_task(log.startup(mod_ids))
+            return "Stopping the server"
+        return f"ok: {cmd}"
+
+    rcon_srv = FakeRconServer(on_command=on_command)
+    slp_srv = FakeSlpServer()
+    extra_slp = [FakeSlpServer(latency=0.05) for _ in range(3)]  # /status all 用の応答の遅いサーバー
+    files = AttachmentServer()
+    rcon_port = await rcon_srv.start()
+    slp_port = await slp_srv.start()
+    extra_ports = [await s.start() for s in extra_slp]
+    await files.start()
+
+    servers_file = os.path.join(work, "servers.toml")
+    with open(servers_file, "w", encoding="utf-8") as f:
+        for name, port in [("main", slp_port)] + [(f"extra{i}", p) for i, p in enumerate(extra_ports)]:
+            f.write(
+                f'[servers.{name}]\nrcon_host = "127.0.0.1"\nrcon_port = {rcon_port}\nrcon_password = "{rcon_srv.password}"\n'
+                f'query_port = {port}\nlog_path = "{log.path}"\nmods_dir = "{os.path.join(work, "mods")}"\n\n'
+            )  # 先頭の main が既定サーバー
+
+    os.environ.update({
+        "DISCORD_TOKEN": "bench",
+        "SERVERS_FILE": servers_file,
+        "RESTART_METHOD": "RCON",
+        "RESTART_COUNTDOWN_SECONDS": "0",
+        "STARTUP_TIMEOUT_SECONDS": "30",
+        "DATA_DIR": os.path.join(work, "data"),
+    })  # コマンド・サービスのモジュールは import 時に settings を読む（サーバー一覧も作る）ため、ダミーを起動してから import する
+
+    import discord
+    from discord import app_commands
+    from minecraft_discord_controller.commands import restart as restart_cmd
+    from minecraft_discord_controller.commands import status as status_cmd
+    from minecraft_discord_controller.commands import uploadmod as uploadmod_cmd
+    from minecraft_discord_controller.commands import uploadmods as uploadmods_cmd
+    from minecraft_discord_controller.service import minecraft as mc
+    from minecraft_discord_controller.service.jobs import scheduler
+    from minecraft_discord_controller.service.mods import extract_mod_metadata
+
+    tree = app_commands.CommandTree(discord.Client(intents=discord.Intents.default()))
+    uploadmod_cmd.register(tree)
+    uploadmods_cmd.register(tree)
+    restart_cmd.register(tree)
+    status_cmd.register(tree)
+    uploadmod = tree.get_command("uploadmod")
+    uploadmods = tree.get_command("uploadmods")
+    restart = tree.get_command("restart")
+    status = tree.get_command("status")
+
+    results = []
+    results.append(await measure("rcon_command (sequential)", lambda i: mc.rcon_command(f"list {i}"), n(2000)))
+    results.append(await measure("rcon_command (64 in flight)", lambda i: mc.rcon_command(f"list {i}"), n(5000), 64))
+    results.append(await measure("query_status (cached)", lambda i: mc.query_status(), n(5000)))
+    results.append(await measure("status probe (uncached)", lambda i: mc.servers.default.status_poller.refresh(), n(500)))
+
+    async def do_status_all(i: int):
+        for ctx in mc.servers:
+            ctx.status_poller.last = None  # キャッシュを捨てて全台へ問い合わせさせる
+        inter = FakeInteraction()
+        await status.callback(inter, server="all")
+        if "extra2" not in (inter.sent[-1] or ""):
+            raise RuntimeError(f"status all failed: {inter.sent[-1]}")
+
+    results.append(await measure("/status all (4 servers, uncached)", do_status_all, n(200)))
+    results.append(await _bench_log_match(log, mc.tail_log_until, n(50), args.log_rate))
+
+    jar_dir = os.path.join(work, "jars")
+    os.makedirs(jar_dir)
+    jar_paths = []
+    for i in range(20):
+        p = os.path.join(jar_dir, f"meta{i}.jar")
+        with open(p, "wb") as f:
+            f.write(make_jar(f"meta{i}", entries=2000, entry_size=64))
+        jar_paths.append(p)
+    results.append(await measure(
+        "extract_mod_metadata (2000 entries)",
+        lambda i: asyncio.to_thread(extract_mod_metadata, jar_paths[i % len(jar_paths)]),
+        n(500),
+    ))
+
+    payload = {m: make_jar(m, entries=400, entry_size=8192) for m in mod_ids[:10]}  # 1 つ約 3 MiB
+
+    async def do_upload(i: int):
+        mod = mod_ids[i % 10]
+        inter = FakeInteraction()
+        await uploadmod.callback(inter, files.attachment(f"{mod}-1.0.jar", payload[mod]))
+        await scheduler.join()  # アップロードはジョブとして非同期に進む
+        if "配置しました" not in (inter.sent[-1] or ""):
+            raise RuntimeError(f"upload failed: {inter.sent[-1]}")
+
+    results.append(await measure("/uploadmod flow (~3 MiB)", do_upload, n(30)))
+
+    bundle = io.BytesIO()
+    with zipfile.ZipFile(bundle, "w") as z:  # jar は圧縮済みなので格納のみ
+        for k in range(20):
+            z.writestr(f"overrides/mods/pack{k}-1.0.jar", make_jar(f"pack{k}", entries=100, entry_size=8192))
+    loose = {m: make_jar(f"loose-{m}", entries=100, entry_size=8192) for m in mod_ids[:4]}
+
+    async def do_upload_batch(i: int):
+        inter = FakeInteraction()
+        jars = [files.attachment(f"loose-{m}-{i}.jar", data) for m, data in loose.items()]  # 毎回ファイル名を変えて旧版の置き換えを発生させる
+        await uploadmods.callback(inter, files.attachment(f"pack{i}.zip", bundle.getvalue()), *jars)
+        await scheduler.join()
+        if "配置しました" not in (inter.sent[-1] or ""):
+            raise RuntimeError(f"batch upload failed: {inter.sent[-1]}")
+
+    results.append(await measure("/uploadmods flow (24 jars)", do_upload_batch, n(10)))
+
+    async def do_restart(i: int):
+        inter = FakeInteraction()
+        await restart.callback(inter, watch=True)
+        await scheduler.join()
+        if "✅" not in (inter.sent[-1] or ""):
+            raise RuntimeError(f"restart failed: {inter.sent[-1]}")
+
+    results.append(await measure("/restart flow (countdown 0)", do_restart, n(20)))
+
+    await mc.servers.close()
+    await files.close()
+    await rcon_srv.close()
+    await slp_srv.close()
+    for s in extra_slp:
+        await s.close()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="minecraft_discord_controller benchmarks")
+    parser.add_argument("--quick", action="store_true", help="試行回数を 1/10 にする")
+    parser.add_argument("--log-rate", type=int, default=20000, help="ログ照合ベンチ中のノイズ行数/秒")
+    parser.add_argument("--json", help="結果を JSON で保存するパス")
+    args = parser.parse_args()
+    results = asyncio.run(main(args))
+    _print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
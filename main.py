@@ -4,7 +4,10 @@ import discord
 from discord.ext import commands
 
 from minecraft_discord_controller.config import settings
-from minecraft_discord_controller.commands import register_all_commands
+from minecraft_discord_controller.commands import register_all_commands, sync_commands
+from minecraft_discord_controller.commands.uploadmod import upload_history
+from minecraft_discord_controller.service.minecraft import servers
+from minecraft_discord_controller.utils.metrics import start_metrics_server
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("minecraft_discord_controller")
@@ -12,13 +15,26 @@ log = logging.getLogger("minecraft_discord_controller")
 intents = discord.Intents.default()
 bot = commands.Bot(command_prefix="!", intents=intents)
 
+@bot.event
+# @fn setup_hook
+# @brief ゲートウェイ接続前の初期化フック
+# @details スラッシュコマンドを一度だけ登録し、定義が変わっていれば同期します。
+#          全サーバーのバックグラウンドのステータスポーラーを起動し、アップロード履歴を読み込みます。METRICS_PORT が設定されていればメトリクスエンドポイントも起動します
+# @return なし
+async def setup_hook():
+    register_all_commands(bot)  # 再接続のたびに発火する on_ready ではなくここで一度だけ登録
+    await sync_commands(bot, settings)  # 前回の同期から定義が変わった場合のみ tree.sync
+    servers.start()  # /status のキャッシュを温めておく
+    await upload_history.open()  # ギルドごとの最新アップロードをキャッシュへ読み込む
+    if settings.METRICS_PORT:
+        await start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+
 @bot.event
 # @fn on_ready
 # @brief Bot の起動完了イベント
-# @details register_all_commands を実行して tree を同期し、ログへ bot ユーザー情報を出力します
+# @details ゲートウェイへの再接続でも呼ばれるため、ログへ bot ユーザー情報を出力するだけにします
 # @return なし
 async def on_ready():
-    await register_all_commands(bot, settings)  # Bot起動時にすべてのスラッシュコマンドを登録
     log.info(f"Logged in as {bot.user}")
 
 if __name__ == "__main__":
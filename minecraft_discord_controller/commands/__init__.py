@@ -1,4 +1,8 @@
+import asyncio
+import hashlib
+import json
 import logging
+import os
 import discord
 from discord import app_commands
 from discord.ext import commands
@@ -6,31 +10,87 @@ from discord.ext import commands
 from minecraft_discord_controller.config import Settings
 from .status import register as register_status
 from .uploadmod import register as register_uploadmod
+from .uploadmods import register as register_uploadmods
 from .restart import register as register_restart
 from .lastmod import register as register_lastmod
+from .mods import register as register_mods
+from .uploads import register as register_uploads
+from .botstats import register as register_botstats
+from .logs import register as register_logs
+from .perf import register as register_perf
+from .jobs import register as register_jobs
 
 
 log = logging.getLogger(__name__)
 
+COMMAND_HASH_FILE = "command_tree.json"  # 最後に同期したコマンド定義のハッシュ
+
 # @fn register_all_commands
-# @brief すべてのスラッシュコマンドを登録する
-# @details 各コマンドモジュールの register を呼び出し CommandTree にバインドし、ギルド指定の有無で tree.sync を切り替えます
+# @brief すべてのスラッシュコマンドを CommandTree に登録する
+# @details 各コマンドモジュールの register を呼び出します。Discord への同期は sync_commands で別に行います
 # @param bot コマンド登録対象の Discord Bot インスタンス
-# @param settings 設定値を保持する Settings オブジェクト
 # @return なし
-async def register_all_commands(bot: commands.Bot, settings: Settings):
+def register_all_commands(bot: commands.Bot):
     tree: app_commands.CommandTree = bot.tree
     register_status(tree)  # ステータスコマンドを登録
     register_uploadmod(tree)  # モッドアップロードコマンドを登録
+    register_uploadmods(tree)  # モッド一括アップロードコマンドを登録
     register_restart(tree)  # 再起動コマンドを登録
     register_lastmod(tree)  # 最後のモッド表示コマンドを登録
+    register_mods(tree)  # mod一覧コマンドを登録
+    register_uploads(tree)  # アップロード履歴コマンドを登録
+    register_botstats(tree)  # レイテンシ集計コマンドを登録
+    register_logs(tree)  # ログ検索コマンドを登録
+    register_perf(tree)  # 性能推移コマンドを登録
+    register_jobs(tree)  # ジョブ一覧コマンドを登録
+
+# @fn command_tree_hash
+# @brief 同期対象のコマンド定義のハッシュを求める
+# @details tree.sync が送信するのと同じペイロードを正規化した JSON にして SHA-256 を取ります
+# @param tree 対象の CommandTree
+# @param guild ギルド同期の場合の対象ギルド
+# @return 16 進のハッシュ文字列
+def command_tree_hash(tree: app_commands.CommandTree, guild: discord.abc.Snowflake | None = None) -> str:
+    payload = [cmd.to_dict(tree) for cmd in tree.get_commands(guild=guild)]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _load_hashes(path: str) -> dict[str, str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_hashes(path: str, hashes: dict[str, str]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(hashes, f, indent=2)
+    os.replace(tmp, path)
+
+# @fn sync_commands
+# @brief コマンド定義が変わった場合だけ Discord へ同期する
+# @details 前回同期したコマンド定義のハッシュを DATA_DIR の command_tree.json に保存し、同じであれば tree.sync を省略します。
+#          ギルド指定の有無で同期先を切り替え、アプリケーション ID と同期先ごとにハッシュを分けて記録します
+# @param bot 同期対象の Discord Bot インスタンス（ログイン済み）
+# @param settings 設定値を保持する Settings オブジェクト
+# @return 同期を実行した場合は True
+async def sync_commands(bot: commands.Bot, settings: Settings) -> bool:
+    tree: app_commands.CommandTree = bot.tree
+    guild = discord.Object(id=int(settings.GUILD_ID)) if settings.GUILD_ID else None
+    scope = f"{bot.application_id}:{settings.GUILD_ID or 'global'}"
+    path = os.path.join(settings.DATA_DIR, COMMAND_HASH_FILE)
+    digest = command_tree_hash(tree, guild)
+    hashes = await asyncio.to_thread(_load_hashes, path)
+    if hashes.get(scope) == digest:
+        log.info(f"Slash commands unchanged ({scope}), skipping sync.")
+        return False
     try:
-        if settings.GUILD_ID:
-            guild = discord.Object(id=int(settings.GUILD_ID))
-            await tree.sync(guild=guild)  # ギルド限定でコマンドを同期
-            log.info("Slash commands synced (guild).")
-        else:
-            await tree.sync()  # グローバルでコマンドを同期
-            log.info("Slash commands synced (global).")
+        await tree.sync(guild=guild)  # ギルド指定があればギルド限定、無ければグローバルでコマンドを同期
+        log.info(f"Slash commands synced ({'guild' if guild else 'global'}).")
     except Exception as e:
         log.error(f"Slash command sync failed: {e}")
+        return False
+    hashes[scope] = digest
+    await asyncio.to_thread(_save_hashes, path, hashes)
+    return True
@@ -0,0 +1,69 @@
+import discord
+from discord import app_commands
+
+from minecraft_discord_controller.utils.metrics import (
+    COMMAND_CANCELLED, COMMAND_ERRORS, COMMAND_SECONDS, FILE_SECONDS, INTERACTION_LAG, JOB_FAILURES, JOB_SECONDS, JOB_WAIT_SECONDS, LOG_DISPATCH_SECONDS,
+    LOG_WAIT_SECONDS, PROGRESS_EDITS, RCON_ERRORS, RCON_SECONDS, STATUS_PROBE_SECONDS, Histogram, instrumented,
+)
+from minecraft_discord_controller.utils.permissions import ensure_allowed
+
+# @fn format_histogram
+# @brief ヒストグラム 1 つを表示用の 1 行にする
+# @details p50/p95 はバケット上限による近似値のため「≤」を付けて表示します
+# @param label 行の見出し
+# @param h 表示する Histogram
+# @param errors エラー件数（無い場合は None）
+# @param cancelled キャンセル件数（無い場合は None）
+# @return 整形済みの文字列
+def format_histogram(label: str, h: Histogram, errors: int | None = None, cancelled: int | None = None) -> str:
+    err = (f" エラー{errors}" if errors else "") + (f" キャンセル{cancelled}" if cancelled else "")
+    if not h.count:
+        return f"{label}: 記録なし{err}"
+    ms = lambda v: "∞" if v == float("inf") else f"{v * 1000:g}ms"
+    return (
+        f"{label}: {h.count}回{err} 平均 {h.sum / h.count * 1000:.1f}ms"
+        f" p50≤{ms(h.quantile(0.5))} p95≤{ms(h.quantile(0.95))}"
+    )
+
+# @fn register
+# @brief /botstats コマンドをツリーへ登録する
+# @param tree コマンド登録先の CommandTree
+# @return なし
+def register(tree: app_commands.CommandTree):
+    # @fn botstats
+    # @brief コマンドとバックエンド処理のレイテンシ集計を表示する
+    # @param inter コマンドを実行した Interaction
+    # @return なし
+    @tree.command(name="botstats", description="Botのコマンド・バックエンド処理のレイテンシを表示します")
+    @instrumented("botstats")
+    async def botstats(inter: discord.Interaction):
+        if not await ensure_allowed(inter):
+            return
+        lines = ["**コマンド**"]
+        for (name,), h in sorted(COMMAND_SECONDS.children.items()):
+            errors = COMMAND_ERRORS.children.get((name,))
+            cancelled = COMMAND_CANCELLED.children.get((name,))
+            lines.append(format_histogram(
+                f"`/{name}`", h, errors.value if errors else None, cancelled.value if cancelled else None,
+            ))
+        lag = Histogram()
+        for h in INTERACTION_LAG.children.values():  # 全コマンド分を合算して表示
+            lag.merge(h)
+        lines.append(format_histogram("受信遅延", lag))
+        lines.append("**バックエンド**")
+        lines.append(format_histogram("RCON", RCON_SECONDS, RCON_ERRORS.value))
+        lines.append(format_histogram("ステータス問い合わせ", STATUS_PROBE_SECONDS))
+        for (result,), h in sorted(LOG_WAIT_SECONDS.children.items()):
+            lines.append(format_histogram(f"ログ待ち({result})", h))
+        lines.append(format_histogram("ログ配信(1バッチ)", LOG_DISPATCH_SECONDS))
+        for (op,), h in sorted(FILE_SECONDS.children.items()):
+            lines.append(format_histogram(f"ファイル({op})", h))
+        kinds = sorted({k for (k,) in JOB_SECONDS.children} | {k for (k,) in JOB_FAILURES.children})  # 下準備で失敗したジョブも含める
+        if kinds:
+            lines.append("**ジョブ**")
+            for kind in kinds:
+                failures = JOB_FAILURES.children.get((kind,))
+                lines.append(format_histogram(f"{kind}", JOB_SECONDS.labels(kind), failures.value if failures else None))
+                lines.append(format_histogram(f"{kind}(待ち)", JOB_WAIT_SECONDS.labels(kind)))
+            lines.append(f"進捗メッセージの編集: {PROGRESS_EDITS.value}回")
+        await inter.response.send_message("\n".join(lines), ephemeral=True)
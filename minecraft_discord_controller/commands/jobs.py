@@ -0,0 +1,70 @@
+import time
+import discord
+from discord import app_commands
+
+from minecraft_discord_controller.service.jobs import Job, JobState, scheduler
+from minecraft_discord_controller.utils.metrics import instrumented
+from minecraft_discord_controller.utils.permissions import ensure_allowed
+
+# @fn format_job
+# @brief ジョブを一覧用の 1 行にする
+# @param job 表示する Job
+# @return 整形済みの文字列
+def format_job(job: Job) -> str:
+    line = f"`#{job.id}` `{job.server}` {job.title} — **{job.state.value}**"
+    if job.state == JobState.QUEUED:
+        ahead = scheduler.blockers(job)
+        if ahead:
+            line += f"（{', '.join(f'#{j.id}' for j in ahead)} 待ち）"
+    elif job.started_at is not None:
+        line += f" {job.elapsed:.0f}s"
+    if job.error:
+        line += f": {job.error[:100]}"
+    return f"{line} by {job.user}" if job.user else line
+
+# @fn job_autocomplete
+# @brief キャンセルできるジョブの入力候補を返す
+# @param inter 入力中の Interaction
+# @param current 入力中の文字列
+# @return 入力候補のリスト
+async def job_autocomplete(inter: discord.Interaction, current: int | str) -> list[app_commands.Choice[int]]:
+    return [
+        app_commands.Choice(name=f"#{j.id} {j.server} {j.kind} ({j.state.value})", value=j.id)
+        for j in scheduler.active.values() if str(current or "") in str(j.id)
+    ][:25]
+
+# @fn register
+# @brief /jobs コマンドをツリーへ登録する
+# @param tree コマンド登録先の CommandTree
+# @return なし
+def register(tree: app_commands.CommandTree):
+    # @fn jobs
+    # @brief 実行中・待機中のジョブと最近終わったジョブを表示する
+    # @details cancel を指定した場合はそのジョブをキャンセルします（再起動は停止処理中を除く）
+    # @param inter コマンドを実行した Interaction
+    # @param cancel キャンセルするジョブ番号
+    # @return なし
+    @tree.command(name="jobs", description="実行中・待機中のジョブを表示します")
+    @app_commands.describe(cancel="キャンセルするジョブ番号")
+    @app_commands.autocomplete(cancel=job_autocomplete)
+    @instrumented("jobs")
+    async def jobs(inter: discord.Interaction, cancel: int | None = None):
+        if not await ensure_allowed(inter):
+            return
+        if cancel is not None:
+            job = scheduler.active.get(cancel)
+            if job is None:
+                msg = f"ジョブ #{cancel} は実行中・待機中ではありません。"
+            elif scheduler.cancel(cancel):
+                msg = f"ジョブ #{cancel}（{job.title}）をキャンセルしました。"
+            else:
+                msg = f"ジョブ #{cancel}（{job.title}）は現在キャンセルできません（{job.state.value}）。"
+            await inter.response.send_message(msg, ephemeral=True)
+            return
+        lines = ["**実行中・待機中**"]
+        lines += [format_job(j) for j in scheduler.active.values()] or ["なし"]
+        recent = [j for j in reversed(scheduler.finished) if j.finished_at and time.time() - j.finished_at < 3600][:10]
+        if recent:
+            lines.append("**最近終わったジョブ（1時間以内）**")
+            lines += [format_job(j) for j in recent]
+        await inter.response.send_message("\n".join(lines)[:2000], ephemeral=True)
@@ -1,15 +1,24 @@
 import discord
 from discord import app_commands
-from minecraft_discord_controller.commands.uploadmod import get_last_uploaded
+from minecraft_discord_controller.commands.uploadmod import upload_history
+from minecraft_discord_controller.commands.uploads import format_record
+from minecraft_discord_controller.utils.metrics import instrumented
 from minecraft_discord_controller.utils.permissions import ensure_allowed
+from minecraft_discord_controller.utils.servers import resolve_server, server_autocomplete
 
 # @brief 最後のモッド表示コマンドをDiscordコマンドツリーに登録する
 # @param tree Discordアプリケーションコマンドツリー
 # @details 最後にアップロードしたモッドファイル名を表示するスラッシュコマンドを登録します
 def register(tree: app_commands.CommandTree):
     @tree.command(name="lastmod", description="最後にアップロードしたmodファイル名を表示します")
-    async def lastmod(inter: discord.Interaction):
+    @app_commands.describe(server="対象サーバー（default: 既定のサーバー）")
+    @app_commands.autocomplete(server=server_autocomplete)
+    @instrumented("lastmod")
+    async def lastmod(inter: discord.Interaction, server: str | None = None):
         if not await ensure_allowed(inter):
             return
-        name = get_last_uploaded(inter.guild_id)  # 最後にアップロードしたJARファイル名を取得
-        await inter.response.send_message(name or "（記録なし）", ephemeral=True)  # 記録がない場合は「記録なし」を表示
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        rec = upload_history.latest(inter.guild_id, ctx.name)  # 最後にアップロードした記録をキャッシュから取得
+        await inter.response.send_message(format_record(rec) if rec else "（記録なし）", ephemeral=True)  # 記録がない場合は「記録なし」を表示
@@ -0,0 +1,83 @@
+import io
+import time
+import discord
+from discord import app_commands
+
+from minecraft_discord_controller.service.jobs import LOGS, Job, scheduler
+from minecraft_discord_controller.service.logsearch import LogQuery, format_report, parse_time, rank_messages, search_logs
+from minecraft_discord_controller.utils.metrics import instrumented
+from minecraft_discord_controller.utils.permissions import ensure_allowed
+from minecraft_discord_controller.utils.progress import ProgressMessage
+from minecraft_discord_controller.utils.servers import resolve_server, server_autocomplete
+
+# @fn register
+# @brief /logs コマンドをツリーへ登録する
+# @param tree コマンド登録先の CommandTree
+# @return なし
+def register(tree: app_commands.CommandTree):
+    # @fn logs
+    # @brief サーバーログを検索して結果を添付ファイルで返す
+    # @details latest.log を末尾から、足りなければローテーション済みの *.log.gz をワーカープロセスで並列に検索します。
+    #          検索はジョブとして投入し、同じサーバーのログ検索は 1 つずつ実行します
+    # @param inter コマンドを実行した Interaction
+    # @param query 検索キーワードまたは正規表現
+    # @param regex query を正規表現として扱うかどうか
+    # @param since 期間の開始（30m / 2h / 3d / 2026-10-18 12:00 など）
+    # @param until 期間の終了
+    # @param limit 返す最大件数（新しい順）
+    # @param server 対象サーバー名
+    # @return なし
+    @tree.command(name="logs", description="サーバーログを検索します")
+    @app_commands.describe(
+        query="検索キーワード（regex:True で正規表現）",
+        regex="query を正規表現として扱う(default: False)",
+        since="期間の開始（例: 30m, 2h, 3d, 2026-10-18 12:00）",
+        until="期間の終了（省略時は現在）",
+        limit="最大件数（新しい順、default: 200）",
+        server="対象サーバー（default: 既定のサーバー）",
+    )
+    @app_commands.autocomplete(server=server_autocomplete)
+    @instrumented("logs")
+    async def logs(
+        inter: discord.Interaction,
+        query: str,
+        regex: bool = False,
+        since: str | None = None,
+        until: str | None = None,
+        limit: app_commands.Range[int, 1, 5000] = 200,
+        server: str | None = None,
+    ):
+        if not await ensure_allowed(inter):
+            return
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        now = time.time()
+        try:
+            q = LogQuery(
+                query, regex=regex, limit=limit,
+                since=parse_time(since, now) if since else None,
+                until=parse_time(until, now) if until else None,
+            )
+            q.compile()  # 正規表現の誤りは検索前に伝える
+        except Exception as e:
+            await inter.response.send_message(f"検索条件が不正です: {e}", ephemeral=True)
+            return
+        progress = await ProgressMessage.open(inter, f"`{ctx.name}` のログを検索中…")
+
+        async def body(job: Job):
+            result = await search_logs(ctx.config.log_path, q)
+            if not result.hits:
+                await progress.finish(
+                    f"`{ctx.name}` のログに一致する行はありません（{result.files_scanned}ファイル走査、{result.elapsed:.1f}s）。"
+                )
+                return
+            top = rank_messages(result.hits, 3)
+            summary = "\n".join(f"`{c}×` {msg[:150]}" for c, msg in top)
+            fp = io.BytesIO(format_report(q, result).encode("utf-8"))
+            await progress.finish(
+                f"`{ctx.name}` のログ検索: {len(result.hits)}件（{result.files_scanned}ファイル走査、{result.elapsed:.1f}s）\n{summary}",
+                file=discord.File(fp, filename="logs.txt"),
+            )
+
+        scheduler.submit("logs", ctx.name, (LOGS,), body, title=f"ログ検索 `{query[:40]}`", user=str(inter.user), progress=progress)
@@ -0,0 +1,232 @@
+import asyncio
+import io
+import time
+import discord
+from discord import app_commands
+
+from minecraft_discord_controller.service.jobs import INDEX, MODS, Job, scheduler
+from minecraft_discord_controller.service.minecraft import servers
+from minecraft_discord_controller.service.mod_index import IndexedJar
+from minecraft_discord_controller.service.modstore import Snapshot, SnapshotNotFound, diff_snapshots
+from minecraft_discord_controller.service.servers import UnknownServer
+from minecraft_discord_controller.utils.metrics import instrumented
+from minecraft_discord_controller.utils.permissions import ensure_allowed
+from minecraft_discord_controller.utils.progress import ProgressMessage
+from minecraft_discord_controller.utils.servers import resolve_server, server_autocomplete
+
+_INLINE_LIMIT = 1900  # これを超える一覧は添付ファイルで返す
+
+# @fn _format_entry
+# @brief インデックスの 1 エントリを一覧用の 1 行にする
+# @param e 表示する IndexedJar
+# @return 整形済みの文字列
+def _format_entry(e: IndexedJar) -> str:
+    if e.mod is None:
+        return f"- `{e.filename}`（メタデータなし）"
+    return f"- **{e.mod.name}** `{e.mod.mod_id}` v{e.mod.version} [{e.mod.loader}] `{e.filename}`"
+
+# @fn _format_snapshot
+# @brief スナップショットを一覧用の 1 行にする
+# @param snap 表示する Snapshot
+# @param current アクティブなスナップショットの ID
+# @return 整形済みの文字列
+def _format_snapshot(snap: Snapshot, current: str | None) -> str:
+    mark = "▶" if snap.id == current else "-"
+    note = f" {snap.note}" if snap.note else ""
+    return f"{mark} `{snap.id}` <t:{int(snap.created_at)}:f> {len(snap.jars)}個{note}"
+
+# @fn format_diff
+# @brief 2 つのスナップショットの差分を表示用の行にする
+# @param old 比較元
+# @param new 比較先
+# @return 各行のリスト（差分が無い場合は空）
+def format_diff(old: Snapshot, new: Snapshot) -> list[str]:
+    d = diff_snapshots(old, new)
+    lines = [f"+ `{n}`" for n in d.added]
+    lines += [f"- `{n}`" for n in d.removed]
+    lines += [f"~ `{n}` ({old.jars[n][:12]} → {new.jars[n][:12]})" for n in d.changed]
+    return lines
+
+# @fn snapshot_autocomplete
+# @brief スナップショット ID の入力候補を新しい順に返す
+# @details 同じコマンドで入力済みの server オプションを参照して対象サーバーを決めます
+# @param inter 入力中の Interaction
+# @param current 入力中の文字列
+# @return 入力候補のリスト
+async def snapshot_autocomplete(inter: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    try:
+        ctx = servers.get(getattr(inter.namespace, "server", None))
+    except UnknownServer:
+        return []
+    ids = [i for i in reversed(await asyncio.to_thread(ctx.snapshots.ids)) if current in i]  # 入力ごとに呼ばれるためループを止めない
+    return [app_commands.Choice(name=i, value=i) for i in ids[:25]]
+
+# @fn send_long
+# @brief 長さに応じて本文か添付ファイルで最終結果を表示する
+# @param progress 結果を表示する ProgressMessage
+# @param header 本文の見出し
+# @param lines 本文の各行
+# @param filename 添付する場合のファイル名
+# @return なし
+async def send_long(progress: ProgressMessage, header: str, lines: list[str], filename: str):
+    body = "\n".join(lines)
+    if len(header) + len(body) < _INLINE_LIMIT:
+        await progress.finish(f"{header}\n{body}")
+    else:
+        fp = io.BytesIO(body.encode("utf-8"))
+        await progress.finish(header, file=discord.File(fp, filename=filename))
+
+# @fn register
+# @brief /mods コマンドグループをツリーへ登録する
+# @details mods ディレクトリのメタデータインデックスやスナップショットを扱うサブコマンドをまとめた Group を追加します
+# @param tree コマンド登録先の CommandTree
+# @return なし
+def register(tree: app_commands.CommandTree):
+    group = app_commands.Group(name="mods", description="サーバーのmodを管理します")
+
+    # @fn mods_list
+    # @brief 導入済み mod を一覧表示する
+    # @details インデックスを差分更新（変更された jar のみ解析）してから一覧を返します
+    # @param inter コマンドを実行した Interaction
+    # @param query modId / 表示名 / ファイル名の部分一致フィルタ
+    # @param server 対象サーバー名
+    # @return なし
+    @group.command(name="list", description="導入済みのmodを一覧表示します")
+    @app_commands.describe(query="modId・名前・ファイル名で絞り込み（部分一致）", server="対象サーバー（default: 既定のサーバー）")
+    @app_commands.autocomplete(server=server_autocomplete)
+    @instrumented("mods list")
+    async def mods_list(inter: discord.Interaction, query: str | None = None, server: str | None = None):
+        if not await ensure_allowed(inter):
+            return
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        progress = await ProgressMessage.open(inter, f"`{ctx.name}` のmodを確認中…")
+
+        async def body(job: Job):
+            await ctx.mod_index.refresh()  # 変更があった jar だけ再解析
+            entries = ctx.mod_index.sorted_entries()
+            if query:
+                q = query.lower()
+                entries = [
+                    e for e in entries
+                    if q in e.filename.lower() or (e.mod and (q in (e.mod.mod_id or "").lower() or q in (e.mod.name or "").lower()))
+                ]
+            header = f"{ctx.name} のmod一覧（{len(entries)}件）"
+            await send_long(progress, header, [_format_entry(e) for e in entries], "mods.txt")
+
+        scheduler.submit("reindex", ctx.name, (INDEX,), body, title="modインデックス更新", user=str(inter.user), progress=progress)
+
+    # @fn mods_snapshot
+    # @brief mods ディレクトリの現在の内容をスナップショットとして記録する
+    # @details 初回は既存の mods ディレクトリをストアへ取り込んでスナップショット管理へ移行し、最近のスナップショット一覧も返します
+    # @param inter コマンドを実行した Interaction
+    # @param note スナップショットの説明
+    # @param server 対象サーバー名
+    # @return なし
+    @group.command(name="snapshot", description="現在のmod構成をスナップショットとして記録します")
+    @app_commands.describe(note="スナップショットの説明（指定すると変更が無くても記録）", server="対象サーバー（default: 既定のサーバー）")
+    @app_commands.autocomplete(server=server_autocomplete)
+    @instrumented("mods snapshot")
+    async def mods_snapshot(inter: discord.Interaction, note: str | None = None, server: str | None = None):
+        if not await ensure_allowed(inter):
+            return
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        progress = await ProgressMessage.open(inter, f"`{ctx.name}` のスナップショットを作成中…")
+
+        async def body(job: Job):
+            snap, created = await ctx.snapshots.snapshot(note or "")
+            head = f"スナップショット `{snap.id}` を作成しました。" if created else f"変更はありません（現在のスナップショット `{snap.id}`）。"
+            recent = await asyncio.to_thread(ctx.snapshots.recent, 10)  # 新しい順に直近10件
+            await send_long(progress, f"{head}\n`{ctx.name}` のスナップショット", [_format_snapshot(s, snap.id) for s in recent], "snapshots.txt")
+
+        scheduler.submit("snapshot", ctx.name, (MODS,), body, title="スナップショット作成", user=str(inter.user), progress=progress)
+
+    # @fn mods_diff
+    # @brief 2 つのスナップショットの jar 構成を比較する
+    # @param inter コマンドを実行した Interaction
+    # @param base 比較元の ID（default: target の作成元）
+    # @param target 比較先の ID（default: 現在のスナップショット）
+    # @param server 対象サーバー名
+    # @return なし
+    @group.command(name="diff", description="スナップショット間のmodの差分を表示します")
+    @app_commands.describe(
+        base="比較元のスナップショット（default: 比較先の1つ前）",
+        target="比較先のスナップショット（default: 現在）",
+        server="対象サーバー（default: 既定のサーバー）",
+    )
+    @app_commands.autocomplete(base=snapshot_autocomplete, target=snapshot_autocomplete, server=server_autocomplete)
+    @instrumented("mods diff")
+    async def mods_diff(inter: discord.Interaction, base: str | None = None, target: str | None = None, server: str | None = None):
+        if not await ensure_allowed(inter):
+            return
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        snapshots = ctx.snapshots
+
+        def load() -> tuple[Snapshot | None, Snapshot | None]:
+            new = snapshots.get(target) if target else snapshots.current()
+            if new is None:
+                return None, None
+            if base:
+                return snapshots.get(base), new
+            return (snapshots.get(new.parent) if new.parent else None), new
+
+        try:
+            old, new = await asyncio.to_thread(load)  # マニフェストの読み込みでループを止めない
+            if new is None:
+                await inter.response.send_message("まだスナップショットがありません（`/mods snapshot` で作成できます）。", ephemeral=True)
+                return
+            if old is None:
+                await inter.response.send_message(f"`{new.id}` には比較元がありません。`base` を指定してください。", ephemeral=True)
+                return
+        except SnapshotNotFound as e:
+            await inter.response.send_message(f"スナップショット `{e.args[0]}` は見つかりません。", ephemeral=True)
+            return
+        lines = format_diff(old, new)
+        header = f"`{ctx.name}` `{old.id}` → `{new.id}`（{len(lines)}件の差分）"
+        progress = await ProgressMessage.open(inter, header)
+        await send_long(progress, header, lines or ["差分はありません。"], "diff.txt")
+
+    # @fn mods_rollback
+    # @brief mods ディレクトリを以前のスナップショットへ戻す
+    # @details シンボリックリンクを差し替えるだけで、jar の再転送は行いません。実行中の再起動やアップロードがあれば終わってから切り替えます。
+    #          反映には /restart が必要です
+    # @param inter コマンドを実行した Interaction
+    # @param snapshot 戻す先の ID（default: 現在のスナップショットの作成元）
+    # @param server 対象サーバー名
+    # @return なし
+    @group.command(name="rollback", description="modの構成を以前のスナップショットへ戻します")
+    @app_commands.describe(snapshot="戻す先のスナップショット（default: 1つ前）", server="対象サーバー（default: 既定のサーバー）")
+    @app_commands.autocomplete(snapshot=snapshot_autocomplete, server=server_autocomplete)
+    @instrumented("mods rollback")
+    async def mods_rollback(inter: discord.Interaction, snapshot: str | None = None, server: str | None = None):
+        if not await ensure_allowed(inter):
+            return
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        progress = await ProgressMessage.open(inter, f"`{ctx.name}` のmodsを切り替え中…")
+
+        async def body(job: Job):
+            t0 = time.perf_counter()
+            try:
+                target, prev = await ctx.snapshots.rollback(snapshot)
+            except SnapshotNotFound:
+                what = f"スナップショット `{snapshot}`" if snapshot else "戻す先のスナップショット"
+                await progress.finish(f"{what}が見つかりません。", failed=True)
+                return
+            elapsed = (time.perf_counter() - t0) * 1000
+            lines = format_diff(prev, target) if prev else []
+            header = (
+                f"`{ctx.name}` の mods を `{prev.id if prev else '-'}` → `{target.id}` に切り替えました（{elapsed:.0f}ms）。"
+                "`/restart` で反映されます。"
+            )
+            await send_long(progress, header, lines, "rollback.txt")
+
+        scheduler.submit("rollback", ctx.name, (MODS,), body, title="ロールバック", user=str(inter.user), progress=progress)
+
+    tree.add_command(group)
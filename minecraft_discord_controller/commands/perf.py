@@ -0,0 +1,87 @@
+import asyncio
+import time
+import discord
+from discord import app_commands
+
+from minecraft_discord_controller.service.perf import ENTITIES, MSPT, PLAYERS, TPS, PerfSample, WindowStats
+from minecraft_discord_controller.utils.metrics import instrumented
+from minecraft_discord_controller.utils.permissions import ensure_allowed
+from minecraft_discord_controller.utils.servers import resolve_server, server_autocomplete
+
+WINDOWS = (("1h", 3600, 12), ("24h", 86400, 24), ("7d", 7 * 86400, 28))  # (表示名, 秒数, 推移グラフの点数)
+_BARS = "▁▂▃▄▅▆▇█"
+
+# @fn _fmt
+# @brief 集計値を min/avg/max の形にする
+# @param s 表示する WindowStats（無い場合は None）
+# @param digits 小数点以下の桁数
+# @return 整形済みの文字列
+def _fmt(s: WindowStats | None, digits: int) -> str:
+    if s is None:
+        return "-"
+    return f"{s.min:.{digits}f}/{s.avg:.{digits}f}/{s.max:.{digits}f}"
+
+# @fn sparkline
+# @brief TPS の推移を 1 行のブロック文字にする
+# @details 0〜20 TPS を 8 段階に割り当て、サンプルの無い区間は空白にします
+# @param values 古い順の平均 TPS
+# @return 推移を表す文字列
+def sparkline(values: list[float | None]) -> str:
+    return "".join(" " if v is None else _BARS[min(len(_BARS) - 1, max(0, int(v / 20 * len(_BARS))))] for v in values)
+
+# @fn format_latest
+# @brief 直近のサンプルを 1 行にする
+# @param s 表示する PerfSample
+# @return 整形済みの文字列
+def format_latest(s: PerfSample) -> str:
+    parts = []
+    if s.tps is not None:
+        parts.append(f"TPS {s.tps:.1f}")
+    if s.mspt is not None:
+        parts.append(f"MSPT {s.mspt:.1f}ms")
+    if s.players is not None:
+        parts.append(f"プレイヤー {s.players}/{s.players_max}")
+    if s.entities is not None:
+        parts.append(f"エンティティ {s.entities}")
+    return f"{' / '.join(parts) or '値なし'}（<t:{int(s.wall_time)}:R>）"
+
+# @fn register
+# @brief /perf コマンドをツリーへ登録する
+# @param tree コマンド登録先の CommandTree
+# @return なし
+def register(tree: app_commands.CommandTree):
+    # @fn perf
+    # @brief TPS・MSPT・プレイヤー数・エンティティ数の推移を表示する
+    # @details 1h / 24h / 7d の min/avg/max と TPS の推移に加え、期間中に作られた mods のスナップショットを並べて表示します
+    # @param inter コマンドを実行した Interaction
+    # @param server 対象サーバー名
+    # @return なし
+    @tree.command(name="perf", description="サーバーのTPS・MSPT・プレイヤー数の推移を表示します")
+    @app_commands.describe(server="対象サーバー（default: 既定のサーバー）")
+    @app_commands.autocomplete(server=server_autocomplete)
+    @instrumented("perf")
+    async def perf(inter: discord.Interaction, server: str | None = None):
+        if not await ensure_allowed(inter):
+            return
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        sampler = ctx.perf
+        if sampler.last is None:
+            why = "サンプリングが無効です（`PERF_SAMPLE_INTERVAL_SECONDS`）" if sampler.interval <= 0 else "まだサンプルがありません"
+            await inter.response.send_message(f"`{ctx.name}`: {why}。", ephemeral=True)
+            return
+        rows = [f"{'':<4} {'TPS min/avg/max':<17} {'MSPT(ms)':<20} {'players':<11} entities"]  # 全角文字は幅がずれるので見出しは英字
+        for label, seconds, _ in WINDOWS:
+            st = sampler.stats(seconds)
+            rows.append(
+                f"{label:<4} {_fmt(st[TPS], 1):<17} {_fmt(st[MSPT], 1):<20} {_fmt(st[PLAYERS], 0):<11} {_fmt(st[ENTITIES], 0)}"
+            )
+        graphs = [f"{label:<4} |{sparkline(sampler.series(seconds, points))}|" for label, seconds, points in WINDOWS]
+        lines = [f"`{ctx.name}` の性能: {format_latest(sampler.last)}", "```", *rows, "", "TPS推移（左が古い）", *graphs, "```"]
+        since = time.time() - WINDOWS[-1][1]
+        changes = [s for s in await asyncio.to_thread(ctx.snapshots.recent, 10) if s.created_at >= since]  # 期間中のmod構成の変更（新しい順）
+        if changes:
+            lines.append("mods の変更:")
+            lines += [f"- <t:{int(s.created_at)}:f> `{s.id}` {s.note}" for s in changes]
+        await inter.response.send_message("\n".join(lines), ephemeral=True)
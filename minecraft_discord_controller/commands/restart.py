@@ -2,11 +2,14 @@ import asyncio
 import discord
 from discord import app_commands
 
-from minecraft_discord_controller.config import settings
+from minecraft_discord_controller.utils.metrics import instrumented
 from minecraft_discord_controller.utils.permissions import ensure_allowed
-from minecraft_discord_controller.service.minecraft import (
-    restart_via_rcon, restart_via_local_systemd, tail_log_until
-)
+from minecraft_discord_controller.utils.servers import resolve_server, server_autocomplete
+from minecraft_discord_controller.service.mod_deps import check_mods
+from minecraft_discord_controller.service.restart import RestartInProgress, RestartOrchestrator, RestartState
+from minecraft_discord_controller.service.startup import StartupTimeline, format_timeline, load_previous
+from minecraft_discord_controller.service.jobs import LIFECYCLE, MODS, Job, scheduler
+from minecraft_discord_controller.utils.progress import ProgressMessage
 from minecraft_discord_controller.commands.uploadmod import get_last_uploaded
 
 # @fn register
@@ -17,43 +20,98 @@ from minecraft_discord_controller.commands.uploadmod import get_last_uploaded
 def register(tree: app_commands.CommandTree):
     # @fn restart
     # @brief サーバーを再起動し、起動を監視する
-    # @details 権限チェック後に RESTART_METHOD に応じて RCON か systemd を実行し、tail_log_until でヒントに基づいてログを監視します
+    # @details 再起動をジョブとして投入し、同じサーバーのアップロードやロールバックが終わってから実行します。
+    #          mod 構成の事前検査の後に RestartOrchestrator で再起動し、起動フェーズの進捗を 1 つの公開メッセージの編集で表示します
     # @param inter コマンドを実行した Interaction
     # @param watch 直近のアップロード jar を監視ヒントに使うかどうか
+    # @param force 依存関係エラーがあっても再起動するかどうか
+    # @param cancel 実行中の再起動をキャンセルするかどうか
+    # @param server 対象サーバー名
     # @return なし
     @tree.command(name="restart", description="サーバーを再起動し、mod読み込みを監視します")
-    @app_commands.describe(watch="直近のアップロードjarを監視ヒントに使う(推奨)(default: True)")
-    async def restart(inter: discord.Interaction, watch: bool = True):
+    @app_commands.describe(
+        watch="直近のアップロードjarを監視ヒントに使う(推奨)(default: True)",
+        force="modの依存関係エラーがあっても再起動する(default: False)",
+        cancel="実行中の再起動をキャンセルする(default: False)",
+        server="対象サーバー（default: 既定のサーバー）",
+    )
+    @app_commands.autocomplete(server=server_autocomplete)
+    @instrumented("restart")
+    async def restart(
+        inter: discord.Interaction, watch: bool = True, force: bool = False, cancel: bool = False, server: str | None = None
+    ):
         if not await ensure_allowed(inter):
             return
-        await inter.response.defer(thinking=True)  # 処理に時間がかかることを通知
-
-        filename_hint = get_last_uploaded(inter.guild_id) if watch else None  # 監視対象のJARファイル名を取得
-
-        try:
-            if settings.RESTART_METHOD == "LOCAL_SYSTEMD":
-                restart_via_local_systemd()  # systemd経由で再起動
-            else:
-                await inter.followup.send(
-                    f"再起動を開始します（{settings.RESTART_COUNTDOWN_SECONDS}s後にstop）。",
-                    ephemeral=True
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        restarter, mod_index = ctx.restarter, ctx.mod_index
+        pending = scheduler.find(ctx.name, "restart")
+        if cancel:
+            if pending is None:
+                await inter.response.send_message("キャンセルできる再起動はありません。", ephemeral=True)
+            elif scheduler.cancel(pending.id):
+                await inter.response.send_message(f"再起動ジョブ #{pending.id} をキャンセルしました（{pending.state.value}）。", ephemeral=True)
+            else:  # stop の送信・systemctl restart の実行中は中断するとサーバーが中途半端な状態になる
+                await inter.response.send_message(
+                    f"再起動ジョブ #{pending.id} は{restarter.state.value}のため、今はキャンセルできません。起動監視に移ってから再度お試しください。",
+                    ephemeral=True,
                 )
-                loop = asyncio.get_running_loop()
-                await loop.run_in_executor(None, lambda: restart_via_rcon(settings.RESTART_COUNTDOWN_SECONDS))  # RCON経由で再起動（別スレッドで実行）
-        except Exception as e:
-            await inter.followup.send(f"再起動に失敗: {e}", ephemeral=True)
             return
+        if pending is not None:  # 同じサーバーの再起動を重ねない
+            await inter.response.send_message(
+                f"既に再起動ジョブ #{pending.id} があります（{pending.state.value}）。", ephemeral=True
+            )
+            return
+        progress = await ProgressMessage.open(inter, f"`{ctx.name}` の再起動を準備中…", ephemeral=False)
 
-        await inter.followup.send(
-            f"起動を監視中…（タイムアウト {settings.STARTUP_TIMEOUT_SECONDS}s）",
-            ephemeral=True
-        )
+        async def body(job: Job):
+            await mod_index.refresh()  # 変更された jar だけ再解析
+            report = check_mods(mod_index.mods())  # 再起動前に依存関係と競合を検査
+            if not report.ok and not force:
+                await progress.finish(
+                    f"`{ctx.name}` のmodの構成に問題があるため再起動を中止しました（`force:True` で強行できます）。\n" + report.format(),
+                    failed=True,
+                )
+                return
+            notes = report.format() + "\n" if (report.errors or report.warnings) else ""
+            filename_hint = get_last_uploaded(inter.guild_id, ctx.name) if watch else None  # 先に並んでいたアップロードも反映された後に取得
+            previous = await asyncio.to_thread(load_previous, ctx.startup_history_path)  # 前回の起動記録と比較する
 
-        hint = filename_hint or "Done"  # ヒントがない場合は"Done"を監視
-        loaded = await tail_log_until(hint, settings.STARTUP_TIMEOUT_SECONDS)  # ログを監視して起動・モッド読み込みを検知
+            def render(r: RestartOrchestrator, t: StartupTimeline) -> str:
+                head = f"{notes}`{ctx.name}` 状態: **{r.state.value}**（ジョブ #{job.id}）"
+                if r.state == RestartState.COUNTDOWN:
+                    head += f"（{r.countdown}s後にstop、`/restart cancel:True` で中止）"
+                elif r.state == RestartState.BOOTING:
+                    head += f"（タイムアウト {r.timeout}s）"
+                return f"{head}\n{format_timeline(t, previous)}"
 
-        ch: discord.abc.MessageableChannel = inter.channel
-        if loaded:
-            await ch.send("✅ サーバー起動＆モッド読み込みを検知しました。")
-        else:
-            await ch.send("⚠️ 起動/読み込みの検知に失敗しました（タイムアウト）。ログを確認してください。")
+            async def on_update(r: RestartOrchestrator, t: StartupTimeline):
+                progress.update(render(r, t))  # 連続する更新はまとめて 1 回の編集にする
+
+            try:
+                result = await restarter.run(
+                    (e.mod.mod_id for e in mod_index.entries.values() if e.mod), filename_hint, on_update
+                )
+            except RestartInProgress:
+                await progress.finish("既に再起動処理中です。", failed=True)
+                return
+
+            if result.state == RestartState.DONE:
+                hint_note = f"（`{result.timeline.hint}` の読み込みも確認）" if result.timeline.hint_seen else ""
+                outcome = f"✅ `{ctx.name}` のサーバー起動＆モッド読み込みを検知しました。{hint_note}"
+            elif result.state == RestartState.FAILED:
+                outcome = f"❌ `{ctx.name}` の再起動に失敗: {result.error}"
+            elif result.state == RestartState.CANCELLED:
+                outcome = f"⏹️ `{ctx.name}` の再起動（または起動監視）はキャンセルされました。"
+            else:
+                outcome = f"⚠️ `{ctx.name}` の起動/読み込みの検知に失敗しました（タイムアウト）。ログを確認してください。"
+            await progress.finish(
+                f"{notes}{outcome}\n{format_timeline(result.timeline, previous)}",
+                failed=result.state in (RestartState.FAILED, RestartState.TIMEOUT),
+            )
+
+        scheduler.submit(
+            "restart", ctx.name, (MODS, LIFECYCLE), body,
+            title="再起動", user=str(inter.user), progress=progress, on_cancel=restarter.cancel,
+        )
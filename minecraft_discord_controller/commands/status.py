@@ -1,16 +1,68 @@
 import discord
 from discord import app_commands
-from minecraft_discord_controller.service.minecraft import query_status
+from minecraft_discord_controller.service.minecraft import query_all_status
+from minecraft_discord_controller.service.status_poller import StatusSnapshot, format_status
+from minecraft_discord_controller.utils.metrics import instrumented
 from minecraft_discord_controller.utils.permissions import ensure_allowed
+from minecraft_discord_controller.utils.servers import ALL_SERVERS, resolve_server, server_autocomplete
+
+# @fn format_status_table
+# @brief 複数サーバーのステータスを 1 つの表にする
+# @param rows (サーバー名, StatusSnapshot) のリスト
+# @return コードブロックで囲んだ表
+def format_status_table(rows: list[tuple[str, StatusSnapshot]]) -> str:
+    width = max([len("server")] + [len(name) for name, _ in rows])
+    lines = [f"{'server':<{width}}  state    players  version          ping    age"]
+    for name, snap in rows:
+        if snap.online:
+            players = f"{snap.players_online}/{snap.players_max}"
+            lines.append(
+                f"{name:<{width}}  online   {players:<7}  {(snap.version or '')[:15]:<15}  {snap.latency_ms or 0:>4.0f}ms  {int(snap.age):>3}s"
+            )
+        else:
+            lines.append(f"{name:<{width}}  offline  {'-':<7}  {'-':<15}  {'-':>6}  {int(snap.age):>3}s")
+    return "```\n" + "\n".join(lines) + "\n```"
 
 # @brief ステータスコマンドをDiscordコマンドツリーに登録する
 # @param tree Discordアプリケーションコマンドツリー
 # @details サーバーの状態を表示するスラッシュコマンドを登録します
 def register(tree: app_commands.CommandTree):
+    async def status_server_autocomplete(inter: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        choices = await server_autocomplete(inter, current)
+        if ALL_SERVERS.startswith(current.lower()):
+            choices.insert(0, app_commands.Choice(name=ALL_SERVERS, value=ALL_SERVERS))  # 全サーバー一覧を先頭に出す
+        return choices[:25]
+
     @tree.command(name="status", description="サーバーの状態を表示します")
-    async def status(inter: discord.Interaction):
+    @app_commands.describe(
+        server="対象サーバー（all で全サーバーを一覧表示、default: 既定のサーバー）",
+        history="オンライン/オフラインの遷移履歴も表示する(default: False)",
+    )
+    @app_commands.autocomplete(server=status_server_autocomplete)
+    @instrumented("status")
+    async def status(inter: discord.Interaction, server: str | None = None, history: bool = False):
         if not await ensure_allowed(inter):
             return
-        await inter.response.defer(thinking=True, ephemeral=True)  # 処理中であることを通知（他人には見えない）
-        msg = query_status()  # サーバーのステータス情報を取得
-        await inter.followup.send(msg, ephemeral=True)  # ステータス情報を送信（他人には見えない）
+        if server == ALL_SERVERS:
+            await inter.response.defer(thinking=True, ephemeral=True)
+            rows = await query_all_status()  # 全サーバーを並行して取得（古いキャッシュのみ問い合わせ）
+            await inter.followup.send(format_status_table([(ctx.name, snap) for ctx, snap in rows]), ephemeral=True)
+            return
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        poller = ctx.status_poller
+        if poller.last is None or poller.last.age > poller.stale_after:
+            await inter.response.defer(thinking=True, ephemeral=True)  # キャッシュが古い場合のみ問い合わせ待ちを通知
+        snap = await poller.get()  # キャッシュ済みのステータス情報を取得（古ければ再取得）
+        msg = f"{format_status(snap)}\n（{int(snap.age)}秒前時点）"
+        if history and poller.history:
+            lines = [
+                f"<t:{int(t.wall_time)}:f> {'🟢 Online' if t.online else '🔴 Offline'}"
+                for t in list(poller.history)[-10:]
+            ]  # 直近10件の遷移を表示
+            msg += "\n" + "\n".join(lines)
+        if inter.response.is_done():
+            await inter.followup.send(msg, ephemeral=True)  # ステータス情報を送信（他人には見えない）
+        else:
+            await inter.response.send_message(msg, ephemeral=True)
@@ -1,31 +1,54 @@
+import asyncio
 import os
-import tempfile
 import discord
 from discord import app_commands
 
 from minecraft_discord_controller.config import settings
+from minecraft_discord_controller.utils.metrics import instrumented
 from minecraft_discord_controller.utils.permissions import ensure_allowed
-from minecraft_discord_controller.service.minecraft import local_copy_to_mods
-from minecraft_discord_controller.service.mods import extract_mod_metadata
+from minecraft_discord_controller.utils.servers import resolve_server, server_autocomplete
+from minecraft_discord_controller.service.mod_deps import DependencyReport, check_mods
+from minecraft_discord_controller.service.history import UploadHistory, UploadRecord
+from minecraft_discord_controller.service.mods import ModInfo, read_mod_info
+from minecraft_discord_controller.service.uploads import StagedUpload, stream_to_staging
+from minecraft_discord_controller.service.jobs import MODS, Job, scheduler
+from minecraft_discord_controller.utils.progress import ProgressMessage
 
-_last_uploaded_jar: dict[int, str] = {}  # ギルドごとの最後にアップロードしたJARファイル名を記録
+upload_history = UploadHistory(os.path.join(settings.DATA_DIR, "uploads.db"))  # ギルドごとのアップロード履歴（SQLite）
 
 # @fn get_last_uploaded
-# @brief ギルドごとの最後にアップロードした jar 名を取得する
-# @details ギルドIDをキーに保持しているメモリ上の辞書から、最新に記録されたファイル名を返します
+# @brief ギルド・サーバーごとの最後にアップロードした jar 名を取得する
+# @details 履歴ストアがメモリに保持している最新レコードから、DB に触れずにファイル名を返します
 # @param guild_id ギルドID
+# @param server サーバー名
 # @return 最後に記録された jar 名。存在しない場合は None
-def get_last_uploaded(guild_id: int) -> str | None:
-    return _last_uploaded_jar.get(guild_id)
+def get_last_uploaded(guild_id: int, server: str) -> str | None:
+    rec = upload_history.latest(guild_id, server)
+    return rec.filename if rec else None
 
 # @fn set_last_uploaded
-# @brief 最後にアップロードした jar 名を記録する
-# @details ギルドIDをキーとした辞書に jar 名を上書き保存し、後続の参照に備えます
-# @param guild_id ギルドID
+# @brief アップロードを履歴に記録する
+# @details ファイル名・ハッシュ・サイズ・アップロード者・メタデータを履歴ストアへ追記し、最新レコードのキャッシュも更新します
+# @param inter アップロードを実行した Interaction
 # @param name 記録する jar ファイル名
+# @param staged 配置したファイルの StagedUpload
+# @param info 抽出したメタデータ（無い場合は None）
+# @param server 配置先のサーバー名
 # @return なし
-def set_last_uploaded(guild_id: int, name: str):
-    _last_uploaded_jar[guild_id] = name
+async def set_last_uploaded(inter: discord.Interaction, name: str, staged: StagedUpload, info: ModInfo | None, server: str):
+    await upload_history.add(UploadRecord(
+        guild_id=inter.guild_id,
+        filename=name,
+        sha256=staged.sha256,
+        size=staged.size,
+        uploader_id=inter.user.id,
+        uploader_name=str(inter.user),
+        mod_id=info.mod_id if info else None,
+        mod_name=info.name if info else None,
+        mod_version=info.version if info else None,
+        loader=info.loader if info else None,
+        server=server,
+    ))
 
 # @fn register
 # @brief /uploadmod コマンドをツリーへ登録する
@@ -35,35 +58,74 @@ def set_last_uploaded(guild_id: int, name: str):
 def register(tree: app_commands.CommandTree):
     # @fn uploadmod
     # @brief モッド jar をアップロードして配置する
-    # @details ensure_allowed で権限を確認し、添付 jar を一時ディレクトリへ保存してメタデータ抽出後、local_copy_to_mods で mods へコピーします
+    # @details ensure_allowed で権限を確認し、アップロードをジョブとして投入します。ダウンロードとメタデータ抽出は待たずに進め、
+    #          依存関係の事前検査・ストアへの格納・スナップショットの切り替えは同じサーバーの mods を変更する他のジョブと順番に行います
     # @param inter コマンドを実行した Interaction
     # @param jar 添付された mod jar ファイル
+    # @param server 配置先のサーバー名
     # @return なし
     @tree.command(name="uploadmod", description="modのjarをアップロードしてサーバーに配置します")
-    @app_commands.describe(jar="Forge/Fabric の .jar ファイルを添付してください")
-    async def uploadmod(inter: discord.Interaction, jar: discord.Attachment):
+    @app_commands.describe(jar="Forge/Fabric の .jar ファイルを添付してください", server="配置先サーバー（default: 既定のサーバー）")
+    @app_commands.autocomplete(server=server_autocomplete)
+    @instrumented("uploadmod")
+    async def uploadmod(inter: discord.Interaction, jar: discord.Attachment, server: str | None = None):
         if not await ensure_allowed(inter):
             return
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        snapshots, mod_index = ctx.snapshots, ctx.mod_index
         if not jar.filename.lower().endswith(".jar"):  # JARファイルかどうかをチェック
             await inter.response.send_message("`.jar` 以外は受け付けません。", ephemeral=True)
             return
 
-        await inter.response.defer(thinking=True, ephemeral=True)  # 処理に時間がかかることを通知
+        if jar.size > settings.MAX_UPLOAD_BYTES:  # 申告サイズで先に弾く
+            await inter.response.send_message(f"ファイルが大きすぎます（上限 {settings.MAX_UPLOAD_BYTES} bytes）。", ephemeral=True)
+            return
 
-        with tempfile.TemporaryDirectory() as td:  # 一時ディレクトリを作成
-            local_path = os.path.join(td, jar.filename)
-            data = await jar.read()  # Discordから添付ファイルをダウンロード
-            with open(local_path, "wb") as f:
-                f.write(data)  # 一時ディレクトリにファイルを保存
+        progress = await ProgressMessage.open(inter, f"`{jar.filename}` を受信中…")
+        staged: StagedUpload | None = None
+        info: ModInfo | None = None
 
-            mod_name, mod_ver = extract_mod_metadata(local_path)  # JARファイルからメタデータを抽出
+        async def prepare(job: Job):
+            nonlocal staged, info
+            try:
+                staged = await stream_to_staging(jar.url, snapshots.store.tmp_dir, settings.MAX_UPLOAD_BYTES)  # ストア内の一時ファイルへストリーミング保存
+            except Exception as e:
+                await progress.finish(f"アップロード失敗: {e}", failed=True)
+                return
+            job.cleanups.append(staged.discard)  # 格納済みなら何もしない
+            info = await asyncio.to_thread(read_mod_info, staged.path)  # JARファイルからメタデータを抽出
 
+        async def body(job: Job):
             try:
-                local_copy_to_mods(local_path, settings.MC_MODS_DIR, jar.filename)  # modsディレクトリにコピー
+                await mod_index.refresh()
+                before = check_mods(mod_index.mods())
+                after = check_mods(mod_index.mods(replace={jar.filename: info}))  # 配置前に依存関係と競合を検査
+                stored = await asyncio.to_thread(snapshots.store.add_staged, staged)  # 同じ内容が既にあれば一時ファイルを捨てるだけ
+                snap = await snapshots.commit({jar.filename: staged.sha256}, note=f"upload {jar.filename}")  # 新しいスナップショットへ原子的に切り替え
             except Exception as e:
-                await inter.followup.send(f"アップロード失敗: {e}", ephemeral=True)
+                await progress.finish(f"アップロード失敗: {e}", failed=True)
                 return
 
-        set_last_uploaded(inter.guild_id, jar.filename)  # 最後にアップロードしたファイル名を記録
-        pretty = f"**{mod_name}** v{mod_ver}" if mod_name else f"`{jar.filename}`"  # メタデータがある場合は整形
-        await inter.followup.send(f"{pretty} を `mods/` に配置しました。再起動で反映されます。", ephemeral=True)
+            await set_last_uploaded(inter, jar.filename, staged, info, ctx.name)  # アップロード履歴に記録
+            pretty = f"**{info.name}** v{info.version}" if info and info.name else f"`{jar.filename}`"  # メタデータがある場合は整形
+            reused = "" if stored else "、同じ内容の jar を再利用"
+            msg = (
+                f"{pretty} を `{ctx.name}` の `mods/` に配置しました（スナップショット `{snap.id}`、sha256: `{staged.sha256[:12]}`{reused}）。"
+                "再起動で反映されます。"
+            )
+            introduced = DependencyReport(
+                errors=[e for e in after.errors if e not in before.errors],
+                warnings=[w for w in after.warnings if w not in before.warnings],
+            )  # このアップロードで新たに生じた問題だけを伝える
+            if introduced.errors or introduced.warnings:
+                msg += "\n" + introduced.format()
+                if introduced.errors:
+                    msg += "\nこのままでは `/restart` は中止されます。"
+            await progress.finish(msg)
+
+        scheduler.submit(
+            "upload", ctx.name, (MODS,), body,
+            prepare=prepare, title=f"アップロード `{jar.filename}`", user=str(inter.user), progress=progress,
+        )
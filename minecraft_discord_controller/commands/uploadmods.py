@@ -0,0 +1,207 @@
+import asyncio
+import discord
+from discord import app_commands
+
+from minecraft_discord_controller.config import settings
+from minecraft_discord_controller.utils.metrics import instrumented
+from minecraft_discord_controller.utils.permissions import ensure_allowed
+from minecraft_discord_controller.utils.servers import resolve_server, server_autocomplete
+from minecraft_discord_controller.service.bundles import RemoteJar, extract_bundle, fetch_remote, is_bundle
+from minecraft_discord_controller.service.mod_deps import DependencyReport, check_mods
+from minecraft_discord_controller.service.mods import ModInfo, map_jars, read_mod_info
+from minecraft_discord_controller.service.uploads import StagedUpload, stream_to_staging
+from minecraft_discord_controller.service.jobs import MODS, Job, scheduler
+from minecraft_discord_controller.utils.progress import ProgressMessage
+from .mods import send_long
+from .uploadmod import set_last_uploaded
+
+# @fn check_batch
+# @brief バッチ内の jar の重複を検査する
+# @details 同じ内容・同じファイル名の jar は 1 つにまとめ、ファイル名または modId が同じで内容の異なる jar があればエラーにします
+# @param items (ファイル名, StagedUpload, ModInfo) のリスト
+# @return (重複を除いたリスト, エラーメッセージのリスト)
+def check_batch(items: list[tuple[str, StagedUpload, ModInfo | None]]) -> tuple[list[tuple[str, StagedUpload, ModInfo | None]], list[str]]:
+    by_name: dict[str, StagedUpload] = {}
+    by_mod: dict[str, str] = {}
+    out, errors = [], []
+    for name, staged, info in items:
+        if name in by_name:
+            if by_name[name].sha256 != staged.sha256:
+                errors.append(f"`{name}` が内容の異なる複数のファイルに含まれています")
+            continue
+        by_name[name] = staged
+        if info and info.mod_id:
+            if info.mod_id in by_mod:
+                errors.append(f"modId `{info.mod_id}` の jar が複数あります（`{by_mod[info.mod_id]}`, `{name}`）")
+                continue
+            by_mod[info.mod_id] = name
+        out.append((name, staged, info))
+    return out, errors
+
+# @fn register
+# @brief /uploadmods コマンドをツリーへ登録する
+# @param tree コマンド登録先の CommandTree
+# @return なし
+def register(tree: app_commands.CommandTree):
+    # @fn uploadmods
+    # @brief 複数の mod jar やバンドル（zip / mrpack）をまとめてアップロードして配置する
+    # @details ダウンロードは UPLOAD_CONCURRENCY 個ずつ並行に行い、メタデータはまとめて（件数が多ければプロセスプールで）抽出します。
+    #          同じ modId の既存 jar は置き換え、バッチ全体を 1 つのスナップショットとして原子的に切り替えます
+    # @param inter コマンドを実行した Interaction
+    # @param file1〜file10 添付された jar / zip / mrpack ファイル
+    # @param server 配置先のサーバー名
+    # @return なし
+    @tree.command(name="uploadmods", description="複数のmod jarやzip/mrpackをまとめてアップロードしてサーバーに配置します")
+    @app_commands.describe(
+        file1=".jar / .zip / .mrpack ファイルを添付してください",
+        file2="追加のファイル", file3="追加のファイル", file4="追加のファイル", file5="追加のファイル",
+        file6="追加のファイル", file7="追加のファイル", file8="追加のファイル", file9="追加のファイル", file10="追加のファイル",
+        server="配置先サーバー（default: 既定のサーバー）",
+    )
+    @app_commands.autocomplete(server=server_autocomplete)
+    @instrumented("uploadmods")
+    async def uploadmods(
+        inter: discord.Interaction,
+        file1: discord.Attachment,
+        file2: discord.Attachment | None = None,
+        file3: discord.Attachment | None = None,
+        file4: discord.Attachment | None = None,
+        file5: discord.Attachment | None = None,
+        file6: discord.Attachment | None = None,
+        file7: discord.Attachment | None = None,
+        file8: discord.Attachment | None = None,
+        file9: discord.Attachment | None = None,
+        file10: discord.Attachment | None = None,
+        server: str | None = None,
+    ):
+        if not await ensure_allowed(inter):
+            return
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        snapshots, mod_index = ctx.snapshots, ctx.mod_index
+        attachments = [a for a in (file1, file2, file3, file4, file5, file6, file7, file8, file9, file10) if a is not None]
+        for a in attachments:
+            if not (a.filename.lower().endswith(".jar") or is_bundle(a.filename)):
+                await inter.response.send_message(f"`{a.filename}`: `.jar` / `.zip` / `.mrpack` 以外は受け付けません。", ephemeral=True)
+                return
+            if a.size > settings.MAX_UPLOAD_BYTES:  # 申告サイズで先に弾く
+                await inter.response.send_message(f"`{a.filename}` が大きすぎます（上限 {settings.MAX_UPLOAD_BYTES} bytes）。", ephemeral=True)
+                return
+
+        progress = await ProgressMessage.open(inter, f"`{ctx.name}` 向けに {len(attachments)}個のファイルを受信中…")
+        batch: list[tuple[str, StagedUpload, ModInfo | None]] = []
+
+        async def prepare(job: Job):
+            tmp_dir, max_bytes = snapshots.store.tmp_dir, settings.MAX_UPLOAD_BYTES
+            sem = asyncio.Semaphore(max(1, settings.UPLOAD_CONCURRENCY))  # 同時ダウンロード数を制限する
+            staged: list[tuple[str, StagedUpload]] = []
+            total, done = len(attachments), 0
+
+            async def fetch(coro_fn) -> StagedUpload:
+                nonlocal done
+                async with sem:
+                    s = await coro_fn()
+                job.cleanups.append(s.discard)  # 格納済みなら何もしない
+                done += 1
+                progress.update(f"`{ctx.name}` 向けのファイルを受信中… {done}/{total}")
+                return s
+
+            async def fetch_remote_jar(jar: RemoteJar):
+                staged.append((jar.filename, await fetch(lambda: fetch_remote(jar, tmp_dir, max_bytes))))
+
+            async def fetch_attachment(a: discord.Attachment):
+                nonlocal total
+                s = await fetch(lambda: stream_to_staging(a.url, tmp_dir, max_bytes))
+                if not is_bundle(a.filename):
+                    staged.append((a.filename, s))
+                    return
+                try:
+                    jars, remote = await asyncio.to_thread(extract_bundle, s.path, tmp_dir, max_bytes)
+                finally:
+                    s.discard()  # バンドル自体はストアに入れない
+                for name, j in jars:
+                    job.cleanups.append(j.discard)
+                    staged.append((name, j))
+                total += len(remote)
+                results = await asyncio.gather(*(fetch_remote_jar(r) for r in remote), return_exceptions=True)
+                for r in results:
+                    if isinstance(r, BaseException):
+                        raise r
+
+            # 失敗しても他のダウンロードを最後まで待ち、一時ファイルを cleanups に載せ漏らさない
+            results = await asyncio.gather(*(fetch_attachment(a) for a in attachments), return_exceptions=True)
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors:
+                await progress.finish(f"アップロード失敗: {errors[0]}", failed=True)
+                return
+            if not staged:
+                await progress.finish("配置できる jar が含まれていません。", failed=True)
+                return
+            progress.update(f"`{ctx.name}` 向けの {len(staged)}個の jar を解析中…")
+            infos = await map_jars(read_mod_info, [s.path for _, s in staged])  # 件数が多ければプロセスプールで並列に抽出
+            items = [(name, s, info if isinstance(info, ModInfo) else None) for (name, s), info in zip(staged, infos)]
+            items, problems = check_batch(items)
+            if problems:
+                await progress.finish("アップロードを中止しました:\n" + "\n".join(f"- {p}" for p in problems), failed=True)
+                return
+            batch.extend(items)
+
+        async def body(job: Job):
+            await mod_index.refresh()
+            names = {name for name, _, _ in batch}
+            changes: dict[str, str | None] = {}
+            replaced: dict[str, list[str]] = {}
+            unchanged: list[str] = []
+            for name, staged, info in batch:
+                cur = mod_index.entries.get(name)
+                if cur is not None and cur.sha256 == staged.sha256:
+                    unchanged.append(name)
+                    continue
+                changes[name] = staged.sha256
+                if info and info.mod_id:
+                    for old in mod_index.entries.values():  # 同じ modId の旧バージョンは取り除く
+                        if old.filename not in names and old.mod and old.mod.mod_id == info.mod_id:
+                            changes[old.filename] = None
+                            replaced.setdefault(name, []).append(old.filename)
+            if not changes:
+                await progress.finish(f"`{ctx.name}` にはすべて同じ内容の jar が配置済みのため、変更はありません。")
+                return
+
+            added = [(name, s, info) for name, s, info in batch if name in changes]
+            removed = [n for n, sha in changes.items() if sha is None]
+            before = check_mods(mod_index.mods())
+            after = check_mods(mod_index.mods(replace={name: info for name, _, info in added}, remove=removed))  # 配置前に依存関係と競合を検査
+            try:
+                stored = await asyncio.to_thread(lambda: [snapshots.store.add_staged(s) for _, s, _ in added])  # 同じ内容が既にあれば一時ファイルを捨てるだけ
+                snap = await snapshots.commit(changes, note=f"upload {len(added)} jars")  # バッチ全体を 1 つのスナップショットへ原子的に切り替え
+            except Exception as e:
+                await progress.finish(f"アップロード失敗: {e}", failed=True)
+                return
+
+            for name, s, info in added:
+                await set_last_uploaded(inter, name, s, info, ctx.name)  # アップロード履歴に記録
+            header = (
+                f"`{ctx.name}` の `mods/` に {len(added)}個の jar を配置しました（スナップショット `{snap.id}`、"
+                f"置き換え {len(removed)}個・変更なし {len(unchanged)}個・再利用 {stored.count(False)}個）。再起動で反映されます。"
+            )
+            introduced = DependencyReport(
+                errors=[e for e in after.errors if e not in before.errors],
+                warnings=[w for w in after.warnings if w not in before.warnings],
+            )  # このアップロードで新たに生じた問題だけを伝える
+            if introduced.errors:
+                header += "\n依存関係のエラーがあるため、このままでは `/restart` は中止されます。"
+            lines = []
+            for name, s, info in added:
+                pretty = f"**{info.name}** v{info.version} `{name}`" if info and info.name else f"`{name}`"
+                old = replaced.get(name)
+                lines.append(f"- {pretty}" + (f"（{', '.join(f'`{o}`' for o in old)} を置き換え）" if old else ""))
+            lines += [f"- `{name}`: 変更なし" for name in unchanged]
+            if introduced.errors or introduced.warnings:
+                lines.append(introduced.format())
+            await send_long(progress, header, lines, "uploadmods.txt")
+
+        scheduler.submit(
+            "upload", ctx.name, (MODS,), body,
+            prepare=prepare, title=f"一括アップロード（{len(attachments)}ファイル）", user=str(inter.user), progress=progress,
+        )
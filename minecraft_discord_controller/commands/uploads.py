@@ -0,0 +1,49 @@
+import discord
+from discord import app_commands
+
+from minecraft_discord_controller.commands.uploadmod import upload_history
+from minecraft_discord_controller.service.history import UploadRecord
+from minecraft_discord_controller.utils.metrics import instrumented
+from minecraft_discord_controller.utils.permissions import ensure_allowed
+from minecraft_discord_controller.utils.servers import resolve_server, server_autocomplete
+
+PER_PAGE = 10  # 1 ページあたりの表示件数
+
+# @fn format_record
+# @brief アップロード履歴 1 件を表示用の 1 行にする
+# @param rec 表示する UploadRecord
+# @return 整形済みの文字列
+def format_record(rec: UploadRecord) -> str:
+    mod = f" **{rec.mod_name}** v{rec.mod_version}" if rec.mod_name else ""
+    who = f" by {rec.uploader_name}" if rec.uploader_name else ""
+    return f"`#{rec.id}` <t:{int(rec.uploaded_at)}:f> `{rec.filename}`{mod} ({rec.size:,} bytes, `{rec.sha256[:12]}`){who}"
+
+# @fn register
+# @brief /uploads コマンドをツリーへ登録する
+# @param tree コマンド登録先の CommandTree
+# @return なし
+def register(tree: app_commands.CommandTree):
+    # @fn uploads
+    # @brief このギルドのアップロード履歴をページ単位で表示する
+    # @param inter コマンドを実行した Interaction
+    # @param page 表示するページ番号（1 始まり）
+    # @param server 対象サーバー名
+    # @return なし
+    @tree.command(name="uploads", description="modのアップロード履歴を表示します")
+    @app_commands.describe(page="ページ番号（default: 1）", server="対象サーバー（default: 既定のサーバー）")
+    @app_commands.autocomplete(server=server_autocomplete)
+    @instrumented("uploads")
+    async def uploads(inter: discord.Interaction, page: app_commands.Range[int, 1] = 1, server: str | None = None):
+        if not await ensure_allowed(inter):
+            return
+        ctx = await resolve_server(inter, server)
+        if ctx is None:
+            return
+        records, total = await upload_history.page(inter.guild_id, ctx.name, page, PER_PAGE)  # インデックスを使ったページ取得
+        pages = (total + PER_PAGE - 1) // PER_PAGE
+        if not records:
+            msg = f"{page} ページはありません（全{pages}ページ、{total}件）。" if total else "（記録なし）"
+            await inter.response.send_message(msg, ephemeral=True)
+            return
+        lines = [f"アップロード履歴 {page}/{pages} ページ（全{total}件）"] + [format_record(r) for r in records]
+        await inter.response.send_message("\n".join(lines), ephemeral=True)
@@ -1,5 +1,6 @@
+import functools
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 # @fn _req
 # @brief 必須の環境変数を取得する
@@ -43,24 +44,73 @@ def _opt_int(name: str, default: int) -> int:
   v = os.environ.get(name)
   return int(v) if (v is not None and v != "") else default  # 環境変数が空の場合はデフォルト値を返す
 
+# @fn _env
+# @brief 環境変数を読み出すフィールドを定義する
+# @details 読み出しを default_factory に遅延させ、import 時ではなく Settings の生成時に環境変数を参照します
+# @param getter _req / _req_int / _opt / _opt_int のいずれか
+# @param args getter に渡す引数（環境変数名とデフォルト値）
+# @return dataclasses.field
+def _env(getter, *args):
+  return field(default_factory=functools.partial(getter, *args))
+
 @dataclass(frozen=True)
 class Settings:
-  DISCORD_TOKEN: str = _req("DISCORD_TOKEN")
-  GUILD_ID: str | None = _opt("GUILD_ID")
-  ALLOWED_ROLE_ID: str | None = _opt("ALLOWED_ROLE_ID")
+  DISCORD_TOKEN: str = _env(_req, "DISCORD_TOKEN")
+  GUILD_ID: str | None = _env(_opt, "GUILD_ID")
+  ALLOWED_ROLE_ID: str | None = _env(_opt, "ALLOWED_ROLE_ID")
+
+  SERVERS_FILE: str | None = _env(_opt, "SERVERS_FILE")  # 複数サーバーの定義（TOML）。未設定なら以下の環境変数から 1 台分を作る
+
+  RCON_HOST: str | None = _env(_opt, "RCON_HOST")
+  RCON_PORT: int = _env(_opt_int, "RCON_PORT", 25575)
+  RCON_PASSWORD: str | None = _env(_opt, "RCON_PASSWORD")
+  RCON_POOL_SIZE: int = _env(_opt_int, "RCON_POOL_SIZE", 2)
+  RCON_TIMEOUT_SECONDS: int = _env(_opt_int, "RCON_TIMEOUT_SECONDS", 10)
+
+  MC_QUERY_PORT: int = _env(_opt_int, "MC_QUERY_PORT", 25565)
+  STATUS_POLL_INTERVAL_SECONDS: int = _env(_opt_int, "STATUS_POLL_INTERVAL_SECONDS", 30)
+  STATUS_STALE_SECONDS: int = _env(_opt_int, "STATUS_STALE_SECONDS", 60)
+  PERF_SAMPLE_INTERVAL_SECONDS: int = _env(_opt_int, "PERF_SAMPLE_INTERVAL_SECONDS", 30)  # 0 の場合は性能のサンプリングをしない
+  PERF_TPS_COMMAND: str | None = _env(_opt, "PERF_TPS_COMMAND")  # 未設定なら forge tps / neoforge tps / spark tps を自動検出
+
+  MC_DIR: str | None = _env(_opt, "MC_DIR")
+  MC_LOG_PATH: str | None = _env(_opt, "MC_LOG_PATH")
+  MC_MODS_DIR: str | None = _env(_opt, "MC_MODS_DIR")
+  MAX_UPLOAD_BYTES: int = _env(_opt_int, "MAX_UPLOAD_BYTES", 200 * 1024 * 1024)
+  UPLOAD_CONCURRENCY: int = _env(_opt_int, "UPLOAD_CONCURRENCY", 4)  # /uploadmods で同時にダウンロードするファイル数
+  DATA_DIR: str = _env(_opt, "DATA_DIR", "data")
+  SNAPSHOT_KEEP: int = _env(_opt_int, "SNAPSHOT_KEEP", 20)  # サーバーごとに残すスナップショット数。0 の場合は削除しない
+
+  METRICS_HOST: str = _env(_opt, "METRICS_HOST", "127.0.0.1")
+  METRICS_PORT: int = _env(_opt_int, "METRICS_PORT", 0)  # 0 の場合はメトリクスエンドポイントを起動しない
 
-  RCON_HOST: str = _req("RCON_HOST")
-  RCON_PORT: int = _req_int("RCON_PORT")
-  RCON_PASSWORD: str = _req("RCON_PASSWORD")
+  RESTART_METHOD: str = _env(_opt, "RESTART_METHOD", "RCON")
+  SYSTEMD_UNIT: str | None = _env(_opt, "SYSTEMD_UNIT")
 
-  MC_DIR: str = _req("MC_DIR")
-  MC_LOG_PATH: str = _req("MC_LOG_PATH")
-  MC_MODS_DIR: str = _req("MC_MODS_DIR")
+  RESTART_COUNTDOWN_SECONDS: int = _env(_opt_int, "RESTART_COUNTDOWN_SECONDS", 10)
+  STARTUP_TIMEOUT_SECONDS: int = _env(_opt_int, "STARTUP_TIMEOUT_SECONDS", 240)
 
-  RESTART_METHOD: str = _req("RESTART_METHOD")
-  SYSTEMD_UNIT: str = _req("SYSTEMD_UNIT")
+_settings: Settings | None = None
 
-  RESTART_COUNTDOWN_SECONDS: int = _opt_int("RESTART_COUNTDOWN_SECONDS", 10)
-  STARTUP_TIMEOUT_SECONDS: int = _opt_int("STARTUP_TIMEOUT_SECONDS", 240)
+# @fn get_settings
+# @brief 設定値を取得する
+# @details 初回の呼び出し時に環境変数から Settings を生成し、以降は同じインスタンスを返します。
+#          config モジュール自体は環境変数なしで import できます（Settings 型の参照やツールから使う場合）
+# @return Settings
+def get_settings() -> Settings:
+  global _settings
+  if _settings is None:
+    _settings = Settings()
+  return _settings
 
-settings = Settings()
+# @fn __getattr__
+# @brief モジュール属性 settings を遅延生成する
+# @details `from minecraft_discord_controller.config import settings` の時点で初めて環境変数を読みます。
+#          コマンド・サービスの各モジュールは import 時にこれを行う（service.minecraft はサーバー一覧も構築する）ため、
+#          実際には Bot のモジュールを import する前に環境変数を設定しておく必要があります
+# @param name 属性名
+# @return 属性値
+def __getattr__(name: str):
+  if name == "settings":
+    return get_settings()
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
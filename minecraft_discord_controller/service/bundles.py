@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import posixpath
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
+
+from minecraft_discord_controller.service.uploads import CHUNK_SIZE, StagedUpload, UploadTooLarge, stream_to_staging
+
+BUNDLE_SUFFIXES = (".zip", ".mrpack")  # 複数の jar をまとめたアーカイブとして扱う拡張子
+MRPACK_INDEX = "modrinth.index.json"
+MRPACK_HOSTS = ("cdn.modrinth.com", "github.com", "raw.githubusercontent.com", "gitlab.com")  # mrpack の仕様で許可されたダウンロード元
+MAX_BUNDLE_JARS = 500  # 1 つのバンドルから取り出す jar の上限
+EXPANSION_LIMIT = 2  # 展開後の合計サイズの上限（バンドルの上限サイズに対する倍率）
+
+
+class BundleError(ValueError):
+    pass
+
+
+# @class RemoteJar
+# @brief mrpack の modrinth.index.json に記載された、別途ダウンロードする jar
+@dataclass(frozen=True)
+class RemoteJar:
+    filename: str
+    urls: tuple[str, ...]
+    sha512: Optional[str] = None
+
+
+# @fn is_bundle
+# @brief ファイル名がバンドル（zip / mrpack）かどうかを判定する
+# @param filename 添付ファイル名
+# @return バンドルなら True
+def is_bundle(filename: str) -> bool:
+    return filename.lower().endswith(BUNDLE_SUFFIXES)
+
+
+def _jar_name(path: str) -> Optional[str]:
+    name = posixpath.basename(path)
+    if not name.lower().endswith(".jar") or name.startswith("."):
+        return None
+    return name
+
+
+# @fn _is_server_jar
+# @brief バンドル内のエントリがサーバーに配置する jar かどうかを判定する
+# @details 直下の jar と mods ディレクトリ（overrides/mods、server-overrides/mods など）の jar を対象とし、
+#          client-overrides 配下と macOS の __MACOSX は除きます
+def _is_server_jar(path: str) -> bool:
+    dirs = path.split("/")[:-1]
+    if dirs and dirs[0] in ("client-overrides", "__MACOSX"):
+        return False
+    return _jar_name(path) is not None and (not dirs or dirs[-1] == "mods")
+
+
+def _parse_mrpack(raw: bytes) -> list[RemoteJar]:
+    try:
+        index = json.loads(raw)
+    except ValueError as e:
+        raise BundleError(f"{MRPACK_INDEX} is not valid JSON: {e}")
+    out = []
+    for f in index.get("files", []):
+        path = f.get("path", "")
+        name = _jar_name(path)
+        if name is None or not path.startswith("mods/") or (f.get("env") or {}).get("server") == "unsupported":
+            continue  # mods 以外（リソースパックなど）とクライアント専用の mod は配置しない
+        urls = tuple(
+            u for u in f.get("downloads", [])
+            if urlsplit(u).scheme == "https" and urlsplit(u).hostname in MRPACK_HOSTS
+        )
+        if not urls:
+            raise BundleError(f"{path}: no download URL from an allowed host")
+        out.append(RemoteJar(name, urls, (f.get("hashes") or {}).get("sha512")))
+    return out
+
+
+def _extract_member(z: zipfile.ZipFile, info: zipfile.ZipInfo, dest_dir: str, max_bytes: int) -> StagedUpload:
+    fd, tmp_path = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=dest_dir)
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out, z.open(info) as src:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                size += len(chunk)
+                if size > max_bytes:  # 申告サイズを偽ったエントリも展開中に止める
+                    raise UploadTooLarge(f"{info.filename} is larger than {max_bytes} bytes")
+                out.write(chunk)
+                h.update(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+    return StagedUpload(tmp_path, size, h.hexdigest())
+
+
+# @fn extract_bundle
+# @brief バンドルからサーバー用の jar を取り出す
+# @details zip は直下と mods ディレクトリの jar を、mrpack はそれに加えて modrinth.index.json の mods/ 配下のうち
+#          サーバーで使うものを対象にします。同梱の jar は dest_dir へ展開し、index の jar はダウンロード先として返します。
+#          ブロッキング処理なのでスレッドから呼び出してください
+# @param bundle_path バンドルのパス
+# @param dest_dir 展開先ディレクトリ（ストアと同じファイルシステム）
+# @param max_bytes jar 1 つあたりの上限サイズ。展開後の合計は EXPANSION_LIMIT 倍まで
+# @return (展開した (ファイル名, StagedUpload) のリスト, ダウンロードする RemoteJar のリスト)
+def extract_bundle(bundle_path: str, dest_dir: str, max_bytes: int) -> tuple[list[tuple[str, StagedUpload]], list[RemoteJar]]:
+    try:
+        z = zipfile.ZipFile(bundle_path)
+    except zipfile.BadZipFile as e:
+        raise BundleError(f"not a zip archive: {e}")
+    staged: list[tuple[str, StagedUpload]] = []
+    with z:
+        remote = _parse_mrpack(z.read(MRPACK_INDEX)) if MRPACK_INDEX in z.namelist() else []
+        members = [i for i in z.infolist() if not i.is_dir() and _is_server_jar(i.filename)]
+        if len(members) + len(remote) > MAX_BUNDLE_JARS:
+            raise BundleError(f"bundle contains more than {MAX_BUNDLE_JARS} jars")
+        if sum(i.file_size for i in members) > max_bytes * EXPANSION_LIMIT:
+            raise UploadTooLarge(f"bundle expands to more than {max_bytes * EXPANSION_LIMIT} bytes")
+        try:
+            for info in members:
+                staged.append((_jar_name(info.filename), _extract_member(z, info, dest_dir, max_bytes)))
+        except BaseException:
+            for _, s in staged:
+                s.discard()
+            raise
+    return staged, remote
+
+
+def _sha512_file(path: str) -> str:
+    h = hashlib.sha512()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# @fn fetch_remote
+# @brief mrpack に記載された jar をダウンロードする
+# @details 記載順に URL を試し、index に SHA-512 があれば照合します
+# @param jar 対象の RemoteJar
+# @param dest_dir 一時ファイルを置くディレクトリ
+# @param max_bytes 受け付ける最大バイト数
+# @return StagedUpload
+async def fetch_remote(jar: RemoteJar, dest_dir: str, max_bytes: int) -> StagedUpload:
+    error: Exception = BundleError(f"{jar.filename}: no download URL")
+    for url in jar.urls:
+        try:
+            staged = await stream_to_staging(url, dest_dir, max_bytes)
+        except UploadTooLarge:
+            raise
+        except Exception as e:
+            error = e  # ミラーがあれば次の URL を試す
+            continue
+        if jar.sha512 and await asyncio.to_thread(_sha512_file, staged.path) != jar.sha512.lower():
+            staged.discard()
+            raise BundleError(f"{jar.filename}: sha512 mismatch")
+        return staged
+    raise error
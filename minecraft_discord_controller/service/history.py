@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    uploader_id INTEGER,
+    uploader_name TEXT,
+    uploaded_at REAL NOT NULL,
+    mod_id TEXT,
+    mod_name TEXT,
+    mod_version TEXT,
+    loader TEXT,
+    server TEXT NOT NULL DEFAULT 'default'
+);
+"""
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_uploads_guild_server ON uploads (guild_id, server, id DESC);
+"""
+
+@dataclass
+class UploadRecord:
+    guild_id: int
+    filename: str
+    sha256: str
+    size: int
+    uploader_id: Optional[int] = None
+    uploader_name: Optional[str] = None
+    uploaded_at: float = 0.0
+    mod_id: Optional[str] = None
+    mod_name: Optional[str] = None
+    mod_version: Optional[str] = None
+    loader: Optional[str] = None
+    server: str = "default"
+    id: Optional[int] = None
+
+_COLUMNS = [f.name for f in fields(UploadRecord) if f.name != "id"]
+_SELECT = "SELECT id, " + ", ".join(_COLUMNS) + " FROM uploads"
+
+def _row(r: tuple) -> UploadRecord:
+    return UploadRecord(**dict(zip(_COLUMNS, r[1:])), id=r[0])
+
+# @class UploadHistory
+# @brief ギルドごとのアップロード履歴ストア
+# @details SQLite（WAL モード）に履歴を保存し、書き込みと検索はスレッドで行います。
+#          ギルド・サーバーごとの最新レコードはメモリにキャッシュし、/lastmod や /restart のヒント参照は DB に触れずに返します
+class UploadHistory:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._latest: dict[tuple[int, str], UploadRecord] = {}
+
+    def _open(self):
+        with self._db_lock:
+            if self._conn is not None:
+                return
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL では NORMAL でもクラッシュ時に壊れない
+            conn.executescript(_SCHEMA)
+            if "server" not in {r[1] for r in conn.execute("PRAGMA table_info(uploads)")}:
+                conn.execute("ALTER TABLE uploads ADD COLUMN server TEXT NOT NULL DEFAULT 'default'")  # 複数サーバー対応前の DB を移行
+            conn.executescript(_INDEXES)
+            rows = conn.execute(
+                _SELECT + " WHERE id IN (SELECT MAX(id) FROM uploads GROUP BY guild_id, server)"
+            ).fetchall()
+            self._latest = {(rec.guild_id, rec.server): rec for rec in map(_row, rows)}  # ギルド・サーバーごとの最新レコードを先読み
+            self._conn = conn
+
+    # @fn open
+    # @brief DB を開いてキャッシュを読み込む
+    # @return なし
+    async def open(self):
+        if self._conn is None:
+            await asyncio.to_thread(self._open)
+
+    # @fn latest
+    # @brief ギルドの最新アップロードを返す
+    # @param guild_id ギルドID
+    # @param server サーバー名
+    # @return UploadRecord。記録がない場合は None
+    def latest(self, guild_id: int, server: str = "default") -> Optional[UploadRecord]:
+        return self._latest.get((guild_id, server))
+
+    def _insert(self, rec: UploadRecord) -> int:
+        self._open()
+        with self._db_lock, self._conn:
+            cur = self._conn.execute(
+                f"INSERT INTO uploads ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [getattr(rec, c) for c in _COLUMNS],
+            )
+            return cur.lastrowid
+
+    # @fn add
+    # @brief アップロードを記録する
+    # @param rec 記録する UploadRecord（uploaded_at が 0 の場合は現在時刻）
+    # @return 採番された UploadRecord
+    async def add(self, rec: UploadRecord) -> UploadRecord:
+        await self.open()
+        if not rec.uploaded_at:
+            rec.uploaded_at = time.time()
+        rec.id = await asyncio.to_thread(self._insert, rec)
+        self._latest[(rec.guild_id, rec.server)] = rec  # 書き込みに失敗した記録を /lastmod に見せないよう保存後に更新
+        return rec
+
+    def _page(self, guild_id: int, server: str, limit: int, offset: int) -> tuple[list[UploadRecord], int]:
+        self._open()
+        with self._db_lock:
+            rows = self._conn.execute(
+                _SELECT + " WHERE guild_id = ? AND server = ? ORDER BY id DESC LIMIT ? OFFSET ?", (guild_id, server, limit, offset)
+            ).fetchall()
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM uploads WHERE guild_id = ? AND server = ?", (guild_id, server)
+            ).fetchone()[0]
+        return [_row(r) for r in rows], total
+
+    # @fn page
+    # @brief ギルドのアップロード履歴をページ単位で取得する
+    # @param guild_id ギルドID
+    # @param server サーバー名
+    # @param page 1 始まりのページ番号
+    # @param per_page 1 ページあたりの件数
+    # @return (新しい順のレコード一覧, 総件数)
+    async def page(self, guild_id: int, server: str = "default", page: int = 1, per_page: int = 10) -> tuple[list[UploadRecord], int]:
+        return await asyncio.to_thread(self._page, guild_id, server, per_page, (max(page, 1) - 1) * per_page)
+
+    # @fn close
+    # @brief DB を閉じる
+    # @return なし
+    def close(self):
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,198 @@
+import asyncio
+import contextlib
+import enum
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from minecraft_discord_controller.utils.metrics import JOB_FAILURES, JOB_SECONDS, JOB_WAIT_SECONDS
+
+log = logging.getLogger(__name__)
+
+# ジョブが占有するサーバーごとの資源。同じサーバーで同じ資源を使うジョブは投入順に 1 つずつ実行する
+MODS = "mods"  # mods ディレクトリの書き換え（アップロード・スナップショット・ロールバック・再起動）
+LIFECYCLE = "lifecycle"  # サーバープロセスの停止・起動
+INDEX = "index"  # mod インデックスの再構築
+LOGS = "logs"  # ログ検索（ワーカープロセスを使う）
+
+class JobState(enum.Enum):
+    PREPARING = "準備中"
+    QUEUED = "待機中"
+    RUNNING = "実行中"
+    DONE = "完了"
+    FAILED = "失敗"
+    CANCELLED = "キャンセル"
+
+@dataclass(eq=False)
+class Job:
+    id: int
+    kind: str
+    server: str
+    resources: tuple[str, ...]
+    title: str
+    user: str = ""
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    state: JobState = JobState.PREPARING
+    error: Optional[str] = None
+    progress: Any = None  # update(text) / finish(text, failed=...) と finished / error を持つ進捗表示（ProgressMessage など）
+    on_cancel: Optional[Callable[[], Optional[bool]]] = None  # 実行中のキャンセルを処理側に任せる場合のフック
+    cleanups: list[Callable[[], Any]] = field(default_factory=list)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.finished_at is None
+
+    @property
+    def keys(self) -> list[tuple[str, str]]:
+        return sorted((self.server, r) for r in self.resources)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - (self.started_at or self.created_at)
+
+# @class JobScheduler
+# @brief 時間のかかる操作をサーバー・資源単位で直列化するジョブスケジューラー
+# @details ジョブは (サーバー名, 資源) ごとの asyncio.Lock を名前順に取得してから本体を実行するため、
+#          競合するジョブは投入順（Lock は FIFO）に 1 つずつ、競合しないジョブは並行に動きます。
+#          prepare はロックを取る前に実行するので、ダウンロードのように競合しない下準備は待たずに進められます
+class JobScheduler:
+    def __init__(self, history_size: int = 20):
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self._ids = itertools.count(1)
+        self.active: dict[int, Job] = {}
+        self.finished: deque[Job] = deque(maxlen=history_size)
+
+    # @fn submit
+    # @brief ジョブを投入する
+    # @param kind ジョブの種類（restart / upload など）
+    # @param server 対象サーバー名
+    # @param resources 占有する資源（MODS / LIFECYCLE / INDEX / LOGS）
+    # @param body 資源を取得した後に実行する本体
+    # @param prepare 資源を取得する前に実行する下準備
+    # @param title 一覧に表示する説明
+    # @param user 投入したユーザーの表示名
+    # @param progress 待機やキャンセルを伝える進捗表示
+    # @param on_cancel 実行中のキャンセル要求を処理するフック（True で受け付け、False で拒否、None ならタスクをキャンセル）
+    # @return Job
+    def submit(
+        self,
+        kind: str,
+        server: str,
+        resources: tuple[str, ...],
+        body: Callable[[Job], Awaitable[None]],
+        *,
+        prepare: Optional[Callable[[Job], Awaitable[None]]] = None,
+        title: str = "",
+        user: str = "",
+        progress: Any = None,
+        on_cancel: Optional[Callable[[], Optional[bool]]] = None,
+    ) -> Job:
+        job = Job(next(self._ids), kind, server, tuple(resources), title or kind, user, progress=progress, on_cancel=on_cancel)
+        self.active[job.id] = job
+        job.task = asyncio.create_task(self._run(job, body, prepare))
+        return job
+
+    # @fn find
+    # @brief 実行中・待機中のジョブを探す
+    # @param server サーバー名
+    # @param kind ジョブの種類
+    # @return 最初に見つかった Job。無い場合は None
+    def find(self, server: str, kind: str) -> Optional[Job]:
+        return next((j for j in self.active.values() if j.server == server and j.kind == kind), None)
+
+    # @fn blockers
+    # @brief ジョブより先に投入され、同じ資源を使うジョブを返す
+    # @param job 対象のジョブ
+    # @return Job のリスト（投入順）
+    def blockers(self, job: Job) -> list[Job]:
+        keys = set(job.keys)
+        return [j for j in self.active.values() if j.id < job.id and keys.intersection(j.keys)]
+
+    # @fn cancel
+    # @brief ジョブをキャンセルする
+    # @details 待機中のジョブはその場で取り消します。実行中のジョブは on_cancel があればそれに任せ（再起動のカウントダウン中止など）、
+    #          無い場合や on_cancel が None を返した場合（フックの対象の処理がまだ始まっていない）はタスクをキャンセルします
+    # @param job_id ジョブ番号
+    # @return キャンセルを受け付けた場合は True
+    def cancel(self, job_id: int) -> bool:
+        job = self.active.get(job_id)
+        if job is None or job.task is None:
+            return False
+        if job.state == JobState.RUNNING and job.on_cancel is not None:
+            accepted = job.on_cancel()
+            if accepted is not None:
+                return accepted
+        return job.task.cancel()
+
+    # @fn join
+    # @brief 投入済みのジョブがすべて終わるまで待つ
+    # @return なし
+    async def join(self):
+        while self.active:
+            await asyncio.gather(*(j.task for j in list(self.active.values()) if j.task), return_exceptions=True)
+
+    async def _run(self, job: Job, body, prepare):
+        try:
+            if prepare is not None:
+                await prepare(job)
+                if job.progress is not None and job.progress.finished:
+                    self._settle(job)
+                    return  # 入力の誤りなどで下準備の段階で結果を返し終えた
+            job.state = JobState.QUEUED
+            t0 = time.perf_counter()
+            async with contextlib.AsyncExitStack() as stack:
+                for key in job.keys:  # 常に同じ順で取得してデッドロックを防ぐ
+                    lock = self._locks.setdefault(key, asyncio.Lock())
+                    if lock.locked() and job.progress is not None:
+                        ahead = ", ".join(f"#{j.id} {j.title}" for j in self.blockers(job))
+                        job.progress.update(f"⏳ `{job.server}` {job.title}: 待機中（{ahead} の完了待ち）")
+                    await stack.enter_async_context(lock)
+                JOB_WAIT_SECONDS.labels(job.kind).observe(time.perf_counter() - t0)
+                job.state = JobState.RUNNING
+                job.started_at = time.time()
+                with JOB_SECONDS.labels(job.kind).time():
+                    await body(job)
+            self._settle(job)
+        except asyncio.CancelledError:
+            job.state = JobState.CANCELLED
+            await self._report(job, f"⏹️ `{job.server}` {job.title}: キャンセルされました。")
+        except Exception as e:
+            log.exception(f"Job #{job.id} ({job.kind} on {job.server}) failed")
+            job.state = JobState.FAILED
+            job.error = str(e)
+            JOB_FAILURES.labels(job.kind).inc()
+            await self._report(job, f"❌ `{job.server}` {job.title}: 失敗しました: {e}")
+        finally:
+            for fn in job.cleanups:
+                with contextlib.suppress(Exception):
+                    fn()
+            job.finished_at = time.time()
+            self.active.pop(job.id, None)
+            self.finished.append(job)
+
+    # @fn _settle
+    # @brief 例外なく終わったジョブの状態を決める
+    # @details 処理側が進捗表示を failed=True で終えていれば失敗として、その最初の行をエラーに記録します
+    # @param job 対象のジョブ
+    # @return なし
+    def _settle(self, job: Job):
+        error = getattr(job.progress, "error", None)
+        if error:
+            job.state = JobState.FAILED
+            job.error = error.splitlines()[0]
+            JOB_FAILURES.labels(job.kind).inc()
+        else:
+            job.state = JobState.DONE
+
+    async def _report(self, job: Job, text: str):
+        if job.progress is not None and not job.progress.finished:
+            with contextlib.suppress(Exception):
+                await job.progress.finish(text)
+
+scheduler = JobScheduler()  # プロセス全体で共有するジョブスケジューラー
@@ -0,0 +1,222 @@
+import asyncio
+import contextlib
+import logging
+import os
+import re
+import time
+from typing import Callable, Iterable, Optional, Pattern
+
+from minecraft_discord_controller.utils.metrics import LOG_DISPATCH_SECONDS
+
+log = logging.getLogger(__name__)
+
+LinePredicate = Callable[[str], bool]
+
+
+# @class LogSubscription
+# @brief ログフォロワーの購読者
+# @details 登録したパターン/述語に一致した行だけを受け取り、first() で最初の一致を待つか async for で逐次受け取ります
+class LogSubscription:
+    def __init__(
+        self,
+        follower: "LogFollower",
+        patterns: Iterable[Pattern[str]],
+        predicate: Optional[LinePredicate],
+        maxsize: int,
+    ):
+        self._follower = follower
+        self._patterns = tuple(patterns)
+        self._predicate = predicate
+        self._queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+
+    def matches(self, line: str) -> bool:
+        if not self._patterns and self._predicate is None:
+            return True  # 条件なしの購読は全行を受け取る
+        if any(p.search(line) for p in self._patterns):
+            return True
+        return self._predicate is not None and self._predicate(line)
+
+    def _deliver(self, line: str | None):
+        try:
+            self._queue.put_nowait(line)
+        except asyncio.QueueFull:
+            with contextlib.suppress(asyncio.QueueEmpty):
+                self._queue.get_nowait()  # 遅い購読者は古い行から捨てる
+            self._queue.put_nowait(line)
+
+    # @fn first
+    # @brief 最初に一致した行を待つ
+    # @param timeout 待機する最大秒数
+    # @return 一致した行。タイムアウトまたはフォロワー停止時は None
+    async def first(self, timeout: float | None = None) -> str | None:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    # @fn close
+    # @brief 購読を解除する
+    # @return なし
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._follower._unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        line = await self._queue.get()
+        if line is None:
+            raise StopAsyncIteration
+        return line
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# @class LogFollower
+# @brief 1 つのログファイルを共有で追従するサービス
+# @details 新しく追記されたバイトを大きなチャンクで読み、行に分割して全購読者へ配信します。
+#          latest.log のローテーション（inode 変化）と切り詰め（サイズ縮小）にも追従します
+class LogFollower:
+    def __init__(self, path: str, *, chunk_size: int = 1 << 16, poll_interval: float = 0.25, queue_size: int = 1024):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._subs: list[LogSubscription] = []
+        self._task: asyncio.Task | None = None
+        self._fd: int | None = None
+        self._ino: int | None = None
+        self._pos = 0
+        self._partial = b""
+        self._idle = False
+        self._backlog = False
+
+    # @fn subscribe
+    # @brief 購読者を登録する
+    # @details 未起動なら現在のファイル末尾を読み取り位置として即座に確定させるため、登録後に追記された行は取りこぼしません
+    # @param patterns 一致判定に使う正規表現（文字列またはコンパイル済み）
+    # @param predicate 追加の一致判定関数
+    # @param maxsize 未読行を溜めておける最大行数（未指定時はフォロワーの既定値）
+    # @return LogSubscription
+    def subscribe(
+        self, *patterns: str | Pattern[str], predicate: Optional[LinePredicate] = None, maxsize: Optional[int] = None
+    ) -> LogSubscription:
+        compiled = [re.compile(p) if isinstance(p, str) else p for p in patterns]
+        sub = LogSubscription(self, compiled, predicate, maxsize or self.queue_size)
+        self._subs.append(sub)
+        self._idle = False
+        if self._task is None or self._task.done():
+            self._partial = b""
+            self._open(at_end=True)
+            self._task = asyncio.create_task(self._run())
+        return sub
+
+    # @fn wait_for
+    # @brief パターンに一致する行が出るまで待つ
+    # @param patterns 一致判定に使う正規表現
+    # @param timeout 待機する最大秒数
+    # @param predicate 追加の一致判定関数
+    # @return 一致した行。タイムアウト時は None
+    async def wait_for(self, *patterns: str | Pattern[str], timeout: float, predicate: Optional[LinePredicate] = None) -> str | None:
+        with self.subscribe(*patterns, predicate=predicate) as sub:
+            return await sub.first(timeout)
+
+    def _unsubscribe(self, sub: LogSubscription):
+        with contextlib.suppress(ValueError):
+            self._subs.remove(sub)
+        sub._deliver(None)
+        if not self._subs:
+            self._idle = True  # 購読者がいなくなったら次の周回でファイル監視を止めて無駄な起床をなくす
+
+    def _open(self, at_end: bool):
+        self._close_fd()
+        try:
+            self._fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            self._fd, self._ino, self._pos = None, None, 0
+            return
+        st = os.fstat(self._fd)
+        self._ino = st.st_ino
+        self._pos = st.st_size if at_end else 0
+
+    def _close_fd(self):
+        if self._fd is not None:
+            with contextlib.suppress(OSError):
+                os.close(self._fd)
+            self._fd = None
+
+    # @fn _read_available
+    # @brief 読み取り位置以降の追記分をまとめて読む
+    # @details ローテーション時は旧ファイルの残りを読み切ってから新ファイルを先頭から開き直し、切り詰め時は先頭へ戻ります。
+    #          旧ファイルが改行で終わっていない場合は改行を補い、その最後の行と新ファイルの先頭行がつながらないようにします
+    # @return 読み取ったバイト列
+    def _read_available(self) -> bytes:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        chunks: list[bytes] = []
+        if self._fd is not None and st is not None and st.st_ino == self._ino and st.st_size < self._pos:
+            self._pos = 0  # 切り詰められた
+            self._partial = b""
+        if self._fd is not None:
+            chunks.append(self._drain_fd())
+        if st is not None and not self._backlog and (self._fd is None or st.st_ino != self._ino):
+            tail = chunks[-1] if chunks and chunks[-1] else self._partial
+            if tail and not tail.endswith(b"\n"):
+                chunks.append(b"\n")  # 旧ファイルの書きかけの行はここで終わりとする
+            self._open(at_end=False)  # ローテーションされた（または新規作成された）
+            if self._fd is not None:
+                chunks.append(self._drain_fd())
+        return b"".join(chunks)
+
+    def _drain_fd(self, max_chunks: int = 16) -> bytes:
+        out: list[bytes] = []
+        self._backlog = False
+        for _ in range(max_chunks):
+            data = os.pread(self._fd, self.chunk_size, self._pos)
+            self._pos += len(data)
+            out.append(data)
+            if len(data) < self.chunk_size:
+                break
+        else:
+            self._backlog = True  # 1 周回の読み取り上限に達した
+        return b"".join(out)
+
+    # @fn _run
+    # @brief 追従ループ
+    # @details 追記分をスレッドで読み出し、改行で分割して各購読者の条件に一致した行を配信します
+    # @return なし
+    async def _run(self):
+        try:
+            while not self._idle:
+                data = await asyncio.to_thread(self._read_available)
+                if data:
+                    t0 = time.perf_counter()
+                    buf = self._partial + data
+                    *lines, self._partial = buf.split(b"\n")
+                    subs = list(self._subs)
+                    for raw in lines:
+                        line = raw.decode("utf-8", errors="ignore").rstrip("\r")
+                        for sub in subs:
+                            if sub.matches(line):
+                                sub._deliver(line)
+                    LOG_DISPATCH_SECONDS.observe(time.perf_counter() - t0)
+                if self._backlog:
+                    continue  # 読み残しがあるので待たずに続ける
+                await asyncio.sleep(self.poll_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error(f"Log follower for {self.path} stopped: {e}")
+            for sub in list(self._subs):
+                sub._deliver(None)
+        finally:
+            self._close_fd()
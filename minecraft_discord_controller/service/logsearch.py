@@ -0,0 +1,326 @@
+import asyncio
+import datetime
+import gzip
+import mmap
+import os
+import re
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from minecraft_discord_controller.utils.workers import WorkerPool, WorkerTimeout
+
+WINDOW_BYTES = 4 << 20  # mmap / gzip を走査する単位
+ARCHIVE_TIMEOUT = 60.0  # ログファイル 1 つの走査にかけてよい秒数（破滅的なバックトラックを起こす正規表現への備え）
+_VANILLA_TS = re.compile(rb"^\[(\d\d):(\d\d):(\d\d)")  # [12:34:56] 形式（日付なし）
+_FORGE_TS = re.compile(rb"^\[(\d\d)([A-Za-z]{3})(\d{4}) (\d\d):(\d\d):(\d\d)")  # [18Oct2026 12:34:56.789] 形式
+_LEVEL = re.compile(r"/(FATAL|ERROR|WARN|INFO|DEBUG|TRACE)\]")
+_ARCHIVE_NAME = re.compile(r"^(\d{4})-(\d\d)-(\d\d)-(\d+)\.log\.gz$")  # log4j のローテーション名 2026-10-18-1.log.gz
+_PREFIX = re.compile(r"^\[[^\]]*\] ")  # 集計時に除く先頭の時刻
+_NUMBERS = re.compile(r"\d+")
+_MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1
+)}
+_RELATIVE = re.compile(r"^(\d+)\s*([smhdw])$", re.IGNORECASE)
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# @fn parse_time
+# @brief 期間指定の文字列を UNIX 時刻にする
+# @details "30m" / "2h" / "3d" / "1w" は現在からの相対、"2026-10-18"・"2026-10-18 12:00"・"12:00"（今日）は絶対時刻として解釈します
+# @param text 入力文字列
+# @param now 基準時刻（UNIX 時刻）
+# @return UNIX 時刻
+def parse_time(text: str, now: Optional[float] = None) -> float:
+    now = time.time() if now is None else now
+    text = text.strip()
+    m = _RELATIVE.match(text)
+    if m:
+        return now - int(m.group(1)) * _UNITS[m.group(2).lower()]
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    try:
+        t = datetime.datetime.strptime(text, "%H:%M").time()
+    except ValueError:
+        raise ValueError(f"時刻を解釈できません: {text!r}（例: 30m, 2h, 3d, 2026-10-18 12:00, 12:00）") from None
+    return datetime.datetime.combine(datetime.date.fromtimestamp(now), t).timestamp()
+
+class LogSearchTimeout(RuntimeError):
+    pass
+
+@dataclass(frozen=True)
+class LogQuery:
+    pattern: str
+    regex: bool = False
+    since: Optional[float] = None
+    until: Optional[float] = None
+    limit: int = 100
+
+    # @fn compile
+    # @brief バイト列に対する検索パターンを作る
+    # @details キーワード検索は大文字小文字を区別せず、正規表現は ^ / $ が行単位で一致するようにします
+    # @return コンパイル済みのパターン
+    def compile(self) -> re.Pattern:
+        if self.regex:
+            return re.compile(self.pattern.encode("utf-8"), re.MULTILINE)
+        return re.compile(re.escape(self.pattern.encode("utf-8")), re.IGNORECASE)
+
+@dataclass(frozen=True)
+class LogHit:
+    ts: Optional[float]
+    source: str
+    text: str
+
+    @property
+    def level(self) -> Optional[str]:
+        m = _LEVEL.search(self.text)
+        return m.group(1) if m else None
+
+@dataclass
+class LogSearchResult:
+    hits: list[LogHit] = field(default_factory=list)
+    files_scanned: int = 0
+    files_skipped: int = 0
+    elapsed: float = 0.0
+
+# @class _Clock
+# @brief ログ行の時刻を UNIX 時刻にする
+# @details Forge 形式は行に日付を含みますが、バニラ形式は時刻だけなので、基準日から走査方向に沿って日付の繰り上がり（繰り下がり）を推定します。
+#          一致行だけを見るため、一致のない日が丸ごと挟まると日付がずれることがあります
+class _Clock:
+    def __init__(self, base: datetime.date, backward: bool):
+        self.day = base
+        self.backward = backward
+        self._last: Optional[int] = None
+
+    def stamp(self, line: bytes) -> Optional[float]:
+        m = _FORGE_TS.match(line)
+        if m:
+            month = _MONTHS.get(m.group(2).decode().lower())
+            if month:
+                d = datetime.date(int(m.group(3)), month, int(m.group(1)))
+                return datetime.datetime(d.year, d.month, d.day, int(m.group(4)), int(m.group(5)), int(m.group(6))).timestamp()
+        m = _VANILLA_TS.match(line)
+        if not m:
+            return None
+        sod = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3))
+        if self._last is not None:
+            if self.backward and sod > self._last + 3600:
+                self.day -= datetime.timedelta(days=1)  # 遡って日付をまたいだ
+            elif not self.backward and sod < self._last - 3600:
+                self.day += datetime.timedelta(days=1)
+        self._last = sod
+        return datetime.datetime(self.day.year, self.day.month, self.day.day).timestamp() + sod
+
+def _matching_lines(buf, pat: re.Pattern, start: int, end: int) -> list[tuple[int, int]]:
+    out = []
+    pos = start
+    while pos < end:
+        m = pat.search(buf, pos, end)
+        if m is None:
+            break
+        r = buf.rfind(b"\n", start, m.start())
+        ls = start if r == -1 else r + 1
+        le = buf.find(b"\n", m.start(), end)
+        le = end if le == -1 else le
+        out.append((ls, le))
+        pos = le + 1  # 1 行につき 1 件
+    return out
+
+def _decode(raw: bytes) -> str:
+    return raw.decode("utf-8", errors="replace").rstrip("\r")
+
+# @fn search_live
+# @brief 稼働中のログファイルを末尾から遡って検索する
+# @details mmap した領域を WINDOW_BYTES ずつ後ろから正規表現で走査し、新しい順に一致行を集めます。
+#          limit 件集まるか、期間の開始より古い行に達した時点で打ち切ります
+# @param path ログファイル（latest.log）
+# @param query 検索条件
+# @return (新しい順の一致行, これ以上古いログを調べる必要がない場合は True)
+def search_live(path: str, query: LogQuery) -> tuple[list[LogHit], bool]:
+    pat = query.compile()
+    name = os.path.basename(path)
+    hits: list[LogHit] = []
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return hits, False
+    with f:
+        st = os.fstat(f.fileno())
+        if st.st_size == 0:
+            return hits, False
+        clock = _Clock(datetime.date.fromtimestamp(st.st_mtime), backward=True)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = st.st_size
+            while end > 0:
+                start = max(0, end - WINDOW_BYTES)
+                if start > 0:
+                    nl = mm.find(b"\n", start, end)
+                    if nl == -1:  # 1 行が WINDOW_BYTES より長い場合は行頭まで広げる
+                        start = mm.rfind(b"\n", 0, start) + 1
+                    else:
+                        start = nl + 1
+                for ls, le in reversed(_matching_lines(mm, pat, start, end)):
+                    raw = mm[ls:le]
+                    ts = clock.stamp(raw)
+                    if ts is not None and query.until is not None and ts > query.until:
+                        continue
+                    if ts is not None and query.since is not None and ts < query.since:
+                        return hits, True  # ここから先はすべて期間より古い
+                    hits.append(LogHit(ts, name, _decode(raw)))
+                    if len(hits) >= query.limit:
+                        return hits, True
+                end = start - 1 if start > 0 else 0  # 直前の改行を除いた位置まで
+    return hits, False
+
+# @fn archive_date
+# @brief ローテーション済みログの日付を求める
+# @param path .log.gz ファイルのパス
+# @return ファイル名の日付（読み取れない場合は更新日）
+def archive_date(path: str) -> datetime.date:
+    m = _ARCHIVE_NAME.match(os.path.basename(path))
+    if m:
+        return datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    return datetime.date.fromtimestamp(os.path.getmtime(path))
+
+# @fn list_archives
+# @brief ローテーション済みログを新しい順に列挙する
+# @param logs_dir ログディレクトリ
+# @return .log.gz ファイルのパスのリスト
+def list_archives(logs_dir: str) -> list[str]:
+    try:
+        names = [n for n in os.listdir(logs_dir) if n.endswith(".log.gz")]
+    except FileNotFoundError:
+        return []
+
+    def key(name: str):
+        m = _ARCHIVE_NAME.match(name)
+        if m:
+            return (archive_date(os.path.join(logs_dir, name)).toordinal(), int(m.group(4)))
+        return (datetime.date.fromtimestamp(os.path.getmtime(os.path.join(logs_dir, name))).toordinal(), 0)
+
+    return [os.path.join(logs_dir, n) for n in sorted(names, key=key, reverse=True)]
+
+# @fn scan_archive
+# @brief gzip 圧縮されたログを展開しながら検索する
+# @details ワーカープロセスで実行される前提のため、引数と戻り値は pickle できる型だけを使います。
+#          一致行は最新の limit 件だけを保持し、期間の終了より新しい行に達した時点で打ち切ります
+# @param path .log.gz ファイルのパス
+# @param query 検索条件
+# @return 古い順の一致行
+def scan_archive(path: str, query: LogQuery) -> list[LogHit]:
+    pat = query.compile()
+    name = os.path.basename(path)
+    clock = _Clock(archive_date(path), backward=False)
+    hits: deque[LogHit] = deque(maxlen=query.limit)
+    partial = b""
+    with gzip.open(path, "rb") as f:
+        while True:
+            chunk = f.read(WINDOW_BYTES)
+            buf = partial + chunk
+            if chunk:
+                cut = buf.rfind(b"\n")
+                if cut == -1:
+                    partial = buf
+                    continue
+                partial, buf = buf[cut + 1:], buf[:cut]
+            for ls, le in _matching_lines(buf, pat, 0, len(buf)):
+                raw = buf[ls:le]
+                ts = clock.stamp(raw)
+                if ts is not None and query.since is not None and ts < query.since:
+                    continue
+                if ts is not None and query.until is not None and ts > query.until:
+                    return list(hits)  # ここから先はすべて期間より新しい
+                hits.append(LogHit(ts, name, _decode(raw)))
+            if not chunk:
+                break
+    return list(hits)
+
+def _archive_in_range(path: str, query: LogQuery) -> bool:
+    day = archive_date(path)
+    # ローテーション名の日付と中身の日付は 1 日ずれることがあるため前後 1 日の余裕を持たせる
+    if query.since is not None and day < datetime.date.fromtimestamp(query.since) - datetime.timedelta(days=1):
+        return False
+    if query.until is not None and day > datetime.date.fromtimestamp(query.until) + datetime.timedelta(days=1):
+        return False
+    return True
+
+# @fn search_logs
+# @brief 稼働中のログとローテーション済みログをまとめて検索する
+# @details latest.log はワーカープロセスで mmap により末尾から遡り、それで limit 件に満たない場合だけ同じディレクトリの *.log.gz を
+#          新しい順にワーカープロセスへ CPU コア数ずつ振り分けて展開・走査します。件数が揃った時点で古いアーカイブは読みません。
+#          正規表現の照合は GIL を握ったままのためスレッドでは実行しません。
+#          ファイル 1 つの走査が ARCHIVE_TIMEOUT 秒を超えた場合やキャンセルされた場合はワーカープロセスを終了させます
+# @param log_path 稼働中のログファイル（MC_LOG_PATH）
+# @param query 検索条件
+# @return 新しい順の LogSearchResult
+async def search_logs(log_path: str, query: LogQuery) -> LogSearchResult:
+    t0 = time.perf_counter()
+    result = LogSearchResult()
+    timeout_error = LogSearchTimeout(f"log scan took longer than {ARCHIVE_TIMEOUT:g}s; the pattern may be too expensive")
+    async with WorkerPool(os.cpu_count() or 1) as pool:
+        try:
+            hits, done = await pool.run(search_live, log_path, query, timeout=ARCHIVE_TIMEOUT)
+        except WorkerTimeout:
+            raise timeout_error from None
+        result.hits.extend(hits)
+        result.files_scanned += 1
+        if not done:
+            archives = await asyncio.to_thread(list_archives, os.path.dirname(log_path) or ".")
+            candidates = [a for a in archives if _archive_in_range(a, query)]
+            result.files_skipped = len(archives) - len(candidates)
+            workers = os.cpu_count() or 1
+            for i in range(0, len(candidates), workers):
+                batch = candidates[i:i + workers]
+                found = await asyncio.gather(
+                    *(pool.run(scan_archive, p, query, timeout=ARCHIVE_TIMEOUT) for p in batch), return_exceptions=True,
+                )
+                errors = [e for e in found if isinstance(e, BaseException)]
+                if any(isinstance(e, WorkerTimeout) for e in errors):  # 他のアーカイブはプールの停止で失敗している
+                    raise timeout_error
+                if errors:
+                    raise errors[0]
+                result.files_scanned += len(batch)
+                for archive_hits in found:  # batch は新しい順、各アーカイブの中身は古い順
+                    result.hits.extend(reversed(archive_hits))
+                if len(result.hits) >= query.limit:
+                    result.files_skipped += len(candidates) - i - len(batch)
+                    break
+    del result.hits[query.limit:]
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+# @fn rank_messages
+# @brief 一致行を頻出メッセージ順に集計する
+# @details 先頭の時刻を除き、数値を # に置き換えて同じ種類のメッセージをまとめます
+# @param hits 一致行
+# @param n 返す件数
+# @return (件数, 代表メッセージ) のリスト
+def rank_messages(hits: list[LogHit], n: int = 10) -> list[tuple[int, str]]:
+    counts: Counter[str] = Counter()
+    for h in hits:
+        counts[_NUMBERS.sub("#", _PREFIX.sub("", h.text))[:300]] += 1
+    return [(c, msg) for msg, c in counts.most_common(n)]
+
+# @fn format_report
+# @brief 検索結果を添付ファイル用のテキストにする
+# @param query 検索条件
+# @param result 検索結果
+# @return レポート本文
+def format_report(query: LogQuery, result: LogSearchResult) -> str:
+    fmt = lambda ts: datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts else "?"
+    lines = [
+        f"検索: {query.pattern!r}{'（正規表現）' if query.regex else ''}",
+        f"期間: {fmt(query.since) if query.since else '最初'} 〜 {fmt(query.until) if query.until else '現在'}",
+        f"一致: {len(result.hits)}件（上限 {query.limit}件、{result.files_scanned}ファイル走査、{result.elapsed:.2f}s）",
+        "",
+        "== 頻出メッセージ ==",
+    ]
+    lines += [f"{c:>6}× {msg}" for c, msg in rank_messages(result.hits)]
+    levels = Counter(h.level or "-" for h in result.hits)
+    lines += ["", "== レベル別 ==", "  ".join(f"{lv}: {c}" for lv, c in levels.most_common()), "", "== 一致行（新しい順） =="]
+    lines += [f"{fmt(h.ts)} | {h.source} | {h.text}" for h in result.hits]
+    return "\n".join(lines) + "\n"
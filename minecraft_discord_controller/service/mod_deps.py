@@ -0,0 +1,188 @@
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from minecraft_discord_controller.service.mods import ModInfo
+
+# ローダーやゲーム本体が提供するため jar としては存在しない ID
+PLATFORM_IDS = frozenset({
+    "minecraft", "java", "forge", "neoforge", "fml", "javafml",
+    "fabricloader", "fabric-loader", "quilt_loader", "quilted_fabric_api_loader",
+})
+
+# 互換ローダー（キーのローダーで動くパックに値のローダー向け jar を入れても読み込める）
+_LOADER_COMPAT = {
+    "Forge": {"Forge"},
+    "NeoForge": {"NeoForge", "Forge"},
+    "Fabric": {"Fabric"},
+    "Quilt": {"Quilt", "Fabric"},
+}
+_LOADER_FAMILY = {"Forge": "forge", "NeoForge": "forge", "Fabric": "fabric", "Quilt": "fabric"}
+
+_TOKEN = re.compile(r"\d+|[A-Za-z]+")
+
+# @fn version_key
+# @brief バージョン文字列を比較可能なキーに変換する
+# @details 数値部分は数値として比較し、英字で始まる "-" 以降はプレリリースとして正式版より小さく扱います
+# @param version バージョン文字列
+# @return 比較用のタプル
+def version_key(version: str) -> tuple:
+    v = version.strip().lstrip("vV").split("+", 1)[0]  # ビルドメタデータは比較しない
+    release, pre = v, ""
+    m = re.search(r"-(?=[A-Za-z])", v)
+    if m:
+        release, pre = v[:m.start()], v[m.end():]
+    rel = tuple((0, int(t)) if t.isdigit() else (1, t.lower()) for t in _TOKEN.findall(release))
+    pre_key = tuple((0, int(t)) if t.isdigit() else (1, t.lower()) for t in _TOKEN.findall(pre))
+    while rel and rel[-1] == (0, 0):
+        rel = rel[:-1]  # 1.0 と 1.0.0 を同一視
+    return (rel, 0 if pre else 1, pre_key)
+
+def _cmp(a: str, b: str) -> int:
+    ka, kb = version_key(a), version_key(b)
+    return (ka > kb) - (ka < kb)
+
+def _prefix(parts: tuple, n: int) -> tuple:
+    return (parts + ((0, 0),) * n)[:n]  # version_key で落とした末尾の 0 を補って比較する
+
+def _maven_contains(spec: str, version: str) -> bool:
+    ranges = re.findall(r"[\[\(][^\]\)]*[\]\)]", spec)
+    if not ranges:
+        return True  # 角括弧なしの指定は推奨バージョンにすぎず、Forge/Maven ではどのバージョンでも満たす
+    for r in ranges:
+        lo_inc, hi_inc = r[0] == "[", r[-1] == "]"
+        inner = r[1:-1]
+        if "," not in inner:
+            if _cmp(version, inner) == 0:
+                return True
+            continue
+        lo, hi = (x.strip() for x in inner.split(",", 1))
+        if lo and (_cmp(version, lo) < 0 or (not lo_inc and _cmp(version, lo) == 0)):
+            continue
+        if hi and (_cmp(version, hi) > 0 or (not hi_inc and _cmp(version, hi) == 0)):
+            continue
+        return True
+    return False
+
+def _semver_term(term: str, version: str) -> bool:
+    m = re.match(r"(>=|<=|>|<|=|~|\^)?\s*(.+)", term)
+    op, target = m.group(1) or "", m.group(2)
+    if target in ("*", "x", "X"):
+        return True
+    if re.search(r"\.[xX*]", target) or (not op and target.endswith(("x", "*"))):  # 1.20.x のようなワイルドカード
+        prefix = version_key(re.sub(r"\.[xX*].*$", "", target))[0]
+        return version_key(version)[0][:len(prefix)] == prefix
+    c = _cmp(version, target)
+    if op == ">=":
+        return c >= 0
+    if op == "<=":
+        return c <= 0
+    if op == ">":
+        return c > 0
+    if op == "<":
+        return c < 0
+    if op in ("~", "^"):
+        parts = version_key(target)[0]
+        if op == "^":  # ^ は 0 でない最初の部分まで一致（^1.2 は 1.x、^0.4 は 0.4.x、^0.0.3 は 0.0.3）
+            keep = next((i + 1 for i, p in enumerate(parts) if p != (0, 0)), 1)
+        else:
+            keep = 2  # ~ はマイナーまで一致
+        return c >= 0 and _prefix(version_key(version)[0], keep) == _prefix(parts, keep)
+    return c == 0
+
+# @fn version_matches
+# @brief バージョンが範囲指定を満たすか判定する
+# @details Forge/NeoForge は Maven 形式（[1.0,2.0)）、Fabric/Quilt は semver 述語（>=1.0 <2 || 3.x）として解釈します
+# @param spec 範囲指定文字列
+# @param version 判定するバージョン
+# @param maven Maven 形式として解釈するかどうか
+# @return 満たす場合は True。バージョン不明など判定できない場合も True
+def version_matches(spec: str, version: Optional[str], maven: bool) -> bool:
+    spec = (spec or "*").strip()
+    if spec in ("", "*") or not version or "${" in version:
+        return True
+    try:
+        if maven:
+            return _maven_contains(spec, version)
+        return any(
+            all(_semver_term(t, version) for t in alt.split())
+            for alt in spec.split("||") if alt.strip()
+        )
+    except Exception:
+        return True  # 解釈できない指定で誤検知しない
+
+@dataclass
+class DependencyReport:
+    errors: list[str] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    # @fn format
+    # @brief レポートを Discord 向けの文字列にする
+    # @param limit 表示する最大件数（エラー・警告それぞれ）
+    # @return 整形済みの文字列
+    def format(self, limit: int = 15) -> str:
+        lines = [f"❌ {e}" for e in self.errors[:limit]]
+        if len(self.errors) > limit:
+            lines.append(f"…ほか {len(self.errors) - limit} 件のエラー")
+        lines += [f"⚠️ {w}" for w in self.warnings[:limit]]
+        if len(self.warnings) > limit:
+            lines.append(f"…ほか {len(self.warnings) - limit} 件の警告")
+        return "\n".join(lines) or "✅ 問題は見つかりませんでした。"
+
+# @fn check_mods
+# @brief mod 一式の依存関係と競合を検査する
+# @details modId→提供 jar の対応表を作り、重複 modId・ローダー不一致・必須依存の欠落・バージョン範囲違反・非互換 mod の同居を検出します
+# @param mods (ファイル名, ModInfo または None) の列
+# @return DependencyReport
+def check_mods(mods: Iterable[tuple[str, Optional[ModInfo]]]) -> DependencyReport:
+    report = DependencyReport()
+    jars = [(fn, m) for fn, m in mods if m is not None and m.mod_id]
+    providers: dict[str, list[tuple[str, ModInfo]]] = defaultdict(list)
+    for fn, m in jars:
+        providers[m.mod_id].append((fn, m))
+        for pid in m.provides:
+            if pid and pid != m.mod_id:
+                providers[pid].append((fn, m))
+
+    for mod_id, provs in sorted(providers.items()):
+        primary = [fn for fn, m in provs if m.mod_id == mod_id]
+        if len(primary) > 1:
+            report.errors.append(f"modId `{mod_id}` が重複しています: " + ", ".join(f"`{fn}`" for fn in primary))
+
+    loaders = Counter(m.loader for _, m in jars)
+    if loaders:
+        pack_loader = max(loaders, key=lambda k: (loaders[k], k == "NeoForge"))  # 多数派をパックのローダーとみなす
+        for fn, m in jars:
+            if m.loader in _LOADER_COMPAT[pack_loader]:
+                continue
+            msg = f"`{fn}` は {m.loader} 用ですが、パックは {pack_loader} です"
+            if _LOADER_FAMILY[m.loader] != _LOADER_FAMILY[pack_loader]:
+                report.errors.append(msg)
+            else:
+                report.warnings.append(msg)
+
+    for fn, m in jars:
+        maven = _LOADER_FAMILY.get(m.loader) == "forge"
+        for dep in m.dependencies:
+            if not dep.mod_id or dep.mod_id in PLATFORM_IDS or dep.mod_id == m.mod_id:
+                continue
+            provs = providers.get(dep.mod_id)
+            if dep.incompatible:
+                for pfn, pm in provs or []:
+                    if version_matches(dep.version_range, pm.version, maven):
+                        report.errors.append(f"`{fn}` は `{dep.mod_id}`（`{pfn}`）と互換性がありません")
+                continue
+            if not provs:
+                if dep.mandatory:
+                    report.errors.append(f"`{fn}` の必須依存 `{dep.mod_id}` {dep.version_range} が見つかりません")
+                continue
+            if not any(version_matches(dep.version_range, pm.version, maven) for _, pm in provs):
+                have = ", ".join(f"{pm.version}" for _, pm in provs)
+                msg = f"`{fn}` は `{dep.mod_id}` {dep.version_range} を要求していますが、導入済みは {have} です"
+                (report.errors if dep.mandatory else report.warnings).append(msg)
+    return report
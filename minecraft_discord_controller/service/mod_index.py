@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from typing import Iterable, Optional
+
+from minecraft_discord_controller.service.mods import ModInfo, index_jar, map_jars
+
+log = logging.getLogger(__name__)
+
+@dataclass
+class IndexedJar:
+    filename: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    mod: Optional[ModInfo]
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "IndexedJar":
+        mod = ModInfo.from_dict(d["mod"]) if d.get("mod") else None
+        return cls(d["filename"], d["size"], d["mtime_ns"], d["sha256"], mod)
+
+# @fn _scan_dir
+# @brief mods ディレクトリ内の jar の stat 情報を集める
+# @param mods_dir 対象ディレクトリ
+# @return ファイル名 -> (サイズ, mtime_ns) の辞書
+def _scan_dir(mods_dir: str) -> dict[str, tuple[int, int]]:
+    out: dict[str, tuple[int, int]] = {}
+    try:
+        with os.scandir(mods_dir) as it:
+            for e in it:
+                if e.name.endswith(".jar") and e.is_file():
+                    st = e.stat()
+                    out[e.name] = (st.st_size, st.st_mtime_ns)
+    except FileNotFoundError:
+        pass
+    return out
+
+# @class ModIndex
+# @brief mods ディレクトリ全体のメタデータインデックス
+# @details (ファイル名, サイズ, mtime) が変わった jar だけを再解析し、内容ハッシュと一緒に保持します。
+#          結果は JSON に永続化し、Bot 再起動後も差分更新から始められます
+class ModIndex:
+    def __init__(self, mods_dir: str, cache_path: str):
+        self.mods_dir = mods_dir
+        self.cache_path = cache_path
+        self.entries: dict[str, IndexedJar] = {}
+        self._lock = asyncio.Lock()
+        self._loaded = False
+
+    @property
+    def by_hash(self) -> dict[str, IndexedJar]:
+        return {e.sha256: e for e in self.entries.values()}
+
+    # @fn mods
+    # @brief 依存関係チェック用の (ファイル名, ModInfo) 一覧を返す
+    # @param replace 差し替えて評価するファイル名 -> ModInfo（アップロード前の事前検査用）
+    # @param remove 除いて評価するファイル名
+    # @return (ファイル名, ModInfo または None) のリスト
+    def mods(self, replace: dict[str, Optional[ModInfo]] | None = None, remove: Iterable[str] = ()) -> list[tuple[str, Optional[ModInfo]]]:
+        merged = {name: e.mod for name, e in self.entries.items()}
+        for name in remove:
+            merged.pop(name, None)
+        merged.update(replace or {})
+        return sorted(merged.items())
+
+    # @fn sorted_entries
+    # @brief ファイル名順のエントリ一覧を返す
+    # @return IndexedJar のリスト
+    def sorted_entries(self) -> list[IndexedJar]:
+        return [self.entries[k] for k in sorted(self.entries)]
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            self.entries = {d["filename"]: IndexedJar.from_dict(d) for d in raw.get("jars", [])}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning(f"Mod index cache {self.cache_path} is unreadable, rebuilding: {e}")
+            self.entries = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"jars": [asdict(e) for e in self.sorted_entries()]}, f, ensure_ascii=False)
+        os.replace(tmp, self.cache_path)  # 書き込み途中のキャッシュを読まないように置き換える
+
+    # @fn refresh
+    # @brief インデックスを差分更新する
+    # @details stat が変わった jar だけを解析し、件数が多い場合はプロセスプールで並列に解析します
+    # @return なし
+    async def refresh(self):
+        async with self._lock:
+            if not self._loaded:
+                await asyncio.to_thread(self._load)
+                self._loaded = True
+            stats = await asyncio.to_thread(_scan_dir, self.mods_dir)
+            changed = [
+                name for name, (size, mtime_ns) in stats.items()
+                if (e := self.entries.get(name)) is None or (e.size, e.mtime_ns) != (size, mtime_ns)
+            ]
+            removed = [name for name in self.entries if name not in stats]
+            if not changed and not removed:
+                return
+            for name in removed:
+                del self.entries[name]
+            paths = [os.path.join(self.mods_dir, name) for name in changed]
+            results = await map_jars(index_jar, paths)  # 初回構築など大量の jar はプロセスプールで並列に解析
+            for name, res in zip(changed, results):
+                if isinstance(res, BaseException):  # 走査後に削除・置換された jar は次回に回す
+                    self.entries.pop(name, None)
+                    continue
+                size, mtime_ns = stats[name]
+                self.entries[name] = IndexedJar(name, size, mtime_ns, *res)
+            await asyncio.to_thread(self._save)
+            log.info(f"Mod index updated: {len(changed)} parsed, {len(removed)} removed, {len(self.entries)} total")
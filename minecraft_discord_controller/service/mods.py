@@ -1,31 +1,191 @@
+import asyncio
+import hashlib
 import json
 import zipfile
-import tomli
-from typing import Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Tuple
 
-# @fn extract_mod_metadata
-# @brief モッドの表示名とバージョンを抽出する
-# @details zipfile で jar を開き、Forge は mods.toml、Fabric は fabric.mod.json をパースして先頭エントリの name/id と version を拾います
+from minecraft_discord_controller.utils.workers import WorkerPool
+
+# ローダーごとのメタデータファイル（jar 内の固定パス）
+NEOFORGE_TOML = "META-INF/neoforge.mods.toml"
+FORGE_TOML = "META-INF/mods.toml"
+FABRIC_JSON = "fabric.mod.json"
+QUILT_JSON = "quilt.mod.json"
+
+PROCESS_POOL_THRESHOLD = 16  # これ以上の jar を解析する場合はプロセスプールを使う
+
+@dataclass
+class ModDependency:
+    mod_id: str
+    version_range: str = "*"
+    mandatory: bool = True
+    incompatible: bool = False  # Forge の type="incompatible" / Fabric の breaks
+
+@dataclass
+class ModInfo:
+    mod_id: str
+    name: Optional[str]
+    version: Optional[str]
+    loader: str  # Forge / NeoForge / Fabric / Quilt
+    provides: list[str] = field(default_factory=list)  # 同じ jar が提供する他の modId
+    dependencies: list[ModDependency] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ModInfo":
+        deps = [ModDependency(**x) for x in d.get("dependencies", [])]
+        return cls(**{**d, "dependencies": deps})
+
+def _read(z: zipfile.ZipFile, name: str) -> Optional[str]:
+    try:
+        with z.open(name) as f:  # namelist を走査せず中央ディレクトリから直接引く
+            return f.read().decode("utf-8", errors="ignore")
+    except KeyError:
+        return None
+
+def _manifest_version(z: zipfile.ZipFile) -> Optional[str]:
+    text = _read(z, "META-INF/MANIFEST.MF") or ""
+    for line in text.splitlines():
+        if line.startswith("Implementation-Version:"):
+            return line.split(":", 1)[1].strip()
+    return None
+
+def _parse_forge(z: zipfile.ZipFile, text: str, neoforge: bool) -> Optional[ModInfo]:
+    import tomli  # mods.toml を読むときだけ読み込む（Bot の起動時には不要）
+    data = tomli.loads(text)  # TOML形式をパース
+    mods = data.get("mods") or []
+    if not mods:
+        return None
+    first = mods[0]
+    mod_id = first.get("modId")
+    version = first.get("version")
+    if version and "${" in version:  # ${file.jarVersion} はマニフェストから解決
+        version = _manifest_version(z) or version
+    deps: list[ModDependency] = []
+    for dep in (data.get("dependencies") or {}).get(mod_id, []) or []:
+        dtype = str(dep.get("type", "")).lower()  # NeoForge は type、旧 Forge は mandatory で必須性を表す
+        mandatory = dtype == "required" if dtype else dep.get("mandatory", True)
+        deps.append(ModDependency(
+            mod_id=dep.get("modId", ""),
+            version_range=dep.get("versionRange") or "*",
+            mandatory=bool(mandatory),
+            incompatible=dtype == "incompatible",
+        ))
+    if any(d.mod_id == "neoforge" for d in deps):
+        neoforge = True  # 1.20.1〜1.20.4 の NeoForge は mods.toml を使う
+    return ModInfo(
+        mod_id=mod_id,
+        name=first.get("displayName") or mod_id,  # 表示名またはmodIdを取得
+        version=version,
+        loader="NeoForge" if neoforge else "Forge",
+        provides=[m.get("modId") for m in mods[1:] if m.get("modId")],
+        dependencies=deps,
+    )
+
+def _fabric_ranges(value) -> str:
+    if isinstance(value, list):
+        return " || ".join(str(v) for v in value) or "*"
+    return str(value or "*")
+
+def _parse_fabric(text: str) -> ModInfo:
+    data = json.loads(text)  # JSON形式をパース
+    deps = [ModDependency(k, _fabric_ranges(v)) for k, v in (data.get("depends") or {}).items()]
+    deps += [ModDependency(k, _fabric_ranges(v), mandatory=False) for k, v in (data.get("recommends") or {}).items()]
+    deps += [ModDependency(k, _fabric_ranges(v), mandatory=False, incompatible=True) for k, v in (data.get("breaks") or {}).items()]
+    return ModInfo(
+        mod_id=data.get("id"),
+        name=data.get("name") or data.get("id"),  # 名前またはIDを取得
+        version=data.get("version"),
+        loader="Fabric",
+        provides=list(data.get("provides") or []),
+        dependencies=deps,
+    )
+
+def _quilt_dep(entry, incompatible: bool) -> ModDependency:
+    if isinstance(entry, str):
+        return ModDependency(entry, incompatible=incompatible)
+    return ModDependency(
+        entry.get("id", ""),
+        _fabric_ranges(entry.get("versions")),
+        mandatory=not entry.get("optional", False),
+        incompatible=incompatible,
+    )
+
+def _parse_quilt(text: str) -> ModInfo:
+    loader = json.loads(text).get("quilt_loader") or {}
+    deps = [_quilt_dep(d, False) for d in loader.get("depends") or []]
+    deps += [_quilt_dep(d, True) for d in loader.get("breaks") or []]
+    return ModInfo(
+        mod_id=loader.get("id"),
+        name=(loader.get("metadata") or {}).get("name") or loader.get("id"),
+        version=loader.get("version"),
+        loader="Quilt",
+        provides=[p if isinstance(p, str) else p.get("id") for p in loader.get("provides") or []],
+        dependencies=deps,
+    )
+
+# @fn read_mod_info
+# @brief jar からモッドのメタデータを読み取る
+# @details NeoForge/Forge の mods.toml、Quilt の quilt.mod.json、Fabric の fabric.mod.json を順に直接開いてパースします
 # @param local_jar 解析するローカルの jar ファイルパス
-# @return (表示名, バージョン) のタプル。取得できない場合は (None, None)
-def extract_mod_metadata(local_jar: str) -> Tuple[Optional[str], Optional[str]]:
+# @return ModInfo。メタデータが無い・壊れている場合は None
+def read_mod_info(local_jar: str) -> Optional[ModInfo]:
     try:
         with zipfile.ZipFile(local_jar, "r") as z:
-            for name in z.namelist():
-                if name.endswith("META-INF/mods.toml"):  # Forgeモッドのメタデータファイルを探す
-                    with z.open(name) as f:
-                        data = tomli.loads(f.read().decode("utf-8", errors="ignore"))  # TOML形式をパース
-                    mods = data.get("mods") or []
-                    if mods:
-                        disp = mods[0].get("displayName") or mods[0].get("modId")  # 表示名またはmodIdを取得
-                        ver = mods[0].get("version")
-                        return disp, ver
-            if "fabric.mod.json" in z.namelist():  # Fabricモッドのメタデータファイルを探す
-                with z.open("fabric.mod.json") as f:
-                    data = json.loads(f.read().decode("utf-8", errors="ignore"))  # JSON形式をパース
-                disp = data.get("name") or data.get("id")  # 名前またはIDを取得
-                ver = data.get("version")
-                return disp, ver
+            text = _read(z, NEOFORGE_TOML)
+            if text is not None:
+                return _parse_forge(z, text, neoforge=True)
+            text = _read(z, FORGE_TOML)
+            if text is not None:  # Forgeモッドのメタデータファイル
+                return _parse_forge(z, text, neoforge=False)
+            text = _read(z, QUILT_JSON)
+            if text is not None:
+                return _parse_quilt(text)
+            text = _read(z, FABRIC_JSON)
+            if text is not None:  # Fabricモッドのメタデータファイル
+                return _parse_fabric(text)
     except Exception:
         pass
-    return None, None  # メタデータの抽出に失敗した場合はNoneを返す
+    return None
+
+# @fn sha256_file
+# @brief ファイルの SHA-256 を計算する
+# @param path 対象ファイルパス
+# @return 16進文字列のハッシュ値
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+# @fn index_jar
+# @brief jar のハッシュとメタデータをまとめて取得する
+# @details プロセスプールから呼び出せるようにモジュール直下に置いています
+# @param local_jar 解析するローカルの jar ファイルパス
+# @return (SHA-256, ModInfo または None)
+def index_jar(local_jar: str) -> Tuple[str, Optional[ModInfo]]:
+    return sha256_file(local_jar), read_mod_info(local_jar)
+
+# @fn extract_mod_metadata
+# @brief モッドの表示名とバージョンを抽出する
+# @details read_mod_info の結果から表示名とバージョンだけを取り出します
+# @param local_jar 解析するローカルの jar ファイルパス
+# @return (表示名, バージョン) のタプル。取得できない場合は (None, None)
+def extract_mod_metadata(local_jar: str) -> Tuple[Optional[str], Optional[str]]:
+    info = read_mod_info(local_jar)
+    if info is None:
+        return None, None  # メタデータの抽出に失敗した場合はNoneを返す
+    return info.name, info.version
+
+# @fn map_jars
+# @brief 複数の jar に解析関数を並列に適用する
+# @details 件数が PROCESS_POOL_THRESHOLD 未満ならスレッドで、それ以上ならプロセスプールで CPU コア数ぶん並列に実行します
+# @param fn 各 jar のパスを受け取る関数（プロセスプールから呼べるようモジュール直下のもの）
+# @param paths 解析する jar のパス
+# @return paths と同じ順の結果のリスト（失敗したものは例外オブジェクト）
+async def map_jars(fn: Callable[[str], Any], paths: list[str]) -> list:
+    if len(paths) < PROCESS_POOL_THRESHOLD:
+        return await asyncio.gather(*(asyncio.to_thread(fn, p) for p in paths), return_exceptions=True)
+    async with WorkerPool() as pool:  # キャンセルされてもイベントループを止めずにワーカーを終了させる
+        return await asyncio.gather(*(pool.run(fn, p) for p in paths), return_exceptions=True)
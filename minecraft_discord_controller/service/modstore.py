@@ -0,0 +1,443 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import re
+import shutil
+import stat
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from minecraft_discord_controller.service.mods import sha256_file
+from minecraft_discord_controller.service.uploads import StagedUpload
+from minecraft_discord_controller.utils.metrics import FILE_SECONDS
+
+log = logging.getLogger(__name__)
+
+_SNAPSHOT_SECONDS = FILE_SECONDS.labels("snapshot")
+_SWAP_SECONDS = FILE_SECONDS.labels("swap")
+_ID_RE = re.compile(r"\d{4,}-\d{8}-\d{6}")  # _next_id() が作る ID の形式
+STORE_GC_GRACE_SECONDS = 3600  # 格納・再利用からこの秒数が経つまでは参照が無くてもストアから消さない
+
+class SnapshotNotFound(KeyError):
+    pass
+
+# @fn _link_or_copy
+# @brief ハードリンクを作成し、できない場合はコピーする
+# @details ストアとスナップショットが別のファイルシステムにある場合（EXDEV など）だけ copy2 にフォールバックします
+# @param src リンク元
+# @param dst 作成するパス
+# @return なし
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+# @fn _rmtree
+# @brief 読み取り専用のディレクトリを含むツリーを削除する
+# @details スナップショットのディレクトリは 0o555 のため、書き込み権限を戻してから削除します。失敗は呼び出し元へ伝えます
+# @param path 削除するディレクトリ
+# @return なし
+def _rmtree(path: str):
+    for root, _, _ in os.walk(path):
+        os.chmod(root, stat.S_IRWXU)
+    shutil.rmtree(path)
+
+# @fn _write_json
+# @brief JSON を一時ファイル経由で原子的に書き出す
+# @param path 書き出し先
+# @param data 書き出す値
+# @return なし
+def _write_json(path: str, data):
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+# @class ModStore
+# @brief SHA-256 をキーにした jar の内容アドレスストア
+# @details jar は <root>/<ハッシュ先頭2文字>/<ハッシュ>.jar に読み取り専用で 1 つだけ置きます。
+#          同じ内容の jar を何度アップロードしても、2 回目以降は一時ファイルを捨てるだけで済みます。
+#          ストアは複数サーバーの SnapshotManager で共有するため、gc() は登録された全マネージャーのマニフェストを参照します
+class ModStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._managers: list["SnapshotManager"] = []  # gc() で参照を集めるスナップショット管理
+
+    @property
+    def tmp_dir(self) -> str:
+        return os.path.join(self.root, "tmp")  # ストアと同じファイルシステム上の受信用ディレクトリ
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], f"{sha256}.jar")
+
+    def has(self, sha256: str) -> bool:
+        return os.path.exists(self.path_for(sha256))
+
+    def _place(self, tmp_path: str, sha256: str) -> bool:
+        dst = self.path_for(sha256)
+        if os.path.exists(dst):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)  # 同じ内容が既にあるので転送済みの一時ファイルは不要
+            with contextlib.suppress(OSError):
+                os.utime(dst)  # コミットまでの間に gc() で消されないよう再利用した時刻を残す
+            return False
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        os.chmod(tmp_path, 0o444)  # スナップショットとinodeを共有するので書き換えを防ぐ
+        os.replace(tmp_path, dst)
+        with contextlib.suppress(OSError):
+            os.utime(dst)  # ハードリンクで取り込んだ場合は元の更新時刻のままなので格納時刻にする
+        return True
+
+    # @fn add_staged
+    # @brief ストリーミング受信した一時ファイルをストアへ取り込む
+    # @param staged tmp_dir に書き出した StagedUpload
+    # @return 新しく格納した場合は True、同じ内容が既にあった場合は False
+    def add_staged(self, staged: StagedUpload) -> bool:
+        return self._place(staged.path, staged.sha256)
+
+    # @fn add_file
+    # @brief 既存の jar をストアへ取り込む
+    # @details 可能ならハードリンクで取り込み、データのコピーを避けます
+    # @param path 取り込む jar のパス
+    # @return SHA-256
+    def add_file(self, path: str) -> str:
+        sha = sha256_file(path)
+        if self.has(sha):
+            with contextlib.suppress(OSError):
+                os.utime(self.path_for(sha))  # _place() と同じく gc() の猶予を取り直す
+            return sha
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        tmp = os.path.join(self.tmp_dir, f".import-{os.getpid()}-{sha[:16]}.part")
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        _link_or_copy(path, tmp)
+        self._place(tmp, sha)
+        return sha
+
+    def register(self, manager: "SnapshotManager"):
+        self._managers.append(manager)
+
+    # @fn gc
+    # @brief どのスナップショットからも参照されていない jar をストアから削除する
+    # @details 登録された全 SnapshotManager のマニフェストに載っている jar は残します。
+    #          格納・再利用から grace 秒以内の jar（コミット前の可能性がある）と、ハードリンクが残っている jar（作成途中のスナップショットが使っている可能性がある）も残します
+    # @param grace 削除対象にするまでの猶予秒数
+    # @return 削除した jar の数
+    def gc(self, grace: float = STORE_GC_GRACE_SECONDS) -> int:
+        referenced: set[str] = set()
+        for m in self._managers:
+            for sid in m.ids():
+                with contextlib.suppress(SnapshotNotFound):
+                    referenced.update(m.get(sid).jars.values())
+        cutoff = time.time() - grace
+        removed = 0
+        try:
+            buckets = [e.path for e in os.scandir(self.root) if len(e.name) == 2 and e.is_dir()]
+        except FileNotFoundError:
+            return 0
+        for bucket in buckets:
+            with os.scandir(bucket) as it:
+                for e in it:
+                    if not e.name.endswith(".jar") or e.name[:-4] in referenced:
+                        continue
+                    st = e.stat()
+                    if st.st_nlink > 1 or st.st_mtime > cutoff:
+                        continue
+                    os.unlink(e.path)
+                    removed += 1
+        if removed:
+            log.info(f"Removed {removed} unreferenced jar(s) from {self.root}")
+        return removed
+
+@dataclass
+class Snapshot:
+    id: str
+    created_at: float
+    jars: dict[str, str] = field(default_factory=dict)  # ファイル名 -> SHA-256
+    parent: Optional[str] = None
+    note: str = ""
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Snapshot":
+        return cls(d["id"], d["created_at"], dict(d.get("jars") or {}), d.get("parent"), d.get("note") or "")
+
+@dataclass
+class SnapshotDiff:
+    added: list[str]
+    removed: list[str]
+    changed: list[str]
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+# @fn diff_snapshots
+# @brief 2 つのスナップショットの jar 構成を比較する
+# @param old 比較元
+# @param new 比較先
+# @return SnapshotDiff（ファイル名はそれぞれ昇順）
+def diff_snapshots(old: Snapshot, new: Snapshot) -> SnapshotDiff:
+    return SnapshotDiff(
+        added=sorted(n for n in new.jars if n not in old.jars),
+        removed=sorted(n for n in old.jars if n not in new.jars),
+        changed=sorted(n for n, sha in new.jars.items() if n in old.jars and old.jars[n] != sha),
+    )
+
+# @class SnapshotManager
+# @brief mods ディレクトリの不変スナップショットと切り替え
+# @details スナップショットは <root>/<ID>/ にストアの jar をハードリンクしたディレクトリで、一度作ったら変更しません。
+#          mods ディレクトリ自体はアクティブなスナップショットへのシンボリックリンクで、切り替えやロールバックは
+#          一時リンクの作成と rename の 2 操作（rename は原子的）だけで完了します。
+#          ディレクトリは読み取り専用にしますが、root 権限などで直接置かれた jar は snapshot() でストアへ取り込んで新しいスナップショットにします。
+#          既存の実ディレクトリは最初の操作時に jar をストアへ取り込み、<mods_dir>.pre-snapshot-<日時> へ退避してから置き換えます。
+#          keep を指定すると、新しいスナップショットを作るたびに古いものを削除してストアの不要な jar も片付けます
+class SnapshotManager:
+    def __init__(self, mods_dir: str, root: str, store: ModStore, keep: int = 0):
+        self.mods_dir = mods_dir
+        self.root = root
+        self.store = store
+        self.keep = keep
+        self._lock = asyncio.Lock()
+        store.register(self)
+
+    def _manifest_path(self, sid: str) -> str:
+        if not _ID_RE.fullmatch(sid):
+            raise SnapshotNotFound(sid)  # ユーザー入力の ID をそのままパスに使わない
+        return os.path.join(self.root, f"{sid}.json")
+
+    def _dir(self, sid: str) -> str:
+        if not _ID_RE.fullmatch(sid):
+            raise SnapshotNotFound(sid)
+        return os.path.abspath(os.path.join(self.root, sid))
+
+    # @fn ids
+    # @brief 完成済みスナップショットの ID を古い順に返す
+    # @details マニフェストはディレクトリを作り終えてから書くため、作成途中のものは含まれません
+    # @return ID のリスト
+    def ids(self) -> list[str]:
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(n[:-5] for n in names if n.endswith(".json") and _ID_RE.fullmatch(n[:-5]))
+
+    # @fn get
+    # @brief スナップショットを読み込む
+    # @param sid スナップショット ID
+    # @return Snapshot
+    def get(self, sid: str) -> Snapshot:
+        try:
+            with open(self._manifest_path(sid), "r", encoding="utf-8") as f:
+                return Snapshot.from_dict(json.load(f))
+        except (FileNotFoundError, ValueError):
+            raise SnapshotNotFound(sid) from None
+
+    # @fn recent
+    # @brief 新しい順に直近のスナップショットを返す
+    # @details 一覧の取得後に削除されたものは飛ばします
+    # @param n 最大件数
+    # @return Snapshot のリスト
+    def recent(self, n: int) -> list[Snapshot]:
+        out = []
+        for sid in reversed(self.ids()[-n:]):
+            with contextlib.suppress(SnapshotNotFound):
+                out.append(self.get(sid))
+        return out
+
+    # @fn current_id
+    # @brief mods ディレクトリが指しているスナップショットの ID を返す
+    # @return ID。まだスナップショット管理されていない場合は None
+    def current_id(self) -> Optional[str]:
+        if not os.path.islink(self.mods_dir):
+            return None
+        target = os.path.join(os.path.dirname(self.mods_dir), os.readlink(self.mods_dir))
+        if os.path.dirname(os.path.abspath(target)) != os.path.abspath(self.root):
+            return None  # 手動で別の場所へ向けられている
+        return os.path.basename(target)
+
+    # @fn current
+    # @brief アクティブなスナップショットを返す
+    # @return Snapshot。スナップショット管理されていない場合は None
+    def current(self) -> Optional[Snapshot]:
+        sid = self.current_id()
+        return self.get(sid) if sid else None
+
+    # @fn previous
+    # @brief ロールバック先の既定となるスナップショットを返す
+    # @details 現在のスナップショットの作成元、無ければ ID 順で 1 つ前のものを返します
+    # @return Snapshot または None
+    def previous(self) -> Optional[Snapshot]:
+        cur = self.current()
+        if cur is None:
+            return None
+        if cur.parent and cur.parent in self.ids():
+            return self.get(cur.parent)
+        older = [i for i in self.ids() if i < cur.id]
+        return self.get(older[-1]) if older else None
+
+    def _next_id(self) -> str:
+        ids = self.ids()
+        seq = int(ids[-1].split("-", 1)[0]) + 1 if ids else 1
+        return f"{seq:04d}-{time.strftime('%Y%m%d-%H%M%S')}"  # 連番で並び順と一意性を保つ
+
+    def _build(self, jars: dict[str, str], parent: Optional[str], note: str) -> Snapshot:
+        os.makedirs(self.root, exist_ok=True)
+        snap = Snapshot(self._next_id(), time.time(), dict(sorted(jars.items())), parent, note)
+        final = self._dir(snap.id)
+        tmp = os.path.join(self.root, f".build-{snap.id}")
+        if os.path.lexists(tmp):
+            _rmtree(tmp)  # 中断された作成の残り（読み取り専用の場合がある）
+        os.makedirs(tmp)
+        with _SNAPSHOT_SECONDS.time():
+            for name, sha in snap.jars.items():
+                _link_or_copy(self.store.path_for(sha), os.path.join(tmp, name))  # データは複製しない
+            os.chmod(tmp, 0o555)  # 作成後は jar の追加・削除もできないようにする
+            os.rename(tmp, final)
+            _write_json(self._manifest_path(snap.id), asdict(snap))  # マニフェストの書き込みで完成とする
+        return snap
+
+    def _activate(self, sid: str):
+        tmp_link = f"{self.mods_dir}.swap-{os.getpid()}"
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_link)
+        with _SWAP_SECONDS.time():
+            os.symlink(self._dir(sid), tmp_link)
+            os.replace(tmp_link, self.mods_dir)  # シンボリックリンクの差し替えは原子的
+
+    def _capture(self, base: Optional[Snapshot]) -> dict[str, str]:
+        jars: dict[str, str] = {}
+        try:
+            with os.scandir(self.mods_dir) as it:
+                for e in it:
+                    if not (e.name.endswith(".jar") and e.is_file()):
+                        continue
+                    sha = base.jars.get(e.name) if base else None
+                    if sha and self.store.has(sha) and os.path.samefile(e.path, self.store.path_for(sha)):
+                        jars[e.name] = sha  # ストアと同じ inode なら再計算不要
+                    else:
+                        jars[e.name] = self.store.add_file(e.path)
+        except FileNotFoundError:
+            pass
+        return jars
+
+    def _migrate(self) -> bool:
+        if os.path.islink(self.mods_dir):
+            return False
+        snap = self._build(self._capture(None), None, "既存の mods ディレクトリから作成")
+        if os.path.isdir(self.mods_dir):
+            backup = f"{self.mods_dir}.pre-snapshot-{time.strftime('%Y%m%d-%H%M%S')}"
+            others = [n for n in os.listdir(self.mods_dir) if not n.endswith(".jar")]
+            os.rename(self.mods_dir, backup)  # 初回のみ: 元のディレクトリは退避して残す
+            if others:
+                log.warning(f"Entries other than .jar were not carried into snapshots and remain in {backup}: {', '.join(sorted(others))}")
+            log.info(f"Moved {self.mods_dir} to {backup}")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.mods_dir)), exist_ok=True)
+        self._activate(snap.id)
+        log.info(f"{self.mods_dir} now points at snapshot {snap.id} ({len(snap.jars)} jars)")
+        return True
+
+    def _commit(self, changes: dict[str, Optional[str]], note: str) -> Snapshot:
+        self._migrate()
+        base = self.current()
+        jars = dict(base.jars) if base else {}
+        for name, sha in changes.items():
+            if sha is None:
+                jars.pop(name, None)
+            else:
+                jars[name] = sha
+        snap = self._build(jars, base.id if base else None, note)
+        self._activate(snap.id)
+        self._auto_prune()
+        return snap
+
+    def _snapshot(self, note: str) -> tuple[Snapshot, bool]:
+        migrated = self._migrate()
+        base = self.current()
+        jars = self._capture(base)
+        if base is not None and jars == base.jars and not note:
+            return base, migrated  # 変化が無ければ新しいスナップショットは作らない
+        snap = self._build(jars, base.id if base else None, note)
+        self._activate(snap.id)
+        self._auto_prune()
+        return snap, True
+
+    def _prune(self, keep: int) -> list[str]:
+        ids = self.ids()
+        protect = set(ids[-keep:]) if keep > 0 else set()
+        cur = self.current()
+        if cur is not None:
+            protect.add(cur.id)
+            prev = self.previous()  # 引数なしの /mods rollback の戻り先
+            if prev is not None:
+                protect.add(prev.id)
+        removed = [sid for sid in ids if sid not in protect]
+        for sid in removed:
+            os.unlink(self._manifest_path(sid))  # マニフェストを先に消して未完成扱いにする
+            if os.path.lexists(self._dir(sid)):
+                _rmtree(self._dir(sid))
+        for name in os.listdir(self.root):  # 削除に失敗した・作成を中断したディレクトリも片付ける
+            path = os.path.join(self.root, name)
+            if name not in protect and name not in ids and os.path.isdir(path) and not os.path.islink(path):
+                if _ID_RE.fullmatch(name) or name.startswith(".build-"):
+                    _rmtree(path)
+        return removed
+
+    def _auto_prune(self):
+        if self.keep <= 0:
+            return
+        try:
+            removed = self._prune(self.keep)
+            if removed:
+                log.info(f"Pruned {len(removed)} old snapshot(s) in {self.root}: {', '.join(removed)}")
+            self.store.gc()
+        except OSError as e:
+            log.warning(f"Failed to prune snapshots in {self.root}: {e}")  # 切り替えは済んでいるので失敗扱いにはしない
+
+    def _rollback(self, sid: Optional[str]) -> tuple[Snapshot, Optional[Snapshot]]:
+        self._migrate()
+        cur = self.current()
+        target = self.get(sid) if sid else self.previous()
+        if target is None:
+            raise SnapshotNotFound("previous")
+        self._activate(target.id)
+        return target, cur
+
+    # @fn commit
+    # @brief 現在の構成に変更を加えた新しいスナップショットを作り、アクティブにする
+    # @param changes ファイル名 -> SHA-256（None は削除）。jar は事前にストアへ格納しておくこと
+    # @param note スナップショットの説明
+    # @return 作成した Snapshot
+    async def commit(self, changes: dict[str, Optional[str]], note: str = "") -> Snapshot:
+        async with self._lock:
+            return await asyncio.to_thread(self._commit, changes, note)
+
+    # @fn snapshot
+    # @brief mods ディレクトリの現在の内容をスナップショットとして記録する
+    # @details 直接置かれた jar などスナップショットと異なる内容はストアへ取り込みます。変化が無く note も無い場合は作成しません
+    # @param note スナップショットの説明
+    # @return (Snapshot, 新規作成したか)
+    async def snapshot(self, note: str = "") -> tuple[Snapshot, bool]:
+        async with self._lock:
+            return await asyncio.to_thread(self._snapshot, note)
+
+    # @fn rollback
+    # @brief 指定したスナップショットへ mods ディレクトリを切り替える
+    # @details 既存のディレクトリを指し直すだけなので jar の再転送や再作成は行いません
+    # @param sid 切り替え先の ID（None の場合は previous() のスナップショット）
+    # @return (切り替え先, 切り替え前) の Snapshot
+    async def rollback(self, sid: Optional[str] = None) -> tuple[Snapshot, Optional[Snapshot]]:
+        async with self._lock:
+            return await asyncio.to_thread(self._rollback, sid)
@@ -0,0 +1,272 @@
+import asyncio
+import contextlib
+import logging
+import math
+import re
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from minecraft_discord_controller.service.rcon import RconPool
+
+log = logging.getLogger(__name__)
+
+FIELDS = ("tps", "mspt", "players", "entities")  # リングバッファに記録する値の並び
+TPS, MSPT, PLAYERS, ENTITIES = range(len(FIELDS))
+
+TPS_COMMANDS = ("forge tps", "neoforge tps", "spark tps")  # 自動検出で順に試すコマンド
+_COLOR_RE = re.compile(r"§.")
+_LIST_RE = re.compile(r"There are (\d+)\s*(?:of a max of|/)\s*(\d+) players online")
+_FORGE_RE = re.compile(r"Overall\s*:\s*Mean tick time:\s*([\d.]+)\s*ms\.?\s*Mean TPS:\s*([\d.]+)")
+_NEOFORGE_RE = re.compile(r"Overall\s*:\s*([\d.]+)\s*TPS\s*\(([\d.]+)\s*ms/tick\)")
+_SPARK_TPS_RE = re.compile(r"TPS from last[^:]*:[^\d*]*\*?([\d.]+)")  # 行頭の [⚡] などの装飾を読み飛ばす
+_SPARK_MSPT_RE = re.compile(r"Tick durations[^:]*:[^\d]*[\d.]+/([\d.]+)/")
+_ENTITIES_RE = re.compile(r"count:\s*(\d+)")
+
+@dataclass(frozen=True)
+class PerfSample:
+    wall_time: float
+    tps: Optional[float] = None
+    mspt: Optional[float] = None
+    players: Optional[int] = None
+    players_max: Optional[int] = None
+    entities: Optional[int] = None
+
+    @property
+    def values(self) -> tuple:
+        return (self.tps, self.mspt, self.players, self.entities)
+
+@dataclass(frozen=True)
+class WindowStats:
+    min: float
+    avg: float
+    max: float
+    count: int
+
+# @fn parse_list
+# @brief list コマンドの応答からプレイヤー数を取り出す
+# @param text RCON の応答
+# @return (オンライン人数, 最大人数)。解釈できない場合は (None, None)
+def parse_list(text: str) -> tuple[Optional[int], Optional[int]]:
+    m = _LIST_RE.search(_COLOR_RE.sub("", text))
+    return (int(m.group(1)), int(m.group(2))) if m else (None, None)
+
+# @fn parse_tps
+# @brief forge tps / neoforge tps / spark tps の応答から全体の TPS と MSPT を取り出す
+# @param text RCON の応答
+# @return (TPS, MSPT)。解釈できない値は None
+def parse_tps(text: str) -> tuple[Optional[float], Optional[float]]:
+    text = _COLOR_RE.sub("", text)
+    if m := _FORGE_RE.search(text):
+        return float(m.group(2)), float(m.group(1))
+    if m := _NEOFORGE_RE.search(text):
+        return float(m.group(1)), float(m.group(2))
+    tps = _SPARK_TPS_RE.search(text)
+    mspt = _SPARK_MSPT_RE.search(text)  # spark は中央値のティック時間を使う
+    return (float(tps.group(1)) if tps else None), (float(mspt.group(1)) if mspt else None)
+
+# @fn parse_entities
+# @brief execute if entity @e の応答から読み込み済みエンティティ数を取り出す
+# @param text RCON の応答
+# @return エンティティ数。解釈できない場合は None
+def parse_entities(text: str) -> Optional[int]:
+    m = _ENTITIES_RE.search(text)
+    return int(m.group(1)) if m else None
+
+# @class RollupRing
+# @brief 一定幅の時間バケットごとに min/sum/max/count を持つ固定長リングバッファ
+# @details 値は生成時に確保した array にバケット × 項目の順で並べ、追加は該当スロットの更新だけで行います。
+#          スロットには時刻をバケット幅で割った通し番号を記録し、番号が変わったスロットは再利用前に初期化します。
+#          そのため稼働期間に関わらずメモリ使用量は slots に比例した一定量です
+class RollupRing:
+    def __init__(self, width: float, slots: int, fields: int = len(FIELDS)):
+        self.width = width
+        self.slots = slots
+        self.fields = fields
+        self.epochs = array("q", [-1]) * slots
+        self.mins = array("d", [math.inf]) * (slots * fields)
+        self.maxs = array("d", [-math.inf]) * (slots * fields)
+        self.sums = array("d", [0.0]) * (slots * fields)
+        self.counts = array("L", [0]) * (slots * fields)
+
+    @property
+    def span(self) -> float:
+        return self.width * self.slots
+
+    # @fn add
+    # @brief サンプルを該当するバケットへ集約する
+    # @param ts サンプルの時刻（time.time() 基準）
+    # @param values FIELDS 順の値（None は欠測として数えない）
+    # @return なし
+    def add(self, ts: float, values: Sequence[Optional[float]]):
+        epoch = int(ts // self.width)
+        slot = epoch % self.slots
+        base = slot * self.fields
+        if self.epochs[slot] > epoch:
+            return  # 既に上書きされた古いバケット宛てのサンプル
+        if self.epochs[slot] != epoch:  # 一周前のバケットを上書きする
+            self.epochs[slot] = epoch
+            for j in range(base, base + self.fields):
+                self.mins[j] = math.inf
+                self.maxs[j] = -math.inf
+                self.sums[j] = 0.0
+                self.counts[j] = 0
+        for i, v in enumerate(values):
+            if v is None:
+                continue
+            j = base + i
+            if v < self.mins[j]:
+                self.mins[j] = v
+            if v > self.maxs[j]:
+                self.maxs[j] = v
+            self.sums[j] += v
+            self.counts[j] += 1
+
+    # @fn window
+    # @brief 直近 seconds 秒に含まれるバケットをまとめて集計する
+    # @param now 現在時刻（time.time() 基準）
+    # @param seconds 集計する期間（秒）
+    # @return FIELDS 順の WindowStats（サンプルが無い項目は None）
+    def window(self, now: float, seconds: float) -> list[Optional[WindowStats]]:
+        first, last = int((now - seconds) // self.width) + 1, int(now // self.width)
+        lo = [math.inf] * self.fields
+        hi = [-math.inf] * self.fields
+        total = [0.0] * self.fields
+        n = [0] * self.fields
+        for slot, epoch in enumerate(self.epochs):
+            if not first <= epoch <= last:
+                continue
+            base = slot * self.fields
+            for i in range(self.fields):
+                c = self.counts[base + i]
+                if not c:
+                    continue
+                lo[i] = min(lo[i], self.mins[base + i])
+                hi[i] = max(hi[i], self.maxs[base + i])
+                total[i] += self.sums[base + i]
+                n[i] += c
+        return [WindowStats(lo[i], total[i] / n[i], hi[i], n[i]) if n[i] else None for i in range(self.fields)]
+
+    # @fn series
+    # @brief 直近 seconds 秒を points 個の区間に分けた平均値の列を返す
+    # @param now 現在時刻（time.time() 基準）
+    # @param seconds 対象期間（秒）
+    # @param points 区間の数
+    # @param field 対象項目の番号（TPS など）
+    # @return 古い順の平均値のリスト（サンプルが無い区間は None）
+    def series(self, now: float, seconds: float, points: int, field: int) -> list[Optional[float]]:
+        first, last = int((now - seconds) // self.width) + 1, int(now // self.width)
+        per = max(1, (last - first + 1) / points)
+        total = [0.0] * points
+        n = [0] * points
+        for slot, epoch in enumerate(self.epochs):
+            if not first <= epoch <= last:
+                continue
+            j = slot * self.fields + field
+            if self.counts[j]:
+                k = min(points - 1, int((epoch - first) / per))
+                total[k] += self.sums[j]
+                n[k] += self.counts[j]
+        return [total[k] / n[k] if n[k] else None for k in range(points)]
+
+# @class PerfSampler
+# @brief RCON 経由でサーバーの TPS・MSPT・プレイヤー数・エンティティ数を定期的に記録する
+# @details 1 分幅 × 24 時間分と 15 分幅 × 7 日分の RollupRing に集約し、生のサンプルは直近の 1 件だけ保持します。
+#          TPS コマンドは未指定なら forge tps / neoforge tps / spark tps を順に試して応答を解釈できたものを使い、
+#          サーバーへ接続できなくなった後は再検出します（再起動で導入 mod が変わる場合に備える）
+class PerfSampler:
+    def __init__(self, rcon: RconPool, *, interval: float = 30.0, tps_command: Optional[str] = None):
+        self.rcon = rcon
+        self.interval = interval
+        self.tps_command = tps_command
+        self.last: Optional[PerfSample] = None
+        self.minute = RollupRing(60, 24 * 60)
+        self.quarter = RollupRing(15 * 60, 7 * 24 * 4)
+        self._detected: Optional[str] = None  # 自動検出した TPS コマンド（"" は対応コマンドなし）
+        self._task: asyncio.Task | None = None
+
+    # @fn start
+    # @brief サンプリングタスクを起動する
+    # @details interval が 0 以下の場合は起動しません
+    # @return なし
+    def start(self):
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    # @fn stop
+    # @brief サンプリングタスクを停止する
+    # @return なし
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _rcon(self, cmd: str) -> Optional[str]:
+        try:
+            return await self.rcon.command(cmd, retries=1)  # 次の周期で取り直すので再試行は最小限にする
+        except Exception:
+            return None
+
+    async def _tps(self) -> tuple[Optional[float], Optional[float]]:
+        cmd = self.tps_command or self._detected
+        if cmd:
+            return parse_tps(await self._rcon(cmd) or "")
+        if cmd == "":
+            return None, None
+        for cand in TPS_COMMANDS:
+            tps, mspt = parse_tps(await self._rcon(cand) or "")
+            if tps is not None:
+                self._detected = cand
+                log.info(f"Using '{cand}' for TPS sampling on {self.rcon.host}:{self.rcon.port}")
+                return tps, mspt
+        self._detected = ""
+        return None, None
+
+    # @fn sample
+    # @brief 1 回分のサンプルを取得してリングバッファに記録する
+    # @details list・TPS・エンティティ数の問い合わせを並行して送ります。list に応答が無い場合はオフラインとみなして記録しません
+    # @return PerfSample。サーバーに接続できない場合は None
+    async def sample(self) -> Optional[PerfSample]:
+        listing, (tps, mspt), entities = await asyncio.gather(
+            self._rcon("list"), self._tps(), self._rcon("execute if entity @e"),
+        )
+        if listing is None:
+            if self.tps_command is None:
+                self._detected = None  # 次に接続できた時に TPS コマンドを検出し直す
+            return None
+        players, players_max = parse_list(listing)
+        s = PerfSample(time.time(), tps, mspt, players, players_max, parse_entities(entities or ""))
+        self.minute.add(s.wall_time, s.values)
+        self.quarter.add(s.wall_time, s.values)
+        self.last = s
+        return s
+
+    # @fn stats
+    # @brief 直近 seconds 秒の集計値を返す
+    # @details 24 時間以内は 1 分幅、それより長い期間は 15 分幅のバケットから集計します
+    # @param seconds 集計する期間（秒）
+    # @return FIELDS 順の WindowStats（サンプルが無い項目は None）
+    def stats(self, seconds: float) -> list[Optional[WindowStats]]:
+        ring = self.minute if seconds <= self.minute.span else self.quarter
+        return ring.window(time.time(), seconds)
+
+    # @fn series
+    # @brief 直近 seconds 秒の推移を points 個の平均値で返す
+    # @param seconds 対象期間（秒）
+    # @param points 区間の数
+    # @param field 対象項目の番号
+    # @return 古い順の平均値のリスト
+    def series(self, seconds: float, points: int, field: int = TPS) -> list[Optional[float]]:
+        ring = self.minute if seconds <= self.minute.span else self.quarter
+        return ring.series(time.time(), seconds, points, field)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sample()
+            except Exception as e:
+                log.warning(f"Perf sample for {self.rcon.host}:{self.rcon.port} failed: {e}")
+            await asyncio.sleep(self.interval)
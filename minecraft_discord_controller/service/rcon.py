@@ -0,0 +1,279 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+import struct
+import time
+
+from minecraft_discord_controller.utils.metrics import RCON_ERRORS, RCON_SECONDS
+
+log = logging.getLogger(__name__)
+
+# Source RCON のパケット種別
+_TYPE_RESPONSE = 0
+_TYPE_COMMAND = 2
+_TYPE_LOGIN = 3
+
+_HEADER = struct.Struct("<iii")  # length, request id, type
+_MAX_FRAGMENT = 4096  # Minecraft が 1 パケットで返す本文の最大長（Java の文字数 = UTF-16 のコード単位数）
+
+
+class RconError(RuntimeError):
+    pass
+
+
+class RconAuthError(RconError):
+    pass
+
+
+# コマンドの送信後に応答が得られなかった（サーバー側で実行済みの可能性があるため再送しない）
+class RconUnconfirmed(RconError):
+    pass
+
+
+# @fn _encode_packet
+# @brief RCON パケットをバイト列に組み立てる
+# @details length/id/type のヘッダに本文と 2 バイトの終端 NUL を付与します
+# @param req_id リクエストID
+# @param ptype パケット種別
+# @param body 本文文字列
+# @return 送信用のバイト列
+def _encode_packet(req_id: int, ptype: int, body: str) -> bytes:
+    payload = body.encode("utf-8") + b"\x00\x00"
+    return _HEADER.pack(len(payload) + 8, req_id, ptype) + payload
+
+
+def _java_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+# @class RconConnection
+# @brief 1 本の認証済み RCON 接続
+# @details リクエストIDで応答を突き合わせるため、1 接続上で複数のコマンドを同時に流せます。
+#          コマンドの直後に未定義種別の空パケット（終端マーカー）を送り、サーバーが順に返すその応答で分割応答の終わりを判定します
+class RconConnection:
+    def __init__(self, host: str, port: int, password: str, *, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._fragments: dict[int, list[str]] = {}
+        self._markers: dict[int, int] = {}  # 終端マーカーのID -> コマンドのリクエストID
+        self._ids = itertools.count(1)
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._reader_task is not None and not self._reader_task.done()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    # @fn connect
+    # @brief サーバーへ接続してログインする
+    # @details TCP 接続を張って LOGIN パケットを送り、応答IDが -1 なら RconAuthError を投げます。成功後は受信ループを起動します
+    # @return なし
+    async def connect(self):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=self.timeout
+        )
+        try:
+            req_id = next(self._ids)
+            writer.write(_encode_packet(req_id, _TYPE_LOGIN, self.password))
+            await writer.drain()
+            while True:
+                resp_id, ptype, _ = await asyncio.wait_for(self._read_packet(reader), timeout=self.timeout)
+                if ptype == _TYPE_COMMAND:  # 認証応答（SERVERDATA_AUTH_RESPONSE）
+                    break
+            if resp_id == -1:
+                raise RconAuthError(f"RCON authentication failed for {self.host}:{self.port}")
+        except BaseException:
+            writer.close()
+            raise
+        self._reader, self._writer = reader, writer
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    # @fn command
+    # @brief コマンドを送信して応答を待つ
+    # @details 新しいリクエストIDで Future を登録してからコマンドと終端マーカーを書き込み、受信ループが同じIDの応答を解決するのを待ちます。
+    #          書き込み後にタイムアウト・切断した場合は RconUnconfirmed を投げます
+    # @param cmd 実行する RCON コマンド
+    # @return コマンドの応答文字列
+    async def command(self, cmd: str) -> str:
+        if not self.connected:
+            raise RconError("RCON connection is not established")
+        req_id, marker = next(self._ids), next(self._ids)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = fut
+        self._markers[marker] = req_id
+        sent = False
+        try:
+            async with self._write_lock:
+                self._writer.write(
+                    _encode_packet(req_id, _TYPE_COMMAND, cmd) + _encode_packet(marker, _TYPE_RESPONSE, "")
+                )
+                sent = True
+                await self._writer.drain()
+            return await asyncio.wait_for(asyncio.shield(fut), timeout=self.timeout)
+        except (OSError, asyncio.TimeoutError, RconError) as e:
+            if sent:
+                raise RconUnconfirmed(f"no response to RCON command: {str(e) or type(e).__name__}") from e
+            raise
+        finally:
+            self._pending.pop(req_id, None)
+            self._fragments.pop(req_id, None)
+            self._markers.pop(marker, None)
+
+    # @fn close
+    # @brief 接続を閉じる
+    # @details 受信ループを止めてソケットを閉じ、待機中のリクエストを全て失敗させます
+    # @return なし
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await self._reader_task
+            self._reader_task = None
+        if self._writer is not None:
+            self._writer.close()
+            with contextlib.suppress(Exception):
+                await self._writer.wait_closed()
+            self._writer = None
+        self._fail_pending(RconError("RCON connection closed"))
+
+    async def _read_packet(self, reader: asyncio.StreamReader) -> tuple[int, int, str]:
+        (length,) = struct.unpack("<i", await reader.readexactly(4))
+        data = await reader.readexactly(length)
+        req_id, ptype = struct.unpack_from("<ii", data)
+        body = data[8:-2].decode("utf-8", errors="replace")
+        return req_id, ptype, body
+
+    # @fn _read_loop
+    # @brief 応答パケットを受信してリクエストへ振り分ける
+    # @details 4096 文字で分割された応答は同じIDで連結し、4096 文字未満の断片か終端マーカーへの応答が来た時点で Future を解決します
+    # @return なし
+    async def _read_loop(self):
+        try:
+            while True:
+                req_id, _, body = await self._read_packet(self._reader)
+                if req_id in self._markers:  # ちょうど 4096 文字の倍数の応答はマーカーで終わりを知る
+                    cmd_id = self._markers.pop(req_id)
+                    fut = self._pending.get(cmd_id)
+                    if fut is not None and not fut.done():
+                        fut.set_result("".join(self._fragments.pop(cmd_id, [])))
+                    continue
+                fut = self._pending.get(req_id)
+                if fut is None or fut.done():
+                    continue
+                parts = self._fragments.setdefault(req_id, [])
+                parts.append(body)
+                if _java_len(body) < _MAX_FRAGMENT:  # 最後の断片
+                    fut.set_result("".join(parts))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning(f"RCON connection to {self.host}:{self.port} lost: {e}")
+            self._fail_pending(RconError(f"RCON connection lost: {e}"))
+
+    def _fail_pending(self, exc: Exception):
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        self._pending.clear()
+        self._fragments.clear()
+        self._markers.clear()
+
+
+# @class RconPool
+# @brief サーバーごとの長寿命 RCON 接続プール
+# @details 接続は最初のコマンド実行時に張られ、切断時は指数バックオフ付きで自動再接続します
+class RconPool:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        password: str,
+        *,
+        size: int = 2,
+        timeout: float = 10.0,
+        max_backoff: float = 30.0,
+        retries: int = 3,
+    ):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.retries = retries
+        self._conns = [RconConnection(host, port, password, timeout=timeout) for _ in range(max(1, size))]
+        self._locks = [asyncio.Lock() for _ in self._conns]
+        self._backoff = [0.0 for _ in self._conns]
+
+    # @fn command
+    # @brief プール内の接続でコマンドを実行する
+    # @details 実行中リクエストが最も少ない接続を選び、未接続なら再接続してから送信します。送信前の接続失敗は retries 回まで別接続で再試行し、
+    #          送信後のタイムアウト・切断はコマンドが実行済みかもしれないため再送しません
+    # @param cmd 実行する RCON コマンド
+    # @param retries 試行回数（未指定時はプールの既定値）
+    # @return コマンドの応答文字列
+    async def command(self, cmd: str, *, retries: int | None = None) -> str:
+        t0 = time.perf_counter()
+        try:
+            return await self._command(cmd, retries or self.retries)
+        except Exception:
+            RCON_ERRORS.inc()
+            raise
+        finally:
+            RCON_SECONDS.observe(time.perf_counter() - t0)  # 再試行・再接続を含めた往復時間
+
+    async def _command(self, cmd: str, attempts: int) -> str:
+        last_exc: Exception | None = None
+        for _ in range(attempts):
+            idx = min(range(len(self._conns)), key=lambda i: (not self._conns[i].connected, self._conns[i].in_flight))
+            try:
+                conn = await self._ensure(idx)
+                return await conn.command(cmd)
+            except RconAuthError:
+                raise  # パスワード誤りは再試行しても解決しない
+            except RconUnconfirmed:
+                await self._conns[idx].close()
+                raise  # stop や give などを二重に実行しないよう再送しない
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RconError) as e:
+                last_exc = e
+                await self._conns[idx].close()
+        raise RconError(f"RCON command failed after {attempts} attempts: {last_exc}")
+
+    # @fn close
+    # @brief プール内の全接続を閉じる
+    # @return なし
+    async def close(self):
+        for conn in self._conns:
+            await conn.close()
+
+    # @fn _ensure
+    # @brief 指定スロットの接続を確立済みにする
+    # @details スロットごとのロックで多重接続を防ぎ、直前に失敗していれば指数バックオフ分待ってから接続します
+    # @param idx 接続スロットの番号
+    # @return 接続済みの RconConnection
+    async def _ensure(self, idx: int) -> RconConnection:
+        conn = self._conns[idx]
+        if conn.connected:
+            return conn
+        async with self._locks[idx]:
+            if conn.connected:
+                return conn
+            if self._backoff[idx]:
+                await asyncio.sleep(self._backoff[idx])
+            try:
+                await conn.connect()
+            except Exception:
+                self._backoff[idx] = min(self.max_backoff, max(0.5, self._backoff[idx] * 2))  # 失敗ごとに待ち時間を倍に
+                raise
+            self._backoff[idx] = 0.0
+            log.info(f"RCON connected to {self.host}:{self.port} (slot {idx})")
+            return conn
@@ -0,0 +1,206 @@
+import asyncio
+import contextlib
+import enum
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, Optional
+
+from minecraft_discord_controller.service.logfollow import LogFollower
+from minecraft_discord_controller.service.rcon import RconAuthError, RconError, RconPool, RconUnconfirmed
+from minecraft_discord_controller.service.startup import StartupTimeline, save_record, watch_startup
+
+log = logging.getLogger(__name__)
+
+BOOT_LOG_BUFFER_LINES = 1 << 16  # systemctl restart の完了を待つ間に溜まる起動ログの上限
+
+class RestartState(enum.Enum):
+    IDLE = "待機中"
+    COUNTDOWN = "カウントダウン中"
+    STOPPING = "停止処理中"
+    BOOTING = "起動監視中"
+    DONE = "起動完了"
+    TIMEOUT = "タイムアウト"
+    CANCELLED = "キャンセル"
+    FAILED = "失敗"
+
+class RestartInProgress(RuntimeError):
+    pass
+
+@dataclass
+class RestartResult:
+    state: RestartState
+    timeline: StartupTimeline
+    error: Optional[str] = None
+
+# @fn announce_countdown
+# @brief RCON で再起動までのカウントダウンを告知する
+# @details 1 秒ごとの待機は cancel イベント待ちを兼ねており、キャンセルされた場合は中止を告知して抜けます
+# @param rcon 使用する RconPool
+# @param countdown 再起動までの秒数
+# @param cancel キャンセル通知用のイベント
+# @return カウントダウンを完了した場合は True、キャンセルされた場合は False
+async def announce_countdown(rcon: RconPool, countdown: int, cancel: Optional[asyncio.Event] = None) -> bool:
+    cancel = cancel or asyncio.Event()
+    try:
+        await rcon.command(f"say Server restarting in {countdown} seconds...")  # 再起動開始のメッセージ
+    except Exception:
+        pass
+    for i in range(countdown, 0, -1):
+        try:
+            if i in (countdown, 10, 5, 4, 3, 2, 1):  # 特定の秒数でのみカウントダウンメッセージを表示
+                await rcon.command(f"say Restarting in {i}...")
+        except Exception:
+            pass
+        try:
+            await asyncio.wait_for(cancel.wait(), timeout=1)  # 1秒待機（キャンセルされれば即座に抜ける）
+        except asyncio.TimeoutError:
+            continue
+        try:
+            await rcon.command("say Restart cancelled.")
+        except Exception:
+            pass
+        return False
+    return True
+
+# @fn send_stop
+# @brief RCON で stop を送る
+# @details 送信後に応答が無いのは停止による切断として成功扱いにし、送信前の接続失敗は RconError を投げます
+# @param rcon 使用する RconPool
+# @return なし
+async def send_stop(rcon: RconPool):
+    await rcon.command("say Stopping now...")
+    try:
+        await rcon.command("stop", retries=1)  # サーバーを停止（再送すると停止中のサーバーへ二重送信になるため1回のみ）
+    except RconUnconfirmed:
+        pass  # 送信後、停止処理で応答前に切断されるのは正常
+    except RconAuthError:
+        raise
+    except RconError as e:
+        raise RconError(f"could not send stop over RCON (the server was not stopped): {e}") from e  # 送信前の失敗は起動待ちにしない
+
+# @fn systemctl_restart
+# @brief systemd を通じてサーバーを再起動する
+# @details systemctl restart を非同期サブプロセスで実行し、非ゼロ終了時は stderr を含む RuntimeError を投げます
+# @param unit 再起動する systemd ユニット名
+# @return なし
+async def systemctl_restart(unit: str):
+    proc = await asyncio.create_subprocess_exec(
+        "systemctl", "restart", unit,  # systemd経由でサーバーを再起動
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    _, err = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(err.decode(errors="ignore").strip())  # コマンド失敗時はエラーを投げる
+
+# @class RestartOrchestrator
+# @brief サーバー 1 台分の再起動ステートマシン
+# @details サーバーごとのロックで再起動の重複を防ぎます。stop/systemctl を発行する前にログ購読を開始するため、
+#          起動の速いサーバーの完了行も取りこぼしません。カウントダウン中は cancel() で再起動自体を、起動監視中は監視を中止できます
+class RestartOrchestrator:
+    def __init__(
+        self,
+        follower: LogFollower,
+        rcon: RconPool,
+        *,
+        method: str,
+        systemd_unit: str,
+        countdown: int,
+        timeout: int,
+        history_path: str,
+    ):
+        self.follower = follower
+        self.rcon = rcon
+        self.method = method
+        self.systemd_unit = systemd_unit
+        self.countdown = countdown
+        self.timeout = timeout
+        self.history_path = history_path
+        self.state = RestartState.IDLE
+        self._lock = asyncio.Lock()
+        self._cancel = asyncio.Event()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    # @fn cancel
+    # @brief 実行中の再起動をキャンセルする
+    # @details 停止処理中はサーバーを中途半端な状態にしないよう受け付けません
+    # @return キャンセルを受け付けた場合は True、受け付けられない場合は False、run() を実行していない場合は None
+    def cancel(self) -> Optional[bool]:
+        if not self.busy:
+            return None  # 呼び出し側で run() の前の処理ごとキャンセルできる
+        if self.state not in (RestartState.COUNTDOWN, RestartState.BOOTING):
+            return False
+        self._cancel.set()
+        return True
+
+    # @fn run
+    # @brief 再起動を実行して起動完了まで監視する
+    # @param mod_ids タイムラインで追跡する modId
+    # @param hint 監視ヒントにする jar ファイル名
+    # @param on_update 状態やタイムラインが変わったときに呼ばれるコールバック
+    # @return RestartResult
+    async def run(
+        self,
+        mod_ids: Iterable[str] = (),
+        hint: Optional[str] = None,
+        on_update: Optional[Callable[["RestartOrchestrator", StartupTimeline], Awaitable[None]]] = None,
+    ) -> RestartResult:
+        if self._lock.locked():
+            raise RestartInProgress("restart is already in progress")
+        async with self._lock:
+            self._cancel.clear()
+            tl = StartupTimeline(mod_ids, hint=hint)
+
+            async def notify(t: StartupTimeline = tl):
+                if on_update is not None:
+                    try:
+                        await on_update(self, t)
+                    except Exception as e:
+                        log.warning(f"Restart progress update failed: {e}")
+
+            try:
+                if self.method != "LOCAL_SYSTEMD":
+                    self.state = RestartState.COUNTDOWN
+                    await notify()
+                    if not await announce_countdown(self.rcon, self.countdown, self._cancel):
+                        return await self._finish(RestartState.CANCELLED, tl, notify)
+
+                self.state = RestartState.STOPPING
+                await notify()
+                # stop の直前に購読する（カウントダウン中の旧サーバーのログをタイムラインに混ぜず、起動ログは取りこぼさない）
+                with self.follower.subscribe(maxsize=BOOT_LOG_BUFFER_LINES) as sub:
+                    tl.reset_clock()
+                    watcher = asyncio.create_task(
+                        watch_startup(sub, tl, self.timeout, notify, cancel=self._cancel)
+                    )  # systemctl restart の完了を待つ間も起動ログをリアルタイムで取り込む
+                    try:
+                        try:
+                            if self.method == "LOCAL_SYSTEMD":
+                                await systemctl_restart(self.systemd_unit)
+                            else:
+                                await send_stop(self.rcon)
+                        except Exception as e:
+                            return await self._finish(RestartState.FAILED, tl, notify, str(e))
+
+                        self.state = RestartState.BOOTING
+                        await notify()
+                        loaded = await watcher
+                    finally:
+                        if not watcher.done():  # 失敗・ジョブのキャンセル時に監視タスクを残さない
+                            watcher.cancel()
+                            with contextlib.suppress(asyncio.CancelledError, Exception):
+                                await watcher
+                await asyncio.to_thread(save_record, self.history_path, tl)
+                if loaded:
+                    return await self._finish(RestartState.DONE, tl, notify)
+                return await self._finish(RestartState.CANCELLED if self._cancel.is_set() else RestartState.TIMEOUT, tl, notify)
+            finally:
+                self.state = RestartState.IDLE  # ジョブごとキャンセルされた場合も次の再起動を受け付けられる状態に戻す
+
+    async def _finish(self, state: RestartState, tl: StartupTimeline, notify, error: Optional[str] = None) -> RestartResult:
+        self.state = state
+        await notify()
+        self.state = RestartState.IDLE
+        return RestartResult(state, tl, error)
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from minecraft_discord_controller.config import Settings
+from minecraft_discord_controller.service.logfollow import LogFollower
+from minecraft_discord_controller.service.mod_index import ModIndex
+from minecraft_discord_controller.service.modstore import ModStore, SnapshotManager
+from minecraft_discord_controller.service.perf import PerfSampler
+from minecraft_discord_controller.service.rcon import RconPool
+from minecraft_discord_controller.service.restart import RestartOrchestrator
+from minecraft_discord_controller.service.status_poller import StatusPoller
+
+DEFAULT_SERVER = "default"  # 環境変数だけで設定した場合のサーバー名
+_NAME_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")  # Discord の選択肢と DATA_DIR 配下のディレクトリ名に使える名前
+RESTART_METHODS = ("RCON", "LOCAL_SYSTEMD")
+
+class UnknownServer(KeyError):
+    pass
+
+@dataclass(frozen=True)
+class ServerConfig:
+    name: str
+    rcon_host: str
+    rcon_port: int
+    rcon_password: str
+    log_path: str
+    mods_dir: str
+    data_dir: str
+    mc_dir: Optional[str] = None
+    query_host: Optional[str] = None
+    query_port: int = 25565
+    restart_method: str = "RCON"
+    systemd_unit: Optional[str] = None
+    restart_countdown: int = 10
+    startup_timeout: int = 240
+    perf_interval: int = 30
+    tps_command: Optional[str] = None
+
+    @property
+    def status_host(self) -> str:
+        return self.query_host or self.rcon_host
+
+# @fn _check_restart
+# @brief 再起動方法の設定を検証する
+# @details LOCAL_SYSTEMD では systemctl restart に渡すユニット名が必須のため、再起動を実行する前の読み込み時点でエラーにします
+# @param config 検証する ServerConfig
+# @param where エラーメッセージに示す設定元
+# @param unit_key ユニット名を設定するキー（エラーメッセージ用）
+# @return 検証済みの ServerConfig
+def _check_restart(config: ServerConfig, where: str, unit_key: str) -> ServerConfig:
+    if config.restart_method not in RESTART_METHODS:
+        raise RuntimeError(
+            f"Server '{config.name}' has unknown restart method '{config.restart_method}' in {where} "
+            f"(use {' or '.join(RESTART_METHODS)})"
+        )
+    if config.restart_method == "LOCAL_SYSTEMD" and not config.systemd_unit:
+        raise RuntimeError(f"Server '{config.name}' uses restart method LOCAL_SYSTEMD but {unit_key} is not set in {where}")
+    return config
+
+# @fn _from_env
+# @brief 環境変数の設定から 1 台分の ServerConfig を作る
+# @param settings 設定値
+# @return ServerConfig
+def _from_env(settings: Settings) -> ServerConfig:
+    for name in ("RCON_HOST", "RCON_PASSWORD", "MC_LOG_PATH", "MC_MODS_DIR"):
+        if not getattr(settings, name):
+            raise RuntimeError(f"Enviroment variable '{name}' is requred but not set (or set SERVERS_FILE)")  # 必須環境変数が未設定の場合はエラー
+    return _check_restart(ServerConfig(
+        name=DEFAULT_SERVER,
+        rcon_host=settings.RCON_HOST,
+        rcon_port=settings.RCON_PORT,
+        rcon_password=settings.RCON_PASSWORD,
+        log_path=settings.MC_LOG_PATH,
+        mods_dir=settings.MC_MODS_DIR,
+        data_dir=settings.DATA_DIR,  # 単一サーバー時は従来どおり DATA_DIR 直下に保存
+        mc_dir=settings.MC_DIR,
+        query_port=settings.MC_QUERY_PORT,
+        restart_method=settings.RESTART_METHOD,
+        systemd_unit=settings.SYSTEMD_UNIT,
+        restart_countdown=settings.RESTART_COUNTDOWN_SECONDS,
+        startup_timeout=settings.STARTUP_TIMEOUT_SECONDS,
+        perf_interval=settings.PERF_SAMPLE_INTERVAL_SECONDS,
+        tps_command=settings.PERF_TPS_COMMAND,
+    ), "environment variables", "SYSTEMD_UNIT")
+
+# @fn load_server_configs
+# @brief サーバー定義を読み込む
+# @details SERVERS_FILE が設定されていれば TOML の [servers.<名前>] テーブルから、無ければ環境変数から 1 台分を作ります。
+#          TOML で省略したキーは環境変数の値（RESTART_COUNTDOWN_SECONDS や PERF_SAMPLE_INTERVAL_SECONDS など）を既定値として使います
+# @param settings 設定値
+# @return 定義順の ServerConfig のリスト
+def load_server_configs(settings: Settings) -> list[ServerConfig]:
+    if not settings.SERVERS_FILE:
+        return [_from_env(settings)]
+    import tomli  # 複数サーバー定義を使う場合だけ読み込む
+    with open(settings.SERVERS_FILE, "rb") as f:
+        tables = tomli.load(f).get("servers") or {}
+    if not tables:
+        raise RuntimeError(f"No [servers.<name>] tables in {settings.SERVERS_FILE}")
+    out = []
+    for name, t in tables.items():
+        if not _NAME_RE.match(name):
+            raise RuntimeError(f"Invalid server name '{name}' (use lowercase letters, digits, '-' and '_')")
+        missing = [k for k in ("rcon_host", "rcon_password", "log_path", "mods_dir") if not t.get(k)]
+        if missing:
+            raise RuntimeError(f"Server '{name}' is missing {', '.join(missing)} in {settings.SERVERS_FILE}")
+        out.append(_check_restart(ServerConfig(
+            name=name,
+            rcon_host=t["rcon_host"],
+            rcon_port=int(t.get("rcon_port", settings.RCON_PORT)),
+            rcon_password=t["rcon_password"],
+            log_path=t["log_path"],
+            mods_dir=t["mods_dir"],
+            data_dir=os.path.join(settings.DATA_DIR, "servers", name),  # サーバーごとにインデックスや起動記録を分ける
+            mc_dir=t.get("mc_dir"),
+            query_host=t.get("query_host"),
+            query_port=int(t.get("query_port", 25565)),
+            restart_method=t.get("restart_method", settings.RESTART_METHOD),
+            systemd_unit=t.get("systemd_unit"),
+            restart_countdown=int(t.get("restart_countdown", settings.RESTART_COUNTDOWN_SECONDS)),
+            startup_timeout=int(t.get("startup_timeout", settings.STARTUP_TIMEOUT_SECONDS)),
+            perf_interval=int(t.get("perf_interval", settings.PERF_SAMPLE_INTERVAL_SECONDS)),
+            tps_command=t.get("tps_command", settings.PERF_TPS_COMMAND),
+        ), settings.SERVERS_FILE, "systemd_unit"))
+    return out
+
+# @class ServerContext
+# @brief サーバー 1 台分の接続とキャッシュ一式
+# @details RCON 接続プール・ログ追従・ステータスキャッシュ・性能サンプラー・mod インデックス・mods スナップショット・再起動ステートマシンをサーバーごとに持ちます
+class ServerContext:
+    def __init__(self, config: ServerConfig, settings: Settings, store: ModStore):
+        self.config = config
+        self.name = config.name
+        self.rcon = RconPool(
+            config.rcon_host, config.rcon_port, config.rcon_password,
+            size=settings.RCON_POOL_SIZE, timeout=settings.RCON_TIMEOUT_SECONDS,
+        )
+        self.log_follower = LogFollower(config.log_path)
+        self.status_poller = StatusPoller(
+            config.status_host, config.query_port,
+            interval=settings.STATUS_POLL_INTERVAL_SECONDS, stale_after=settings.STATUS_STALE_SECONDS,
+        )
+        self.perf = PerfSampler(self.rcon, interval=config.perf_interval, tps_command=config.tps_command)
+        self.mod_index = ModIndex(config.mods_dir, os.path.join(config.data_dir, "mod_index.json"))
+        self.snapshots = SnapshotManager(
+            config.mods_dir, os.path.join(config.data_dir, "snapshots"), store, keep=settings.SNAPSHOT_KEEP,
+        )
+        self.startup_history_path = os.path.join(config.data_dir, "startup_history.jsonl")
+        self.restarter = RestartOrchestrator(
+            self.log_follower, self.rcon,
+            method=config.restart_method, systemd_unit=config.systemd_unit,
+            countdown=config.restart_countdown, timeout=config.startup_timeout,
+            history_path=self.startup_history_path,
+        )
+
+    # @fn close
+    # @brief ポーリング・サンプリングと RCON 接続を止める
+    # @return なし
+    async def close(self):
+        await self.status_poller.stop()
+        await self.perf.stop()
+        await self.rcon.close()
+
+# @class ServerRegistry
+# @brief 管理対象サーバーの一覧
+# @details 定義順を保持し、最初のサーバーを既定（server オプション省略時の対象）とします。
+#          jar の内容アドレスストアは全サーバーで共有し、同じ jar を複数サーバーへ配置しても実体は 1 つです
+class ServerRegistry:
+    def __init__(self, configs: list[ServerConfig], settings: Settings):
+        self.store = ModStore(os.path.join(settings.DATA_DIR, "store"))
+        self._servers = {c.name: ServerContext(c, settings, self.store) for c in configs}
+        self.default = next(iter(self._servers.values()))
+
+    def __iter__(self) -> Iterator[ServerContext]:
+        return iter(self._servers.values())
+
+    def __len__(self) -> int:
+        return len(self._servers)
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._servers)
+
+    # @fn get
+    # @brief 名前からサーバーを取得する
+    # @param name サーバー名（None の場合は既定のサーバー）
+    # @return ServerContext
+    def get(self, name: Optional[str] = None) -> ServerContext:
+        if not name:
+            return self.default
+        try:
+            return self._servers[name]
+        except KeyError:
+            raise UnknownServer(name) from None
+
+    # @fn start
+    # @brief 全サーバーのステータスポーリングと性能サンプリングを開始する
+    # @return なし
+    def start(self):
+        for ctx in self:
+            ctx.status_poller.start()
+            ctx.perf.start()
+
+    # @fn close
+    # @brief 全サーバーの接続を閉じる
+    # @return なし
+    async def close(self):
+        await asyncio.gather(*(ctx.close() for ctx in self))
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Awaitable, Callable, Iterable, Optional
+
+from minecraft_discord_controller.service.logfollow import LogSubscription
+
+log = logging.getLogger(__name__)
+
+# (フェーズ名, 表示名, 検出パターン) をサーバー起動の順に並べたもの
+PHASES: list[tuple[str, str, re.Pattern]] = [
+    ("discovery", "mod検出", re.compile(r"ModLauncher running|Loading \d+ mods|Found mod file|Scanning mod candidates|ModDiscoverer", re.IGNORECASE)),
+    ("construct", "コンストラクト", re.compile(r"Launching target '\w*server'|mod loading, version|modloading-worker|Constructing", re.IGNORECASE)),
+    ("common_setup", "共通セットアップ", re.compile(r"common ?setup|FMLCommonSetupEvent", re.IGNORECASE)),
+    ("registry_freeze", "レジストリ確定", re.compile(r"freez(?:e|ing) (?:all )?registr|registries? (?:frozen|freeze)|Starting minecraft server version", re.IGNORECASE)),
+    ("world_load", "ワールド読み込み", re.compile(r"Preparing level|Preparing start region", re.IGNORECASE)),
+    ("done", "起動完了", re.compile(r"Done \(([0-9\.]+)s\)!", re.IGNORECASE)),
+]
+_PHASE_INDEX = {name: i for i, (name, _, _) in enumerate(PHASES)}
+_LABELS = {name: label for name, label, _ in PHASES}
+
+# @class StartupTimeline
+# @brief サーバー起動ログからフェーズごとの時刻を記録する
+# @details 起動中のログ行を順に受け取り、各フェーズに最初に入った時刻と、既知の modId が最初にログへ現れた時刻を記録します
+class StartupTimeline:
+    def __init__(self, mod_ids: Iterable[str] = (), hint: Optional[str] = None):
+        self.started_at = time.monotonic()
+        self.started_wall = time.time()
+        self.phases: dict[str, float] = {}  # フェーズ名 -> 開始からの経過秒
+        self.mod_first_seen: dict[str, float] = {}  # modId -> 開始からの経過秒
+        self.done_seconds: Optional[float] = None  # サーバー自身が報告した起動時間
+        self.hint = os.path.basename(hint) if hint else None
+        self.hint_seen = False
+        ids = sorted({m for m in mod_ids if m and len(m) >= 4}, key=len, reverse=True)  # 短すぎる ID は誤検知が多い
+        self._mod_re = re.compile(r"\b(" + "|".join(map(re.escape, ids)) + r")\b") if ids else None
+
+    # @fn reset_clock
+    # @brief 経過時間の基準を現在時刻に合わせる
+    # @details stop/systemctl を発行した時点を起動開始とみなすために使います
+    # @return なし
+    def reset_clock(self):
+        self.started_at = time.monotonic()
+        self.started_wall = time.time()
+
+    @property
+    def current(self) -> Optional[str]:
+        return max(self.phases, key=_PHASE_INDEX.__getitem__) if self.phases else None
+
+    @property
+    def done(self) -> bool:
+        return "done" in self.phases
+
+    # @fn feed
+    # @brief ログ 1 行を取り込む
+    # @details 購読は stop の前から始まるため、最初のフェーズに一致するまでの行（旧サーバーの停止ログ）は
+    #          mod の初出やヒントの検出に使いません
+    # @param line ログ行
+    # @return 新しいフェーズに入った場合は True
+    def feed(self, line: str) -> bool:
+        now = time.monotonic() - self.started_at
+        entered = False
+        cur = _PHASE_INDEX[self.current] if self.current else -1
+        for i in range(len(PHASES) - 1, cur, -1):  # 後ろのフェーズから照合し、前のフェーズへは戻らない
+            name, _, pattern = PHASES[i]
+            m = pattern.search(line)
+            if m:
+                self.phases[name] = now
+                if name == "done":
+                    self.done_seconds = float(m.group(1))
+                entered = True
+                break
+        if not self.phases:
+            return False  # まだ新しいサーバーの起動ログではない
+        if self.hint and not self.hint_seen and self.hint in line:
+            self.hint_seen = True
+        if self._mod_re is not None:
+            for mod_id in self._mod_re.findall(line.lower()):
+                self.mod_first_seen.setdefault(mod_id, now)
+        return entered
+
+    # @fn phase_durations
+    # @brief フェーズごとの所要時間を返す
+    # @return (フェーズ名, 所要秒) のリスト。最後のフェーズは現在までの経過
+    def phase_durations(self) -> list[tuple[str, float]]:
+        items = sorted(self.phases.items(), key=lambda kv: kv[1])
+        end = time.monotonic() - self.started_at
+        out = []
+        for i, (name, t) in enumerate(items):
+            nxt = items[i + 1][1] if i + 1 < len(items) else (t if name == "done" else end)
+            out.append((name, nxt - t))
+        return out
+
+    # @fn slowest_mods
+    # @brief ログ上の初出間隔から時間のかかった mod を推定する
+    # @details 次の mod が初めてログに現れるまでの間隔を、その mod の読み込み時間とみなします
+    # @param n 返す件数
+    # @return (modId, 推定秒) のリスト
+    def slowest_mods(self, n: int = 5) -> list[tuple[str, float]]:
+        seen = sorted(self.mod_first_seen.items(), key=lambda kv: kv[1])
+        gaps = [(mod_id, seen[i + 1][1] - t) for i, (mod_id, t) in enumerate(seen[:-1])]
+        return sorted(gaps, key=lambda kv: kv[1], reverse=True)[:n]
+
+    def to_record(self) -> dict:
+        return {
+            "started_at": self.started_wall,
+            "phases": self.phases,
+            "done_seconds": self.done_seconds,
+            "total": self.phases.get("done"),
+            "hint": self.hint,
+            "hint_seen": self.hint_seen,
+            "slowest_mods": self.slowest_mods(10),
+        }
+
+# @fn format_timeline
+# @brief タイムラインを Discord 向けの文字列にする
+# @param tl 表示する StartupTimeline
+# @param previous 比較対象の前回記録（load_previous の戻り値）
+# @return 整形済みの文字列
+def format_timeline(tl: StartupTimeline, previous: Optional[dict] = None) -> str:
+    lines = []
+    durations = dict(tl.phase_durations())
+    prev_phases = (previous or {}).get("phases") or {}
+    for name, label, _ in PHASES:
+        if name not in tl.phases:
+            lines.append(f"⬜ {label}")
+            continue
+        mark = "✅" if name == "done" or name != tl.current else "⏳"
+        line = f"{mark} {label}: +{tl.phases[name]:.1f}s"
+        if name != "done":
+            line += f"（{durations[name]:.1f}s）"
+        if name in prev_phases:
+            line += f" 前回比 {tl.phases[name] - prev_phases[name]:+.1f}s"
+        lines.append(line)
+    if tl.done_seconds is not None:
+        lines.append(f"サーバー報告の起動時間: {tl.done_seconds:.1f}s")
+    slow = tl.slowest_mods(5)
+    if tl.done and slow:
+        lines.append("時間のかかったmod（推定）: " + ", ".join(f"`{m}` {s:.1f}s" for m, s in slow))
+    return "\n".join(lines)
+
+# @fn load_previous
+# @brief 直近の起動記録を読み込む
+# @param history_path 起動記録の JSON Lines ファイル
+# @return 最後に完了した起動記録。無い場合は None
+def load_previous(history_path: str) -> Optional[dict]:
+    try:
+        with open(history_path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return None
+    for line in reversed(lines):
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        if rec.get("total") is not None:
+            return rec
+    return None
+
+# @fn save_record
+# @brief 起動記録を追記する
+# @param history_path 起動記録の JSON Lines ファイル
+# @param tl 保存する StartupTimeline
+# @return なし
+def save_record(history_path: str, tl: StartupTimeline):
+    os.makedirs(os.path.dirname(history_path) or ".", exist_ok=True)
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(tl.to_record(), ensure_ascii=False) + "\n")
+
+# @fn watch_startup
+# @brief サーバー起動を監視してタイムラインを構築する
+# @details 全行購読の LogSubscription からタイムラインへ取り込み、フェーズが変わるたびに on_update を呼びます（呼び出しは min_interval 秒ごとにまとめます）
+# @param sub 起動ログを受け取る LogSubscription（stop 前に登録しておく）
+# @param tl 記録先の StartupTimeline
+# @param timeout タイムアウト時間（秒）
+# @param on_update 表示更新用のコールバック
+# @param min_interval on_update を呼ぶ最小間隔（秒）
+# @param cancel セットされたら監視を中止するイベント
+# @return 起動完了を検知した場合は True、タイムアウトまたはキャンセルした場合は False
+async def watch_startup(
+    sub: LogSubscription,
+    tl: StartupTimeline,
+    timeout: float,
+    on_update: Optional[Callable[[StartupTimeline], Awaitable[None]]] = None,
+    min_interval: float = 2.0,
+    cancel: Optional[asyncio.Event] = None,
+) -> bool:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    last_update = 0.0
+    dirty = False
+    while not tl.done:
+        remaining = deadline - loop.time()
+        if remaining <= 0 or (cancel is not None and cancel.is_set()):
+            break
+        line = await sub.first(min(remaining, min_interval))
+        if line is not None and tl.feed(line):
+            dirty = True
+        if on_update is not None and dirty and (tl.done or loop.time() - last_update >= min_interval):
+            dirty = False
+            last_update = loop.time()
+            try:
+                await on_update(tl)
+            except Exception as e:
+                log.warning(f"Startup progress update failed: {e}")
+    return tl.done
@@ -0,0 +1,144 @@
+import asyncio
+import contextlib
+import importlib
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from minecraft_discord_controller.utils.metrics import STATUS_PROBE_SECONDS
+
+log = logging.getLogger(__name__)
+
+_java_server = None  # mcstatus.JavaServer（初回の問い合わせ時に読み込む）
+
+# @fn _load_java_server
+# @brief mcstatus を読み込んで JavaServer を返す
+# @details mcstatus は dnspython を含めて import が重いため、起動時ではなく初回の問い合わせ時にスレッドで読み込みます
+# @return JavaServer クラス
+async def _load_java_server():
+    global _java_server
+    if _java_server is None:
+        _java_server = (await asyncio.to_thread(importlib.import_module, "mcstatus")).JavaServer
+    return _java_server
+
+
+@dataclass(frozen=True)
+class StatusSnapshot:
+    online: bool
+    players_online: int = 0
+    players_max: int = 0
+    version: Optional[str] = None
+    latency_ms: Optional[float] = None
+    taken_at: float = 0.0  # time.monotonic() 基準の取得時刻
+    wall_time: float = 0.0  # time.time() 基準の取得時刻
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.taken_at
+
+
+@dataclass(frozen=True)
+class StatusTransition:
+    online: bool
+    wall_time: float
+
+
+# @fn format_status
+# @brief ステータスのスナップショットを表示用文字列にする
+# @param snap 表示する StatusSnapshot
+# @return ステータス文字列（オンライン情報、またはオフラインメッセージ）
+def format_status(snap: StatusSnapshot) -> str:
+    if not snap.online:
+        return "**Offline** or unreachable."  # 接続失敗時はオフラインと表示
+    return f"**Online**: {snap.players_online}/{snap.players_max} | Version: {snap.version}"
+
+
+# @class StatusPoller
+# @brief サーバーステータスのバックグラウンド取得とキャッシュ
+# @details mcstatus の非同期 API で一定間隔ごとに問い合わせ、最新結果とオンライン/オフラインの遷移履歴をメモリに保持します
+class StatusPoller:
+    def __init__(
+        self,
+        host: str,
+        port: int = 25565,
+        *,
+        interval: float = 30.0,
+        stale_after: float = 60.0,
+        timeout: float = 3.0,
+        history_size: int = 50,
+    ):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.stale_after = stale_after
+        self.timeout = timeout
+        self.last: Optional[StatusSnapshot] = None
+        self.history: deque[StatusTransition] = deque(maxlen=history_size)
+        self._task: asyncio.Task | None = None
+        self._inflight: asyncio.Task | None = None
+
+    # @fn start
+    # @brief ポーリングタスクを起動する
+    # @return なし
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    # @fn stop
+    # @brief ポーリングタスクを停止する
+    # @return なし
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    # @fn get
+    # @brief キャッシュ済みのステータスを取得する
+    # @details キャッシュが stale_after より古い（または未取得の）場合のみ新しく問い合わせます
+    # @return StatusSnapshot
+    async def get(self) -> StatusSnapshot:
+        if self.last is None or self.last.age > self.stale_after:
+            return await self.refresh()
+        return self.last
+
+    # @fn refresh
+    # @brief 直ちにサーバーへ問い合わせる
+    # @details 同時に呼ばれた場合は実行中の問い合わせを共有し、同じサーバーへ重複して接続しません
+    # @return StatusSnapshot
+    async def refresh(self) -> StatusSnapshot:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._probe())
+        return await asyncio.shield(self._inflight)
+
+    async def _probe(self) -> StatusSnapshot:
+        try:
+            with STATUS_PROBE_SECONDS.time():
+                server = await (await _load_java_server()).async_lookup(f"{self.host}:{self.port}", timeout=self.timeout)  # サーバーに接続
+                stat = await asyncio.wait_for(server.async_status(), timeout=self.timeout)  # ステータス情報を取得
+            snap = StatusSnapshot(
+                online=True,
+                players_online=stat.players.online,
+                players_max=stat.players.max,
+                version=stat.version.name,
+                latency_ms=stat.latency,
+                taken_at=time.monotonic(),
+                wall_time=time.time(),
+            )
+        except Exception:
+            snap = StatusSnapshot(online=False, taken_at=time.monotonic(), wall_time=time.time())
+        if self.last is None or self.last.online != snap.online:
+            self.history.append(StatusTransition(snap.online, snap.wall_time))  # 状態が変わった時だけ履歴に残す
+        self.last = snap
+        return snap
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.warning(f"Status poll for {self.host}:{self.port} failed: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,100 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+
+import aiohttp
+
+from minecraft_discord_controller.utils.metrics import FILE_SECONDS
+
+CHUNK_SIZE = 1 << 20  # 1 MiB ずつ受信してメモリ使用量を一定に保つ
+_DOWNLOAD_SECONDS = FILE_SECONDS.labels("download")
+_COMMIT_SECONDS = FILE_SECONDS.labels("commit")
+
+
+class UploadTooLarge(RuntimeError):
+    pass
+
+
+# @class StagedUpload
+# @brief 配置先と同じファイルシステム上に書き出した一時ファイル
+# @details commit() で rename による原子的な配置、discard() で破棄を行います
+@dataclass
+class StagedUpload:
+    path: str
+    size: int
+    sha256: str
+
+    # @fn commit
+    # @brief 一時ファイルを最終的なファイル名へ原子的に置き換える
+    # @param dst_dir 配置先ディレクトリ
+    # @param filename 配置後のファイル名
+    # @return 配置先のファイルパス
+    def commit(self, dst_dir: str, filename: str) -> str:
+        dst = os.path.join(dst_dir, filename)
+        with _COMMIT_SECONDS.time():
+            os.replace(self.path, dst)  # 同一ファイルシステム内の rename なので途中状態のjarは見えない
+        return dst
+
+    # @fn discard
+    # @brief 一時ファイルを削除する
+    # @return なし
+    def discard(self):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+
+def _write_chunk(f, h, chunk: bytes):
+    f.write(chunk)
+    h.update(chunk)
+
+
+def _finish(f):
+    f.flush()
+    os.fsync(f.fileno())  # rename 前にディスクへ確定させる
+    f.close()
+
+
+# @fn stream_to_staging
+# @brief URL の内容をストリーミングで一時ファイルへ書き出す
+# @details dest_dir 内に隠し .part ファイルを作り、チャンクごとにスレッドで書き込みと SHA-256 計算を行います。
+#          max_bytes を超えた時点で中断し、一時ファイルを削除して UploadTooLarge を投げます
+# @param url ダウンロード元 URL（Discord 添付ファイルの URL）
+# @param dest_dir 一時ファイルを置くディレクトリ（配置先と同じファイルシステム）
+# @param max_bytes 受け付ける最大バイト数
+# @return StagedUpload
+async def stream_to_staging(url: str, dest_dir: str, max_bytes: int) -> StagedUpload:
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=dest_dir)  # modローダーに読まれない名前
+    f = os.fdopen(fd, "wb")
+    h = hashlib.sha256()
+    size = 0
+    t0 = time.perf_counter()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as resp:
+                resp.raise_for_status()
+                if resp.content_length is not None and resp.content_length > max_bytes:
+                    raise UploadTooLarge(f"file is larger than {max_bytes} bytes")
+                buf = bytearray()
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes:  # 申告サイズに関わらず受信中にも上限を確認
+                        raise UploadTooLarge(f"file is larger than {max_bytes} bytes")
+                    buf += chunk
+                    if len(buf) >= CHUNK_SIZE:  # 小さな受信単位をまとめてからスレッドへ渡す
+                        await asyncio.to_thread(_write_chunk, f, h, buf)
+                        buf.clear()
+                if buf:
+                    await asyncio.to_thread(_write_chunk, f, h, buf)
+        await asyncio.to_thread(_finish, f)
+    except BaseException:
+        f.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+    _DOWNLOAD_SECONDS.observe(time.perf_counter() - t0)
+    return StagedUpload(tmp_path, size, h.hexdigest())
@@ -0,0 +1,224 @@
+import asyncio
+import functools
+import logging
+import time
+from bisect import bisect_left
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+# 秒単位のレイテンシ用バケット境界（上限）
+DEFAULT_BUCKETS = (
+  0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+  1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+def _label_str(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+  parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+  if extra:
+    parts.append(extra)
+  return "{" + ",".join(parts) + "}" if parts else ""
+
+# @class Counter
+# @brief 単調増加するカウンター
+class Counter:
+  __slots__ = ("value",)
+
+  def __init__(self):
+    self.value = 0
+
+  def inc(self, n: int = 1):
+    self.value += n
+
+# @class Histogram
+# @brief 固定バケットのヒストグラム
+# @details バケットの配列は生成時に確保し、observe() は bisect と整数加算だけで済ませてサンプルごとの割り当てをしません
+class Histogram:
+  __slots__ = ("buckets", "counts", "sum", "count")
+
+  def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+    self.buckets = buckets
+    self.counts = [0] * (len(buckets) + 1)  # 最後は +Inf
+    self.sum = 0.0
+    self.count = 0
+
+  def observe(self, value: float):
+    self.counts[bisect_left(self.buckets, value)] += 1
+    self.sum += value
+    self.count += 1
+
+  def time(self) -> "_Timer":
+    return _Timer(self)
+
+  def merge(self, other: "Histogram"):
+    for i, c in enumerate(other.counts):
+      self.counts[i] += c
+    self.sum += other.sum
+    self.count += other.count
+
+  # @fn quantile
+  # @brief バケットから分位点を近似する
+  # @param q 0〜1 の分位
+  # @return 該当バケットの上限値（秒）。サンプルがない場合は None
+  def quantile(self, q: float) -> Optional[float]:
+    if not self.count:
+      return None
+    target = q * self.count
+    acc = 0
+    for i, c in enumerate(self.counts):
+      acc += c
+      if acc >= target:
+        return self.buckets[i] if i < len(self.buckets) else float("inf")
+    return float("inf")
+
+class _Timer:
+  __slots__ = ("_hist", "_t0")
+
+  def __init__(self, hist: Histogram):
+    self._hist = hist
+
+  def __enter__(self):
+    self._t0 = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc):
+    self._hist.observe(time.perf_counter() - self._t0)
+
+# @class Family
+# @brief ラベル付きメトリクスの集合
+# @details labels() で得た子はキャッシュされるため、呼び出し側は起動時に一度だけ解決して保持しておけます
+class Family:
+  def __init__(self, name: str, help_text: str, kind: str, labelnames: tuple[str, ...], factory):
+    self.name = name
+    self.help = help_text
+    self.kind = kind
+    self.labelnames = labelnames
+    self._factory = factory
+    self.children: dict[tuple[str, ...], object] = {}
+
+  def labels(self, *values: str):
+    child = self.children.get(values)
+    if child is None:
+      child = self.children[values] = self._factory()
+    return child
+
+# @class Registry
+# @brief メトリクスの登録簿と Prometheus テキスト形式への出力
+class Registry:
+  def __init__(self):
+    self.families: dict[str, Family] = {}
+
+  def _family(self, name: str, help_text: str, kind: str, labels: tuple[str, ...], factory) -> Family:
+    fam = self.families.get(name)
+    if fam is None:
+      fam = self.families[name] = Family(name, help_text, kind, labels, factory)
+    return fam
+
+  def histogram(self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Family:
+    return self._family(name, help_text, "histogram", labels, lambda: Histogram(buckets))
+
+  def counter(self, name: str, help_text: str, labels: tuple[str, ...] = ()) -> Family:
+    return self._family(name, help_text, "counter", labels, Counter)
+
+  # @fn render
+  # @brief 全メトリクスを Prometheus のテキスト形式にする
+  # @return エクスポジション文字列
+  def render(self) -> str:
+    out: list[str] = []
+    for fam in self.families.values():
+      out.append(f"# HELP {fam.name} {fam.help}")
+      out.append(f"# TYPE {fam.name} {fam.kind}")
+      for values, child in sorted(fam.children.items()):
+        if isinstance(child, Counter):
+          out.append(f"{fam.name}{_label_str(fam.labelnames, values)} {child.value}")
+          continue
+        acc = 0
+        for bound, c in zip(child.buckets, child.counts):
+          acc += c
+          le = _label_str(fam.labelnames, values, 'le="%s"' % bound)
+          out.append(f"{fam.name}_bucket{le} {acc}")
+        le = _label_str(fam.labelnames, values, 'le="+Inf"')
+        out.append(f"{fam.name}_bucket{le} {child.count}")
+        out.append(f"{fam.name}_sum{_label_str(fam.labelnames, values)} {child.sum}")
+        out.append(f"{fam.name}_count{_label_str(fam.labelnames, values)} {child.count}")
+    return "\n".join(out) + "\n"
+
+metrics = Registry()  # プロセス全体で共有するメトリクス
+
+COMMAND_SECONDS = metrics.histogram("mdc_command_seconds", "Slash command handler duration", ("command",))
+COMMAND_ERRORS = metrics.counter("mdc_command_errors_total", "Slash command handlers that raised", ("command",))
+COMMAND_CANCELLED = metrics.counter("mdc_command_cancelled_total", "Slash command handlers that were cancelled", ("command",))
+INTERACTION_LAG = metrics.histogram("mdc_interaction_lag_seconds", "Delay between interaction creation and handler start", ("command",))
+RCON_SECONDS = metrics.histogram("mdc_rcon_seconds", "RCON command round-trip time").labels()
+RCON_ERRORS = metrics.counter("mdc_rcon_errors_total", "RCON commands that failed").labels()
+STATUS_PROBE_SECONDS = metrics.histogram("mdc_status_probe_seconds", "Server List Ping probe duration").labels()
+LOG_WAIT_SECONDS = metrics.histogram("mdc_log_wait_seconds", "Time spent waiting for a log pattern", ("result",))
+LOG_DISPATCH_SECONDS = metrics.histogram("mdc_log_dispatch_seconds", "Time to split and fan out one batch of log lines").labels()
+FILE_SECONDS = metrics.histogram("mdc_file_seconds", "Upload download/write and placement duration", ("op",))
+JOB_WAIT_SECONDS = metrics.histogram("mdc_job_wait_seconds", "Time a job spent queued behind conflicting jobs", ("kind",))
+JOB_SECONDS = metrics.histogram("mdc_job_seconds", "Job run time after acquiring its resources", ("kind",))
+JOB_FAILURES = metrics.counter("mdc_job_failures_total", "Jobs that ended in failure", ("kind",))
+PROGRESS_EDITS = metrics.counter("mdc_progress_edits_total", "Progress message edits actually sent to Discord").labels()
+
+# @fn instrumented
+# @brief コマンドハンドラーの所要時間とエラーを記録するデコレーター
+# @details ラベル付きの子メトリクスはデコレート時に一度だけ解決するため、呼び出しごとの辞書引きはありません。
+#          キャンセル（Bot の停止など）はエラーとは別に数えます。
+#          discord.py が引数を解釈できるよう functools.wraps で元のシグネチャを引き継ぎます
+# @param command コマンド名（メトリクスのラベル）
+# @return デコレーター
+def instrumented(command: str):
+  hist = COMMAND_SECONDS.labels(command)
+  errors = COMMAND_ERRORS.labels(command)
+  cancelled = COMMAND_CANCELLED.labels(command)
+  lag = INTERACTION_LAG.labels(command)
+
+  def deco(fn):
+    @functools.wraps(fn)
+    async def wrapper(inter, *args, **kwargs):
+      created = getattr(inter, "created_at", None)
+      if created is not None:
+        lag.observe(max(0.0, time.time() - created.timestamp()))
+      t0 = time.perf_counter()
+      try:
+        return await fn(inter, *args, **kwargs)
+      except asyncio.CancelledError:
+        cancelled.inc()
+        raise
+      except Exception:
+        errors.inc()
+        raise
+      finally:
+        hist.observe(time.perf_counter() - t0)
+    return wrapper
+  return deco
+
+# @fn start_metrics_server
+# @brief Prometheus 形式のメトリクスを返す HTTP エンドポイントを起動する
+# @details 依存を増やさないよう asyncio.start_server で GET リクエストだけを処理する最小限のサーバーです
+# @param host 待ち受けアドレス
+# @param port 待ち受けポート
+# @return asyncio の Server
+async def start_metrics_server(host: str, port: int) -> asyncio.base_events.Server:
+  async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+      request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+      path = request.split(b" ", 2)[1] if request.count(b" ") >= 2 else b"/"
+      if path.split(b"?")[0] in (b"/metrics", b"/"):
+        body = metrics.render().encode("utf-8")
+        status = b"200 OK"
+      else:
+        body, status = b"not found\n", b"404 Not Found"
+      writer.write(
+        b"HTTP/1.1 " + status + b"\r\nContent-Type: text/plain; version=0.0.4\r\n"
+        + b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body
+      )
+      await writer.drain()
+    except Exception:
+      pass
+    finally:
+      writer.close()
+
+  server = await asyncio.start_server(handle, host, port)
+  log.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+  return server
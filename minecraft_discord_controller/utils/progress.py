@@ -0,0 +1,136 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+import discord
+
+from minecraft_discord_controller.utils.metrics import PROGRESS_EDITS
+
+log = logging.getLogger(__name__)
+
+EDIT_INTERVAL = 2.0  # 同じメッセージを編集する最短間隔（秒）。間の更新は最新の内容だけ送る
+TOKEN_MARGIN = 60.0  # インタラクショントークンの期限（15分）のこれだけ前からチャンネルのメッセージへ切り替える
+_BUCKET_SIZE = 5  # メッセージ送信・編集のレート制限（5回 / 5秒）
+_BUCKET_PERIOD = 5.0
+
+# @class _Bucket
+# @brief スライディングウィンドウ式のレート制限
+# @details 直近 _BUCKET_SIZE 回の送信時刻を覚えておき、上限に達していれば最古の送信から _BUCKET_PERIOD 秒経つまで待ちます。
+#          複数の管理者が同じチャンネルで同時にジョブを動かしても 429 を受けないよう、Bot 側で先に間隔を空けます
+class _Bucket:
+  __slots__ = ("stamps",)
+
+  def __init__(self):
+    self.stamps: deque[float] = deque(maxlen=_BUCKET_SIZE)
+
+  async def acquire(self):
+    while len(self.stamps) == _BUCKET_SIZE:
+      wait = self.stamps[0] + _BUCKET_PERIOD - time.monotonic()
+      if wait <= 0:
+        break
+      await asyncio.sleep(wait)
+    self.stamps.append(time.monotonic())
+
+_buckets: dict[int, _Bucket] = {}
+
+# @class ProgressMessage
+# @brief 1 つのメッセージを編集し続けて進捗を表示する
+# @details update() は最新の内容を記録するだけで、実際の編集は EDIT_INTERVAL ごとに 1 回へまとめてレート制限内で送ります。
+#          公開メッセージは Bot のトークンで編集するため期限がありません。エフェメラルはインタラクションのトークンで編集し、
+#          期限が近づいたらチャンネルへメンション付きの新しいメッセージを送って以降はそちらを編集します
+class ProgressMessage:
+  def __init__(self, inter: discord.Interaction, ephemeral: bool):
+    self.inter = inter
+    self.ephemeral = ephemeral
+    self.text = ""
+    self.finished = False
+    self.error: Optional[str] = None  # finish(failed=True) で終えた場合の結果
+    self._message: Optional[discord.abc.Snowflake] = None  # Bot のトークンで編集できるメッセージ
+    self._prefix = ""
+    self._pending: Optional[tuple[str, dict]] = None
+    self._flusher: Optional[asyncio.Task] = None
+    self._wake = asyncio.Event()  # finish() で編集間隔の待ちを打ち切る
+    self._last = 0.0
+    self._token_bucket = _Bucket()  # インタラクションのトークンでの編集はトークンごとに制限される
+
+  # @fn open
+  # @brief インタラクションへ最初の応答を送り、進捗メッセージにする
+  # @param inter 応答する Interaction（未応答のもの）
+  # @param text 最初に表示する内容
+  # @param ephemeral 実行者だけに見せるかどうか
+  # @return ProgressMessage
+  @classmethod
+  async def open(cls, inter: discord.Interaction, text: str, *, ephemeral: bool = True) -> "ProgressMessage":
+    p = cls(inter, ephemeral)
+    await inter.response.send_message(text, ephemeral=ephemeral)
+    p.text, p._last = text, time.monotonic()
+    if not ephemeral and inter.channel is not None:
+      try:
+        msg = await inter.original_response()
+        p._message = inter.channel.get_partial_message(msg.id)  # 以降は Bot のトークンで編集する
+      except Exception as e:
+        log.warning(f"Falling back to interaction token for progress edits: {e}")
+    return p
+
+  # @fn update
+  # @brief 表示内容を更新する
+  # @details 直前の編集から EDIT_INTERVAL 経っていなければ最新の内容だけを保留し、まとめて 1 回編集します
+  # @param text 新しい内容
+  # @return なし
+  def update(self, text: str):
+    if self.finished or (text == self.text and self._pending is None):
+      return
+    self._pending = (text, {})
+    if self._flusher is None or self._flusher.done():
+      self._flusher = asyncio.create_task(self._flush())
+
+  # @fn finish
+  # @brief 最終結果を表示して以降の更新を止める
+  # @param text 最終的な内容
+  # @param file 添付するファイル
+  # @param failed 失敗として終えるかどうか（ジョブの状態に反映される）
+  # @return なし
+  async def finish(self, text: str, *, file: Optional[discord.File] = None, failed: bool = False):
+    if self.finished:
+      return
+    self.finished = True
+    if failed:
+      self.error = text
+    self._pending = (text, {"attachments": [file]} if file else {})
+    self._wake.set()
+    if self._flusher is not None and not self._flusher.done():
+      await self._flusher  # 実行中の編集ループが最終結果も送る
+    if self._pending is not None:
+      await self._flush()
+
+  async def _flush(self):
+    while self._pending is not None:
+      delay = self._last + EDIT_INTERVAL - time.monotonic()
+      if delay > 0 and not self.finished:
+        with contextlib.suppress(asyncio.TimeoutError):
+          await asyncio.wait_for(self._wake.wait(), delay)  # 待つ間に届いた更新は上書きされ、最新の 1 回だけ送られる
+      text, kwargs = self._pending
+      self._pending = None
+      try:
+        await self._edit(text, **kwargs)
+        self.text = text
+        PROGRESS_EDITS.inc()
+      except Exception as e:
+        log.warning(f"Progress message edit failed: {e}")
+      self._last = time.monotonic()
+
+  async def _edit(self, text: str, **kwargs):
+    if self._message is None and time.time() < self.inter.expires_at.timestamp() - TOKEN_MARGIN:
+      await self._token_bucket.acquire()
+      await self.inter.edit_original_response(content=text, **kwargs)
+      return
+    await _buckets.setdefault(self.inter.channel_id or 0, _Bucket()).acquire()  # Bot のトークンでの送信・編集はチャンネルごとに制限される
+    if self._message is not None:
+      await self._message.edit(content=self._prefix + text, **kwargs)
+      return
+    self._prefix = f"{self.inter.user.mention} "  # トークンの期限切れ後はチャンネルへ送り直す
+    files = kwargs.get("attachments")
+    self._message = await self.inter.channel.send(self._prefix + text, **({"file": files[0]} if files else {}))
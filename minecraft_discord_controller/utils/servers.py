@@ -0,0 +1,33 @@
+import discord
+from discord import app_commands
+from minecraft_discord_controller.service.minecraft import servers
+from minecraft_discord_controller.service.servers import ServerContext, UnknownServer
+
+ALL_SERVERS = "all"  # /status で全サーバーを指定する値
+
+# @fn server_autocomplete
+# @brief server オプションの入力候補を返す
+# @details 登録済みサーバー名を部分一致で絞り込み、Discord の上限に合わせて最大 25 件を返します
+# @param inter 入力中の Interaction
+# @param current 入力中の文字列
+# @return 入力候補のリスト
+async def server_autocomplete(inter: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+  q = current.lower()
+  return [app_commands.Choice(name=n, value=n) for n in servers.names if q in n][:25]
+
+# @fn resolve_server
+# @brief server オプションの値から対象サーバーを取得する
+# @details 未指定なら既定のサーバーを返し、存在しない名前の場合は Interaction にエフェメラルでメッセージを返して None を返します
+# @param inter Discord の Interaction オブジェクト
+# @param name server オプションの値
+# @return ServerContext。見つからない場合は None
+async def resolve_server(inter: discord.Interaction, name: str | None) -> ServerContext | None:
+  try:
+    return servers.get(name)
+  except UnknownServer:
+    msg = f"サーバー `{name}` は登録されていません（{', '.join(servers.names)}）。"
+    if inter.response.is_done():
+      await inter.followup.send(msg, ephemeral=True)
+    else:
+      await inter.response.send_message(msg, ephemeral=True)  # 存在しないサーバー名の場合はエラーメッセージを送信
+    return None
@@ -0,0 +1,64 @@
+import asyncio
+import contextlib
+import logging
+from typing import Any, Callable, Optional
+
+log = logging.getLogger(__name__)
+
+class WorkerTimeout(TimeoutError):
+  pass
+
+# @class WorkerPool
+# @brief イベントループを止めずに終了・中断できるプロセスプール
+# @details ProcessPoolExecutor を with 文で使うと、終了時の shutdown(wait=True) が実行中・待機中の処理の完了まで
+#          イベントループをブロックします（キャンセル時も同様で、その間は Discord の heartbeat も送れません）。
+#          このクラスは終了時に待たずに shutdown し、キャンセルやタイムアウトで抜けた場合はワーカープロセスを終了させます
+class WorkerPool:
+  def __init__(self, max_workers: Optional[int] = None):
+    from concurrent.futures import ProcessPoolExecutor  # multiprocessing の import は必要になるまで遅らせる
+    self._pool = ProcessPoolExecutor(max_workers=max_workers)
+    self._closed = False
+
+  # @fn run
+  # @brief ワーカープロセスで関数を実行する
+  # @param fn 実行する関数（pickle できるモジュール直下の関数）
+  # @param args 引数
+  # @param timeout 打ち切るまでの秒数（None は無制限）。超えた場合はプール全体を止めて WorkerTimeout を投げる
+  # @return fn の戻り値
+  async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+    fut = asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+    try:
+      return await asyncio.wait_for(fut, timeout)
+    except asyncio.TimeoutError:
+      self.close(kill=True)  # 実行中の処理はプロセスを終了させないと止まらない
+      raise WorkerTimeout(f"worker did not finish within {timeout:g}s")
+
+  # @fn close
+  # @brief プールを待たずに閉じる
+  # @details 待機中の処理は取り消し、kill の場合は実行中のワーカープロセスも終了させます
+  # @param kill 実行中のワーカープロセスを終了させるかどうか
+  # @return なし
+  def close(self, kill: bool = False):
+    if self._closed:
+      return
+    self._closed = True
+    procs = list((getattr(self._pool, "_processes", None) or {}).values())  # shutdown 後は参照できなくなるため先に控える
+    self._pool.shutdown(wait=False, cancel_futures=True)
+    if not kill:
+      return
+    terminate = getattr(self._pool, "terminate_workers", None)  # Python 3.14 以降
+    if terminate is not None:
+      with contextlib.suppress(Exception):
+        terminate()
+      return
+    for p in procs:
+      with contextlib.suppress(Exception):
+        p.terminate()
+    if procs:
+      log.info(f"Terminated {len(procs)} worker process(es)")
+
+  async def __aenter__(self) -> "WorkerPool":
+    return self
+
+  async def __aexit__(self, exc_type, exc, tb):
+    self.close(kill=exc_type is not None)